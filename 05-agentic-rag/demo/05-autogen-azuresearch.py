@@ -1,7 +1,14 @@
 import os
+import re
+import sys
+import json
 import time
 import asyncio
-from typing import List, Dict
+import argparse
+from dataclasses import dataclass, field
+from typing import Any, Iterable, List, Dict, Optional, Tuple
+
+import numpy as np
 
 from autogen_agentchat.agents import AssistantAgent
 from autogen_core import CancellationToken
@@ -15,6 +22,9 @@ from azure.search.documents.indexes.models import SearchIndex, SimpleField, Sear
 
 from dotenv import load_dotenv
 
+from rag_metrics import MetricsLog
+from vector_index import VectorIndex
+
 load_dotenv()
 
 client = AzureAIChatCompletionClient(
@@ -29,33 +39,6 @@ client = AzureAIChatCompletionClient(
     },
 )
 
-# Initialize Azure AI Search with persistent storage
-search_service_endpoint = os.getenv("AZURE_SEARCH_SERVICE_ENDPOINT")
-search_api_key = os.getenv("AZURE_SEARCH_API_KEY")
-index_name = "travel-documents"
-
-search_client = SearchClient(
-    endpoint=search_service_endpoint,
-    index_name=index_name,
-    credential=AzureKeyCredential(search_api_key)
-)
-
-index_client = SearchIndexClient(
-    endpoint=search_service_endpoint,
-    credential=AzureKeyCredential(search_api_key)
-)
-
-# Define the index schema
-fields = [
-    SimpleField(name="id", type=SearchFieldDataType.String, key=True),
-    SearchableField(name="content", type=SearchFieldDataType.String)
-]
-
-index = SearchIndex(name=index_name, fields=fields)
-
-# Create the index
-# index_client.create_index(index)
-
 # Enhanced sample documents
 documents = [
     {"id": "1", "content": "Contoso Travel offers luxury vacation packages to exotic destinations worldwide."},
@@ -65,18 +48,55 @@ documents = [
     {"id": "5", "content": "Contoso Travel provides exclusive access to boutique hotels and private guided tours."}
 ]
 
-# Add documents to the index
-# search_client.upload_documents(documents)
+# Search the documents with Azure AI Search, or with RETRIEVAL_BACKEND=local in an
+# in-process vector index, e.g. one built from a large corpus with vector_index.py
+if os.getenv("RETRIEVAL_BACKEND", "azure") == "local":
+    search_client = VectorIndex.open_or_build(os.getenv("LOCAL_INDEX_PATH", "travel-index"), documents)
+else:
+    # Initialize Azure AI Search with persistent storage
+    search_service_endpoint = os.getenv("AZURE_SEARCH_SERVICE_ENDPOINT")
+    search_api_key = os.getenv("AZURE_SEARCH_API_KEY")
+    index_name = "travel-documents"
+
+    search_client = SearchClient(
+        endpoint=search_service_endpoint,
+        index_name=index_name,
+        credential=AzureKeyCredential(search_api_key)
+    )
+
+    index_client = SearchIndexClient(
+        endpoint=search_service_endpoint,
+        credential=AzureKeyCredential(search_api_key)
+    )
+
+    # Define the index schema
+    fields = [
+        SimpleField(name="id", type=SearchFieldDataType.String, key=True),
+        SearchableField(name="content", type=SearchFieldDataType.String)
+    ]
+
+    index = SearchIndex(name=index_name, fields=fields)
+
+    # Create the index
+    # index_client.create_index(index)
+
+    # Add documents to the index
+    # search_client.upload_documents(documents)
 
 ##################################################################
 
-def get_retrieval_context(query: str) -> str:
+def retrieve_documents(query: str) -> List[Dict]:
+    """Runs the search query (Azure AI Search or the local vector index) and returns the matching documents."""
     results = search_client.search(query)
-    context_strings = []
-    for result in results:
-        context_strings.append(f"Document: {result['content']}")
+    return [{"id": result.get("id"), "content": result["content"]} for result in results]
+
+def format_retrieval_context(retrieved: List[Dict]) -> str:
+    context_strings = [f"Document: {doc['content']}" for doc in retrieved]
     return "\n\n".join(context_strings) if context_strings else "No results found"
 
+def get_retrieval_context(query: str) -> str:
+    return format_retrieval_context(retrieve_documents(query))
+
 def get_weather_data(location: str) -> str:
     """
     Simulates retrieving weather data for a given location.
@@ -105,45 +125,209 @@ def get_weather_data(location: str) -> str:
     else:
         return f"No weather data available for {location}."
 
+@dataclass
+class RAGRequestContext:
+    """
+    Everything retrieved for one query. It is fetched once and then shared by the
+    display, the prompt and the evaluator, so a query costs one search round trip.
+    """
+    query: str
+    location: Optional[str] = None
+    documents: List[Dict] = field(default_factory=list)
+    weather: str = ""
+
+    @classmethod
+    def fetch(cls, query: str, location: Optional[str] = None) -> "RAGRequestContext":
+        return cls(
+            query=query,
+            location=location,
+            documents=retrieve_documents(query),
+            weather=get_weather_data(location) if location else "",
+        )
+
+    @property
+    def retrieval_context(self) -> str:
+        return format_retrieval_context(self.documents)
+
+    def augmented_query(self) -> str:
+        weather_intro = f"\nWeather Information for {self.location}:\n" if self.weather else ""
+        return (
+            f"Retrieved Context:\n{self.retrieval_context}\n\n"
+            f"{weather_intro}{self.weather}\n\n"
+            f"User Query: {self.query}\n\n"
+            "Based ONLY on the above context, please provide the answer."
+        )
+
+    def evaluation_context(self) -> List[Dict]:
+        """The documents the model actually saw, with the weather report as one more document."""
+        context = list(self.documents)
+        if self.weather:
+            context.append({"id": f"weather-{self.location}", "content": self.weather})
+        return context
+
+    def display(self):
+        print("\n--- RAG Context ---")
+        print(self.retrieval_context)
+        if self.weather:
+            print(f"\n--- Weather Context for {self.location} ---")
+            print(self.weather)
+        print("-------------------\n")
+
 ##################################################################
 
 # Create agents with enhanced capabilities
-assistant = AssistantAgent(
-    name="assistant",
-    model_client=client,
-    system_message=(
-        "You are a helpful AI assistant that provides answers using ONLY the provided context. "
-        "Do NOT include any external information. Base your answer entirely on the context given below."
-    ),
+def create_assistant() -> AssistantAgent:
+    return AssistantAgent(
+        name="assistant",
+        model_client=client,
+        system_message=(
+            "You are a helpful AI assistant that provides answers using ONLY the provided context. "
+            "Do NOT include any external information. Base your answer entirely on the context given below."
+        ),
+    )
+
+assistant = create_assistant()
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Words that say nothing about what a query is about
+STOPWORDS = frozenset(
+    "a an and are about can do does for from how i in is it me my of on or our the their there to was "
+    "what when where which who why will with you your".split()
 )
 
 class RAGEvaluator:
-    def __init__(self):
+    """
+    Scores responses against the documents they were generated from.
+
+    Documents are tokenized once into sorted arrays of token ids and reused for
+    every response that cites them. `evaluate_batch` scores a whole batch of
+    (query, response, context) triples with a few NumPy set operations over
+    flat token arrays: a document is cited when at least
+    `citation_threshold` of its distinct tokens appear in the response, and
+    relevant when it contains at least `relevance_threshold` of the query's
+    content words. `evaluation_time` is each response's share of the time spent
+    scoring its batch.
+
+    With a `metrics_log`, every scored response is appended to it (see
+    rag_metrics.py) and, unless `keep_responses` says otherwise, no longer kept
+    in `responses`.
+    """
+
+    def __init__(self, keep_responses: Optional[bool] = None, corpus: Optional[List[Dict]] = None,
+                 citation_threshold: float = 0.8, relevance_threshold: float = 0.5,
+                 metrics_log: Optional[MetricsLog] = None):
+        # Batch runs stream their results to disk instead of keeping them here
+        self.keep_responses = metrics_log is None if keep_responses is None else keep_responses
+        self.metrics_log = metrics_log
+        self.citation_threshold = citation_threshold
+        self.relevance_threshold = relevance_threshold
         self.responses: List[Dict] = []
+        self._vocabulary: Dict[str, int] = {}
+        self._documents: Dict[str, np.ndarray] = {}
+        for doc in corpus or []:
+            self._doc_tokens(doc["content"])
 
-    def evaluate_response(self, query: str, response: str, context: List[Dict]) -> Dict:
-        # Basic metrics: response length, citation count, and a simple relevance score.
-        start_time = time.time()
-        metrics = {
-            'response_length': len(response),
-            'source_citations': sum(1 for doc in context if doc["content"] in response),
-            'evaluation_time': time.time() - start_time,
-            'context_relevance': self._calculate_relevance(query, context)
-        }
-        self.responses.append({
-            'query': query,
-            'response': response,
-            'metrics': metrics
-        })
-        return metrics
+    def _token_ids(self, text: str, add: bool = False) -> np.ndarray:
+        """Sorted ids of the distinct tokens in `text`; unknown tokens are added to the vocabulary or skipped."""
+        tokens = set(TOKEN_PATTERN.findall(text.lower()))
+        if add:
+            for token in tokens:
+                self._vocabulary.setdefault(token, len(self._vocabulary))
+        ids = [token_id for token_id in map(self._vocabulary.get, tokens) if token_id is not None]
+        ids.sort()
+        return np.array(ids, dtype=np.int64)
+
+    @staticmethod
+    def _contains(sorted_keys: np.ndarray, keys: np.ndarray) -> np.ndarray:
+        """Vectorized membership of `keys` in the sorted array `sorted_keys`."""
+        if not len(sorted_keys):
+            return np.zeros(len(keys), dtype=bool)
+        positions = np.minimum(np.searchsorted(sorted_keys, keys), len(sorted_keys) - 1)
+        return sorted_keys[positions] == keys
+
+    def _doc_tokens(self, content: str) -> np.ndarray:
+        tokens = self._documents.get(content)
+        if tokens is None:
+            tokens = self._documents[content] = self._token_ids(content, add=True)
+        return tokens
+
+    def evaluate_batch(self, queries: List[str], responses: List[str], contexts: List[List[Dict]],
+                       processing_times: Optional[List[float]] = None) -> List[Dict]:
+        start_time = time.perf_counter()
+        doc_tokens = [[self._doc_tokens(doc["content"]) for doc in context] for context in contexts]
+        response_tokens = [self._token_ids(response) for response in responses]
+        query_words = [{w for w in TOKEN_PATTERN.findall(query.lower()) if w not in STOPWORDS} for query in queries]
+        query_tokens = [self._token_ids(" ".join(words)) for words in query_words]
+
+        # One segment per (response, document) pair. Tokens are offset by segment or
+        # response, which keeps every flat array sorted, so one binary search over a
+        # flat array compares every pair at once
+        vocabulary_size = max(len(self._vocabulary), 1)
+        segment_docs = [tokens for docs in doc_tokens for tokens in docs]
+        segment_owner = np.repeat(np.arange(len(contexts)), [len(docs) for docs in doc_tokens])
+        segments = len(segment_docs)
+        empty = np.zeros(0, dtype=np.int64)
+        doc_lengths = np.array([len(tokens) for tokens in segment_docs], dtype=np.int64)
+        doc_segment = np.repeat(np.arange(segments), doc_lengths)
+        doc_flat = np.concatenate(segment_docs) if segments else empty
+
+        # Citations: share of each document's tokens found in its response
+        response_keys = np.concatenate(
+            [tokens + i * vocabulary_size for i, tokens in enumerate(response_tokens)]) if responses else empty
+        doc_keys = doc_flat + segment_owner[doc_segment] * vocabulary_size
+        found = np.bincount(doc_segment, weights=self._contains(response_keys, doc_keys), minlength=segments)
+        cited = (doc_lengths > 0) & (found >= self.citation_threshold * doc_lengths)
+
+        # Relevance: share of the query's content words found in each document
+        query_lengths = np.array([len(words) for words in query_words], dtype=np.int64)
+        per_segment_query = [query_tokens[owner] for owner in segment_owner]
+        query_segment = np.repeat(np.arange(segments), [len(tokens) for tokens in per_segment_query])
+        query_flat = np.concatenate(per_segment_query) if segments else empty
+        hits = np.bincount(
+            query_segment,
+            weights=self._contains(doc_flat + doc_segment * vocabulary_size, query_flat + query_segment * vocabulary_size),
+            minlength=segments,
+        )
+        owner_query_lengths = query_lengths[segment_owner]
+        relevant = (owner_query_lengths > 0) & (hits >= self.relevance_threshold * owner_query_lengths)
 
-    def _calculate_relevance(self, query: str, context: List[Dict]) -> float:
-        # Simple relevance score: fraction of the documents where the query appears.
-        return sum(1 for c in context if query.lower() in c["content"].lower()) / len(context)
+        citations = np.bincount(segment_owner, weights=cited, minlength=len(contexts))
+        relevant_docs = np.bincount(segment_owner, weights=relevant, minlength=len(contexts))
+        context_sizes = np.array([len(context) for context in contexts])
+        relevance = np.divide(relevant_docs, context_sizes, out=np.zeros(len(contexts)), where=context_sizes > 0)
+        evaluation_time = (time.perf_counter() - start_time) / max(len(responses), 1)
+
+        results = []
+        for i, (query, response) in enumerate(zip(queries, responses)):
+            metrics = {
+                'response_length': len(response),
+                'source_citations': int(citations[i]),
+                'evaluation_time': evaluation_time,
+                'context_relevance': float(relevance[i]),
+            }
+            if self.keep_responses:
+                self.responses.append({
+                    'query': query,
+                    'response': response,
+                    'metrics': metrics
+                })
+            results.append(metrics)
+        if self.metrics_log is not None:
+            self.metrics_log.append(queries, responses, results, processing_times, context_sizes.tolist())
+        return results
+
+    def evaluate_response(self, query: str, response: str, context: List[Dict],
+                          processing_time: Optional[float] = None) -> Dict:
+        # Basic metrics: response length, citation count, and a simple relevance score.
+        processing_times = None if processing_time is None else [processing_time]
+        return self.evaluate_batch([query], [response], [context], processing_times)[0]
 
 ##################################################################
 
-async def ask_unified_rag(query: str, evaluator: RAGEvaluator, location: str = None):
+async def ask_unified_rag(query: str, evaluator: RAGEvaluator, location: str = None,
+                          context: Optional[RAGRequestContext] = None,
+                          agent: Optional[AssistantAgent] = None):
     """
     A unified RAG function that combines both document retrieval and weather data
     based on the query and optional location parameter.
@@ -152,47 +336,31 @@ async def ask_unified_rag(query: str, evaluator: RAGEvaluator, location: str = N
         query: The user's question
         evaluator: The RAG evaluator to measure response quality
         location: Optional location for weather queries
+        context: Retrieval results already fetched for this query; fetched here if omitted
+        agent: Assistant to ask; defaults to the shared one, whose conversation grows with every query
     """
     try:
-        # Get context from both sources
-        retrieval_context = get_retrieval_context(query)
-        
-        # If location is provided, add weather data
-        weather_context = ""
-        if location:
-            weather_context = get_weather_data(location)
-            weather_intro = f"\nWeather Information for {location}:\n"
-        else:
-            weather_intro = ""
-        
+        # Get context from both sources, unless the caller already has it
+        if context is None:
+            context = RAGRequestContext.fetch(query, location)
+
         # Augment the query with both contexts if available
-        augmented_query = (
-            f"Retrieved Context:\n{retrieval_context}\n\n"
-            f"{weather_intro}{weather_context}\n\n"
-            f"User Query: {query}\n\n"
-            "Based ONLY on the above context, please provide the answer."
-        )
+        augmented_query = context.augmented_query()
 
         # Send the augmented query as a user message
         start_time = time.time()
-        response = await assistant.on_messages(
+        response = await (agent or assistant).on_messages(
             [TextMessage(content=augmented_query, source="user")],
             cancellation_token=CancellationToken(),
         )
         processing_time = time.time() - start_time
 
-        # Create combined context for evaluation
-        combined_context = documents.copy()  # Start with travel documents
-        
-        # Add weather as a document if it exists
-        if location and weather_context:
-            combined_context.append({"id": f"weather-{location}", "content": weather_context})
-        
-        # Evaluate the response
+        # Evaluate the response against what was actually retrieved for it
         metrics = evaluator.evaluate_response(
             query=query,
             response=response.chat_message.content,
-            context=combined_context
+            context=context.evaluation_context(),
+            processing_time=processing_time,
         )
         
         result = {
@@ -210,8 +378,8 @@ async def ask_unified_rag(query: str, evaluator: RAGEvaluator, location: str = N
         print(f"Error processing unified query: {e}")
         return None
 
-async def main():
-    evaluator = RAGEvaluator()
+async def main(metrics_log: Optional[MetricsLog] = None):
+    evaluator = RAGEvaluator(metrics_log=metrics_log)
     
     # Define user queries similar to the Semantic Kernel example
     user_inputs = [
@@ -235,27 +403,161 @@ async def main():
         else:
             print(f"\nProcessing Query: {query}")
         
-        # Get the RAG context for printing (similar to the Semantic Kernel example)
-        retrieval_context = get_retrieval_context(query)
-        weather_context = get_weather_data(location) if location else ""
+        # Retrieve once; the same context is printed, sent to the model and evaluated
+        context = RAGRequestContext.fetch(query, location)
         
         # Print the RAG context for transparency
-        print("\n--- RAG Context ---")
-        print(retrieval_context)
-        if weather_context:
-            print(f"\n--- Weather Context for {location} ---")
-            print(weather_context)
-        print("-------------------\n")
+        context.display()
             
-        result = await ask_unified_rag(query, evaluator, location)
+        result = await ask_unified_rag(query, evaluator, location, context=context)
         if result:
             print("Response:", result['response'])
             print("\nMetrics:", result['metrics'])
         print("\n" + "="*60 + "\n")
 
+##################################################################
+
+def read_checkpoint(path: str) -> Tuple[int, set, set]:
+    """Returns the first input line not yet settled, the settled lines after it and the failed lines to retry."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        return 0, set(), set()
+    return state["next_line"], set(state["done"]), set(state.get("failed", []))
+
+def write_checkpoint(path: str, next_line: int, done: set, failed: set):
+    # Written to a temporary file first so a crash never leaves a torn checkpoint
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"next_line": next_line, "done": sorted(done), "failed": sorted(failed)}, f)
+    os.replace(tmp_path, path)
+
+async def run_batch(lines: Iterable[str], output_path: str, concurrency: int = 8,
+                    checkpoint_path: Optional[str] = None, window: Optional[int] = None,
+                    metrics_log: Optional[MetricsLog] = None) -> Dict[str, Any]:
+    """
+    Answers a stream of JSONL queries concurrently and appends one JSONL result per query as it completes.
+
+    Each input line is an object with a "query", an optional "location" and an
+    optional "id". At most `concurrency` queries run at once, and input is read
+    no further than `window` lines past the oldest unanswered one, so memory
+    stays flat however long the input is. The checkpoint records that oldest
+    line plus the settled lines after it, and separately the lines whose
+    retrieval or model call failed; a rerun with the same output skips
+    everything already answered and retries the failed lines, so a retried
+    line has its error record followed by its answer. Invalid input lines are
+    not retried. A query answered just before a crash may be written twice,
+    since results are written before the checkpoint. With a `metrics_log`,
+    the summary includes the run's aggregate metrics.
+    """
+    checkpoint_path = checkpoint_path or f"{output_path}.checkpoint"
+    window = window or concurrency * 4
+    next_line, done, failed = read_checkpoint(checkpoint_path)
+    retry = set(failed)
+    semaphore = asyncio.Semaphore(concurrency)
+    window_open = asyncio.Condition()
+    evaluator = RAGEvaluator(keep_responses=False, metrics_log=metrics_log)
+    summary = {"answered": 0, "failed": 0, "skipped": next_line + len(done) - len(retry), "processing_time": 0.0}
+    started = time.time()
+
+    with open(output_path, "a", encoding="utf-8") as output:
+        async def finish(line_number: int, record: Optional[Dict], retryable: bool = False):
+            nonlocal next_line
+            if record is not None:
+                output.write(json.dumps(record, ensure_ascii=False) + "\n")
+                output.flush()
+            # Failed lines still settle, so one bad line never stalls the window; they are kept for a rerun
+            if retryable:
+                failed.add(line_number)
+            else:
+                failed.discard(line_number)
+            if line_number >= next_line:
+                done.add(line_number)
+            while next_line in done:
+                done.remove(next_line)
+                next_line += 1
+            write_checkpoint(checkpoint_path, next_line, done, failed)
+            async with window_open:
+                window_open.notify_all()
+
+        async def answer(line_number: int, item: Dict):
+            query, location = item["query"], item.get("location")
+            record = {"line": line_number, "id": item.get("id"), "query": query, "location": location}
+            result = None
+            async with semaphore:
+                try:
+                    # The search client is synchronous; keep it off the event loop
+                    context = await asyncio.to_thread(RAGRequestContext.fetch, query, location)
+                except Exception as e:
+                    record["error"] = f"Retrieval failed: {e}"
+                else:
+                    try:
+                        result = await ask_unified_rag(
+                            query, evaluator, location, context=context, agent=create_assistant())
+                    except Exception as e:
+                        record["error"] = f"Answer failed: {e}"
+            if result:
+                summary["answered"] += 1
+                summary["processing_time"] += result["processing_time"]
+                record.update(response=result["response"], processing_time=result["processing_time"],
+                              metrics=result["metrics"], documents=[doc["id"] for doc in context.documents])
+            else:
+                summary["failed"] += 1
+                # ask_unified_rag logs model errors and returns None
+                record.setdefault("error", "Answer failed: no response from the model, see the log")
+            await finish(line_number, record, retryable=not result)
+
+        tasks = set()
+        for line_number, line in enumerate(lines):
+            if (line_number < next_line or line_number in done) and line_number not in retry:
+                continue
+            async with window_open:
+                await window_open.wait_for(lambda: line_number - next_line < window)
+            if not line.strip():
+                await finish(line_number, None)
+                continue
+            try:
+                item = json.loads(line)
+                if not isinstance(item, dict) or not item.get("query"):
+                    raise ValueError('expected an object with a "query"')
+            except ValueError as e:
+                summary["failed"] += 1
+                await finish(line_number, {"line": line_number, "error": f"Invalid input line: {e}"})
+                continue
+            task = asyncio.create_task(answer(line_number, item))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)
+
+    summary["wall_time"] = time.time() - started
+    summary["queries_per_second"] = summary["answered"] / summary["wall_time"] if summary["wall_time"] else 0.0
+    if metrics_log is not None:
+        summary["metrics"] = metrics_log.summary()
+    return summary
+
 if __name__ == "__main__":
-    import asyncio
-    if asyncio.get_event_loop().is_running():
-        asyncio.run(main())
-    else:
-        asyncio.run(main())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="AutoGen + Azure AI Search RAG demo")
+    parser.add_argument("--batch", help="JSONL file of {\"query\", \"location\"} objects to answer, or - for stdin")
+    parser.add_argument("--output", default="rag-results.jsonl", help="JSONL file the batch results are appended to")
+    parser.add_argument("--concurrency", type=int, default=8, help="queries answered at the same time")
+    parser.add_argument("--checkpoint", help="checkpoint file, by default the output path plus .checkpoint")
+    parser.add_argument("--metrics-dir", help="directory to log evaluation metrics to; compare runs with rag_metrics.py")
+    parser.add_argument("--run", help="name of the metrics run, by default the start time; reuse it to continue a run")
+    args = parser.parse_args()
+
+    metrics_log = MetricsLog(args.metrics_dir, args.run) if args.metrics_dir else None
+    try:
+        if args.batch:
+            batch_input = sys.stdin if args.batch == "-" else open(args.batch, "r", encoding="utf-8")
+            with batch_input:
+                batch_summary = asyncio.run(run_batch(
+                    batch_input, args.output, args.concurrency, args.checkpoint, metrics_log=metrics_log))
+            print(json.dumps(batch_summary), file=sys.stderr)
+        else:
+            asyncio.run(main(metrics_log))
+    finally:
+        if metrics_log is not None:
+            metrics_log.close()
+            print(json.dumps(metrics_log.summary()), file=sys.stderr)
@@ -19,6 +19,8 @@ from semantic_kernel.connectors.ai.open_ai import OpenAIChatCompletion
 from semantic_kernel.contents import FunctionCallContent,FunctionResultContent, StreamingTextContent
 from semantic_kernel.functions import kernel_function
 
+from vector_index import VectorIndex
+
 load_dotenv()
 # Initialize the asynchronous OpenAI client
 client = AsyncOpenAI(
@@ -34,7 +36,7 @@ chat_completion_service = OpenAIChatCompletion(
 
 class SearchPlugin:
 
-    def __init__(self, search_client: SearchClient):
+    def __init__(self, search_client: SearchClient | VectorIndex):
         self.search_client = search_client
 
     @kernel_function(
@@ -84,40 +86,6 @@ class WeatherInfoPlugin:
 
 ######################################################################
 
-# Initialize Azure AI Search with persistent storage
-search_service_endpoint = os.getenv("AZURE_SEARCH_SERVICE_ENDPOINT")
-search_api_key = os.getenv("AZURE_SEARCH_API_KEY")
-index_name = "travel-documents"
-
-search_client = SearchClient(
-    endpoint=search_service_endpoint,
-    index_name=index_name,
-    credential=AzureKeyCredential(search_api_key)
-)
-
-index_client = SearchIndexClient(
-    endpoint=search_service_endpoint,
-    credential=AzureKeyCredential(search_api_key)
-)
-
-# Define the index schema
-fields = [
-    SimpleField(name="id", type=SearchFieldDataType.String, key=True),
-    SearchableField(name="content", type=SearchFieldDataType.String)
-]
-
-index = SearchIndex(name=index_name, fields=fields)
-
-# Check if index already exists if not, create it
-try:
-    existing_index = index_client.get_index(index_name)
-    print(f"Index '{index_name}' already exists, using the existing index.")
-except Exception:
-    # Create the index if it doesn't exist
-    print(f"Creating new index '{index_name}'...")
-    index_client.create_index(index)
-
-
 # Enhanced sample documents
 documents = [
     {"id": "1", "content": "Contoso Travel offers luxury vacation packages to exotic destinations worldwide."},
@@ -127,8 +95,46 @@ documents = [
     {"id": "5", "content": "Contoso Travel provides exclusive access to boutique hotels and private guided tours."}
 ]
 
-# Add documents to the index
-search_client.upload_documents(documents)
+# Search the documents with Azure AI Search, or with RETRIEVAL_BACKEND=local in an
+# in-process vector index, e.g. one built from a large corpus with vector_index.py
+if os.getenv("RETRIEVAL_BACKEND", "azure") == "local":
+    search_client = VectorIndex.open_or_build(os.getenv("LOCAL_INDEX_PATH", "travel-index"), documents)
+else:
+    # Initialize Azure AI Search with persistent storage
+    search_service_endpoint = os.getenv("AZURE_SEARCH_SERVICE_ENDPOINT")
+    search_api_key = os.getenv("AZURE_SEARCH_API_KEY")
+    index_name = "travel-documents"
+
+    search_client = SearchClient(
+        endpoint=search_service_endpoint,
+        index_name=index_name,
+        credential=AzureKeyCredential(search_api_key)
+    )
+
+    index_client = SearchIndexClient(
+        endpoint=search_service_endpoint,
+        credential=AzureKeyCredential(search_api_key)
+    )
+
+    # Define the index schema
+    fields = [
+        SimpleField(name="id", type=SearchFieldDataType.String, key=True),
+        SearchableField(name="content", type=SearchFieldDataType.String)
+    ]
+
+    index = SearchIndex(name=index_name, fields=fields)
+
+    # Check if index already exists if not, create it
+    try:
+        existing_index = index_client.get_index(index_name)
+        print(f"Index '{index_name}' already exists, using the existing index.")
+    except Exception:
+        # Create the index if it doesn't exist
+        print(f"Creating new index '{index_name}'...")
+        index_client.create_index(index)
+
+    # Add documents to the index
+    search_client.upload_documents(documents)
 
 agent = ChatCompletionAgent(
     service=chat_completion_service,
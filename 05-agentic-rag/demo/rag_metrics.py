@@ -0,0 +1,291 @@
+"""
+Persistent, append-only metrics log for RAGEvaluator, with streaming aggregates.
+
+Every evaluated response becomes one fixed-width binary record in
+`<directory>/<run>.metrics`; the query and response text go to
+`<directory>/<run>.text`, referenced from the record by offset and length.
+Aggregates (processing time percentiles, citation rates, relevance
+histogram) are kept in fixed-size histograms, so memory does not grow with the
+number of responses, and can be recomputed from any log by streaming it in
+chunks. Runs are kept side by side to compare them:
+
+    python rag_metrics.py rag-metrics                 # summary of every run
+    python rag_metrics.py rag-metrics RUN_A RUN_B     # just these runs
+"""
+import argparse
+import json
+import math
+import os
+import time
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+MAGIC = b"RAGMETRC"
+VERSION = 1
+HEADER = np.dtype([("magic", "S8"), ("version", "<u4"), ("record_size", "<u4")])
+
+# One evaluated response: 40 bytes. A processing time that was not measured is
+# NaN and an unknown number of context documents is UNKNOWN_COUNT; aggregates
+# leave both out rather than count them as zero.
+RECORD = np.dtype([
+    ("timestamp", "<f8"),
+    ("processing_time", "<f4"),
+    ("evaluation_time", "<f4"),
+    ("context_relevance", "<f4"),
+    ("source_citations", "<u2"),
+    ("context_documents", "<u2"),
+    ("response_length", "<u4"),
+    ("text_offset", "<u8"),
+    ("text_length", "<u4"),
+])
+
+RELEVANCE_BINS = 10
+UNKNOWN_COUNT = 0xFFFF
+
+
+class LogHistogram:
+    """
+    Counts values in logarithmic buckets that each grow by `growth`.
+
+    Quantiles are read from the bucket boundaries, so they are exact to within
+    half a bucket (about 1% with the default growth) whatever the number of
+    values. Values below `minimum` or above `maximum` fall into the end buckets.
+    """
+
+    def __init__(self, minimum: float = 1e-3, maximum: float = 1e4, growth: float = 1.02):
+        self.minimum = minimum
+        self.growth = growth
+        self.counts = np.zeros(int(math.ceil(math.log(maximum / minimum, growth))) + 2, dtype=np.int64)
+
+    def add(self, values: np.ndarray):
+        values = np.asarray(values, dtype=np.float64)
+        with np.errstate(divide="ignore"):
+            buckets = np.floor(np.log(np.maximum(values, 0) / self.minimum) / math.log(self.growth)) + 1
+        buckets = np.clip(np.nan_to_num(buckets, neginf=0), 0, len(self.counts) - 1).astype(np.int64)
+        self.counts += np.bincount(buckets, minlength=len(self.counts))
+
+    def quantile(self, q: float) -> Optional[float]:
+        total = int(self.counts.sum())
+        if not total:
+            return None
+        bucket = int(np.searchsorted(np.cumsum(self.counts), q * total, side="left"))
+        if bucket == 0:
+            return self.minimum
+        # Geometric middle of the bucket
+        return self.minimum * self.growth ** (bucket - 0.5)
+
+
+class MetricsAggregate:
+    """Running totals over metric records, updated one chunk of records at a time."""
+
+    def __init__(self):
+        self.count = 0
+        self.timed = 0
+        self.processing = LogHistogram()
+        self.processing_sum = 0.0
+        self.processing_max = 0.0
+        self.context_counted = 0
+        self.context_documents_sum = 0
+        self.evaluation_sum = 0.0
+        self.citations = 0
+        self.cited_responses = 0
+        self.relevance_sum = 0.0
+        self.relevance_histogram = np.zeros(RELEVANCE_BINS, dtype=np.int64)
+        self.response_length_sum = 0
+
+    def update(self, records: np.ndarray):
+        if not len(records):
+            return
+        processing = records["processing_time"].astype(np.float64)
+        processing = processing[~np.isnan(processing)]
+        self.count += len(records)
+        if len(processing):
+            self.timed += len(processing)
+            self.processing.add(processing)
+            self.processing_sum += float(processing.sum())
+            self.processing_max = max(self.processing_max, float(processing.max()))
+        context_documents = records["context_documents"]
+        context_documents = context_documents[context_documents != UNKNOWN_COUNT]
+        self.context_counted += len(context_documents)
+        self.context_documents_sum += int(context_documents.sum(dtype=np.int64))
+        self.evaluation_sum += float(records["evaluation_time"].sum(dtype=np.float64))
+        citations = records["source_citations"]
+        self.citations += int(citations.sum(dtype=np.int64))
+        self.cited_responses += int(np.count_nonzero(citations))
+        relevance = records["context_relevance"].astype(np.float64)
+        self.relevance_sum += float(relevance.sum())
+        bins = np.minimum((np.clip(relevance, 0, 1) * RELEVANCE_BINS).astype(np.int64), RELEVANCE_BINS - 1)
+        self.relevance_histogram += np.bincount(bins, minlength=RELEVANCE_BINS)
+        self.response_length_sum += int(records["response_length"].sum(dtype=np.int64))
+
+    def summary(self) -> Dict:
+        count = self.count or 1
+        return {
+            "responses": self.count,
+            "processing_time": {
+                "timed": self.timed,
+                "p50": self.processing.quantile(0.50),
+                "p95": self.processing.quantile(0.95),
+                "p99": self.processing.quantile(0.99),
+                "mean": self.processing_sum / self.timed if self.timed else None,
+                "max": self.processing_max if self.timed else None,
+            },
+            "evaluation_time_mean": self.evaluation_sum / count,
+            "citation_rate": self.cited_responses / count,
+            "citations_per_response": self.citations / count,
+            "context_relevance_mean": self.relevance_sum / count,
+            "context_relevance_histogram": self.relevance_histogram.tolist(),
+            "response_length_mean": self.response_length_sum / count,
+            "context_documents_mean": (
+                self.context_documents_sum / self.context_counted if self.context_counted else None),
+        }
+
+
+def read_records(path: str, chunk_size: int = 65536) -> Iterator[np.ndarray]:
+    """Yields the records of a metrics log in chunks read from a memory map; a torn last record is ignored."""
+    size = os.path.getsize(path)
+    if size < HEADER.itemsize:
+        return
+    header = np.fromfile(path, dtype=HEADER, count=1)[0]
+    if header["magic"] != MAGIC or header["version"] != VERSION or header["record_size"] != RECORD.itemsize:
+        raise ValueError(f"{path} is not a metrics log of this version")
+    count = (size - HEADER.itemsize) // RECORD.itemsize
+    if not count:
+        return
+    records = np.memmap(path, dtype=RECORD, mode="r", offset=HEADER.itemsize, shape=(count,))
+    for start in range(0, count, chunk_size):
+        yield np.array(records[start:start + chunk_size])
+
+
+def aggregate(path: str) -> MetricsAggregate:
+    totals = MetricsAggregate()
+    for records in read_records(path):
+        totals.update(records)
+    return totals
+
+
+class MetricsLog:
+    """
+    Appends evaluated responses of one run to `<directory>/<run>.metrics` and `.text`.
+
+    Reopening an existing run continues it: its records are streamed into the
+    aggregate first. `close` also writes `<run>.summary.json`.
+    """
+
+    def __init__(self, directory: str, run: Optional[str] = None, flush_every: int = 64):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.run = run or time.strftime("%Y%m%d-%H%M%S")
+        self.flush_every = flush_every
+        self.metrics_path = os.path.join(directory, f"{self.run}.metrics")
+        self.text_path = os.path.join(directory, f"{self.run}.text")
+        self.aggregate = aggregate(self.metrics_path) if os.path.exists(self.metrics_path) else MetricsAggregate()
+
+        new = not os.path.exists(self.metrics_path) or os.path.getsize(self.metrics_path) < HEADER.itemsize
+        self._metrics = open(self.metrics_path, "wb" if new else "r+b")
+        if new:
+            self._metrics.write(np.array([(MAGIC, VERSION, RECORD.itemsize)], dtype=HEADER).tobytes())
+        else:
+            # Drop a torn record left by a crash so the log stays aligned
+            self._metrics.seek(HEADER.itemsize + self.aggregate.count * RECORD.itemsize)
+            self._metrics.truncate()
+        self._text = open(self.text_path, "ab")
+        self._pending = 0
+
+    def append(self, queries: List[str], responses: List[str], metrics: List[Dict],
+               processing_times: Optional[List[float]] = None, context_sizes: Optional[List[int]] = None):
+        """
+        Writes one record per response, in one write per file.
+
+        Processing times and context sizes that are missing, as a whole or
+        per response (None), are recorded as unknown.
+        """
+        records = np.zeros(len(responses), dtype=RECORD)
+        offset = self._text.tell()
+        lines = []
+        for i, (query, response) in enumerate(zip(queries, responses)):
+            line = (json.dumps({"query": query, "response": response}, ensure_ascii=False) + "\n").encode("utf-8")
+            records[i]["text_offset"] = offset
+            records[i]["text_length"] = len(line)
+            offset += len(line)
+            lines.append(line)
+        records["timestamp"] = time.time()
+        records["processing_time"] = (
+            np.nan if processing_times is None else [np.nan if t is None else t for t in processing_times])
+        records["evaluation_time"] = [m["evaluation_time"] for m in metrics]
+        records["context_relevance"] = [m["context_relevance"] for m in metrics]
+        records["source_citations"] = np.minimum([m["source_citations"] for m in metrics], 0xFFFF)
+        records["context_documents"] = UNKNOWN_COUNT if context_sizes is None else [
+            UNKNOWN_COUNT if size is None else min(size, UNKNOWN_COUNT - 1) for size in context_sizes]
+        records["response_length"] = [m["response_length"] for m in metrics]
+
+        # Text first: a record never points past the end of the text file
+        self._text.write(b"".join(lines))
+        self._metrics.write(records.tobytes())
+        self.aggregate.update(records)
+        self._pending += len(records)
+        if self._pending >= self.flush_every:
+            self.flush()
+
+    def text(self, record: np.void) -> Dict:
+        """The query and response a record refers to."""
+        self._text.flush()
+        with open(self.text_path, "rb") as f:
+            f.seek(int(record["text_offset"]))
+            return json.loads(f.read(int(record["text_length"])))
+
+    def summary(self) -> Dict:
+        return {"run": self.run, **self.aggregate.summary()}
+
+    def flush(self):
+        self._text.flush()
+        self._metrics.flush()
+        self._pending = 0
+
+    def close(self):
+        self.flush()
+        self._text.close()
+        self._metrics.close()
+        with open(os.path.join(self.directory, f"{self.run}.summary.json"), "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, indent=2)
+
+
+def list_runs(directory: str) -> List[str]:
+    return sorted(name[:-len(".metrics")] for name in os.listdir(directory) if name.endswith(".metrics"))
+
+
+def format_summary(run: str, summary: Dict) -> str:
+    def ms(value):
+        return f"{value * 1000:>9.1f}" if value is not None else f"{'-':>9}"
+
+    processing = summary["processing_time"]
+    return (f"{run:<20} {summary['responses']:>9} {ms(processing['p50'])} {ms(processing['p95'])} "
+            f"{ms(processing['p99'])} {summary['citation_rate']:>9.1%} {summary['context_relevance_mean']:>9.2f}  "
+            f"{summary['context_relevance_histogram']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize and compare RAG metrics logs")
+    parser.add_argument("directory", help="directory the metrics logs were written to")
+    parser.add_argument("runs", nargs="*", help="runs to show, by default all of them")
+    parser.add_argument("--json", action="store_true", help="print the summaries as JSON")
+    args = parser.parse_args()
+
+    missing = [run for run in args.runs if not os.path.exists(os.path.join(args.directory, f"{run}.metrics"))]
+    if missing:
+        parser.error(f"no metrics log for {', '.join(missing)} in {args.directory}")
+    summaries = {
+        run: aggregate(os.path.join(args.directory, f"{run}.metrics")).summary()
+        for run in args.runs or list_runs(args.directory)
+    }
+    if args.json:
+        print(json.dumps(summaries, indent=2))
+        return
+    print(f"{'run':<20} {'responses':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'cited':>9} {'relevance':>9}  histogram")
+    for run, summary in summaries.items():
+        print(format_summary(run, summary))
+
+
+if __name__ == "__main__":
+    main()
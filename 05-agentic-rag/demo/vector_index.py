@@ -0,0 +1,496 @@
+"""
+In-process vector index for the travel-document RAG demos.
+
+Document vectors live in a memory-mapped .npy matrix (float32, float16 or int8
+with a scale per row), so an index of hundreds of thousands of chunks opens
+instantly and only the pages a search touches are read. Small indexes are
+searched exactly; larger ones are split into IVF lists (k-means clusters
+stored contiguously) and a search scans only the `nprobe` lists nearest to
+the query. Metadata fields are stored as integer code columns for filtering.
+int8 quarters the file at about the cost of a float32 search; float16 halves
+it, but NumPy converts it to float32 in software, which makes exact float16
+search several times slower on most CPUs.
+
+`VectorIndex` answers the calls the demos already make, so it can replace
+their retrieval client unchanged:
+
+- `search(search_text, top=..., filter=...)` like azure.search.documents.SearchClient
+- `query(query_texts=..., n_results=..., where=...)` like a ChromaDB collection
+
+Build and query an index from the command line:
+
+    python vector_index.py build corpus.jsonl travel-index --dtype int8
+    python vector_index.py search travel-index "travel insurance" --filter '{"source": "training"}'
+
+Each corpus line is an object with an "id", the "content" and any metadata,
+either as top-level fields or under "metadata". vector_index_benchmark.py
+measures recall against latency for the storage and search modes.
+"""
+import argparse
+import hashlib
+import json
+import math
+import mmap
+import os
+import re
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Below this many rows an index is searched exactly; above it, build() adds IVF lists
+EXACT_THRESHOLD = 20000
+
+# Rows scored per matrix product, which bounds the memory of an exact search
+CHUNK_ROWS = 65536
+
+# float16 and int8 rows are converted to float32 this many at a time, so the copy stays in cache
+CAST_ROWS = 1024
+
+DTYPES = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+
+# Results per search when the caller does not say; the demos put them all in the prompt
+DEFAULT_TOP = 3
+
+Embedder = Callable[[List[str]], np.ndarray]
+
+
+class HashingEmbedder:
+    """
+    Embeds text by signed feature hashing of its words and word bigrams, L2-normalized.
+
+    Needs no model or network, and texts that share words get a positive cosine
+    similarity, which is enough for keyword-like retrieval over the demo
+    corpus. For semantic search pass any callable that maps a list of texts to
+    an (n, dimensions) array, such as an embedding model client, to `build`
+    and `VectorIndex`.
+    """
+
+    def __init__(self, dimensions: int = 256):
+        self.dimensions = dimensions
+        self._feature = lru_cache(maxsize=1 << 18)(self._hash)
+
+    def _hash(self, feature: str) -> Tuple[int, float]:
+        digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+        return digest % self.dimensions, 1.0 if digest >> 63 else -1.0
+
+    def __call__(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = TOKEN_PATTERN.findall(text.lower())
+            for feature in [*words, *(f"{a} {b}" for a, b in zip(words, words[1:]))]:
+                column, sign = self._feature(feature)
+                vectors[row, column] += sign
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return np.divide(vectors, norms, out=vectors, where=norms > 0)
+
+
+def quantize(vectors: np.ndarray, dtype: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """Converts float32 rows to the storage dtype; int8 rows come with the scale that restores them."""
+    if dtype != "int8":
+        return vectors.astype(DTYPES[dtype]), None
+    scales = np.abs(vectors).max(axis=1) / 127
+    safe = np.where(scales > 0, scales, 1)
+    return np.rint(vectors / safe[:, None]).astype(np.int8), scales.astype(np.float32)
+
+
+def kmeans(vectors: np.ndarray, clusters: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """Spherical k-means: unit-length centroids that maximize the cosine similarity to their rows."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = assign(vectors, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, vectors)
+        counts = np.bincount(assignments, minlength=clusters)
+        # Empty clusters restart from a random row
+        empty = np.flatnonzero(counts == 0)
+        sums[empty] = vectors[rng.choice(len(vectors), len(empty))]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        centroids = np.divide(sums, norms, out=sums, where=norms > 0)
+    return centroids
+
+
+def assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    return np.concatenate([
+        np.argmax(vectors[start:start + CHUNK_ROWS] @ centroids.T, axis=1)
+        for start in range(0, len(vectors), CHUNK_ROWS)
+    ]) if len(vectors) else np.zeros(0, dtype=np.int64)
+
+
+def split_document(document: Dict) -> Tuple[str, str, Dict[str, Any]]:
+    """The id, content and metadata of a corpus document."""
+    metadata = {key: value for key, value in document.items() if key not in ("id", "content", "metadata", "vector")}
+    metadata.update(document.get("metadata") or {})
+    return str(document["id"]), document["content"], metadata
+
+
+def top_k(rows: np.ndarray, scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    if len(scores) > k:
+        keep = np.argpartition(-scores, k - 1)[:k]
+        rows, scores = rows[keep], scores[keep]
+    order = np.argsort(-scores, kind="stable")
+    return rows[order], scores[order]
+
+
+class VectorIndex:
+    """
+    A vector index directory opened for search; create one with `build`.
+
+    The directory holds vectors.npy (rows grouped by IVF list), scales.npy for
+    int8 rows, centroids.npy and offsets.npy for IVF, documents.jsonl with
+    document_offsets.npy, one codes-<n>.npy column per metadata field, and
+    manifest.json, which is written last.
+
+    A search is exact when the index has no IVF lists, when `exact=True`, or
+    when a filter leaves at most `exact_threshold` rows. Otherwise it scans the
+    `nprobe` lists whose centroids are nearest the query. If that finds fewer
+    than the requested results, it falls back to an exact search.
+    """
+
+    def __init__(self, path: str, embedder: Optional[Embedder] = None, nprobe: Optional[int] = None,
+                 exact_threshold: int = EXACT_THRESHOLD, top: int = DEFAULT_TOP):
+        with open(os.path.join(path, "manifest.json"), "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        self.path = path
+        self.count = self.manifest["count"]
+        self.dimensions = self.manifest["dimensions"]
+        self.dtype = self.manifest["dtype"]
+        if embedder is None:
+            if self.manifest.get("embedder") != {"type": "hashing", "dimensions": self.dimensions}:
+                raise ValueError(f"{path} was built with a custom embedder; pass the same one to open it")
+            embedder = HashingEmbedder(self.dimensions)
+        self.embed = embedder
+        self.exact_threshold = exact_threshold
+        self.top = top
+
+        self.vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        self.scales = np.load(os.path.join(path, "scales.npy"), mmap_mode="r") if self.dtype == "int8" else None
+        self.nlist = self.manifest["nlist"]
+        if self.nlist:
+            self.centroids = np.load(os.path.join(path, "centroids.npy"))
+            self.offsets = np.load(os.path.join(path, "offsets.npy"))
+        self.nprobe = nprobe or self.manifest.get("nprobe") or 1
+        self.fields: Dict[str, List[Any]] = self.manifest["fields"]
+        self._codes: Dict[str, np.ndarray] = {}
+
+        self._document_offsets = np.load(os.path.join(path, "document_offsets.npy"), mmap_mode="r")
+        with open(os.path.join(path, "documents.jsonl"), "rb") as f:
+            self._documents = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    @classmethod
+    def open_or_build(cls, path: str, documents: Iterable[Dict], **kwargs) -> "VectorIndex":
+        """Opens the index at `path`, building it from `documents` first if there is none."""
+        if not os.path.exists(os.path.join(path, "manifest.json")):
+            build(path, documents, embedder=kwargs.get("embedder"))
+        return cls(path, **kwargs)
+
+    def close(self):
+        self._documents.close()
+
+    def document(self, row: int) -> Dict:
+        start, stop = self._document_offsets[row], self._document_offsets[row + 1]
+        return json.loads(self._documents[start:stop])
+
+    def _field_codes(self, field_name: str) -> np.ndarray:
+        if field_name not in self._codes:
+            position = list(self.fields).index(field_name)
+            self._codes[field_name] = np.load(os.path.join(self.path, f"codes-{position}.npy"), mmap_mode="r")
+        return self._codes[field_name]
+
+    def mask(self, where: Dict[str, Any]) -> np.ndarray:
+        """
+        Rows matching every condition of a filter. A condition is a value, a
+        list of values, or {"$eq": value} / {"$in": [values]} as in ChromaDB.
+        """
+        matches = np.ones(self.count, dtype=bool)
+        for field_name, condition in where.items():
+            if field_name not in self.fields:
+                raise ValueError(f"Unknown metadata field '{field_name}'; filterable fields: {', '.join(self.fields)}")
+            if isinstance(condition, dict):
+                if set(condition) - {"$eq", "$in"}:
+                    raise ValueError(f"Unsupported condition on '{field_name}': {condition}")
+                wanted = condition.get("$in", []) + ([condition["$eq"]] if "$eq" in condition else [])
+            else:
+                wanted = condition if isinstance(condition, list) else [condition]
+            values = self.fields[field_name]
+            codes = [values.index(value) for value in wanted if value in values]
+            matches &= np.isin(self._field_codes(field_name), codes)
+        return matches
+
+    def _score(self, start: int, stop: int, query: np.ndarray) -> np.ndarray:
+        if self.dtype == "float32":
+            return self.vectors[start:stop] @ query
+        scores = np.empty(stop - start, dtype=np.float32)
+        for block in range(start, stop, CAST_ROWS):
+            end = min(block + CAST_ROWS, stop)
+            scores[block - start:end - start] = self.vectors[block:end].astype(np.float32) @ query
+        if self.scales is not None:
+            scores *= self.scales[start:stop]
+        return scores
+
+    def _score_rows(self, rows: np.ndarray, query: np.ndarray) -> np.ndarray:
+        scores = np.empty(len(rows), dtype=np.float32)
+        for block in range(0, len(rows), CAST_ROWS):
+            selected = rows[block:block + CAST_ROWS]
+            scores[block:block + len(selected)] = self.vectors[selected].astype(np.float32, copy=False) @ query
+        if self.scales is not None:
+            scores *= self.scales[rows]
+        return scores
+
+    def _exact(self, query: np.ndarray, k: int, allowed: Optional[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        best_rows, best_scores = [], []
+        if allowed is not None and np.count_nonzero(allowed) <= self.exact_threshold:
+            rows = np.flatnonzero(allowed)
+            for start in range(0, len(rows), CHUNK_ROWS):
+                chunk = rows[start:start + CHUNK_ROWS]
+                chunk_rows, chunk_scores = top_k(chunk, self._score_rows(chunk, query), k)
+                best_rows.append(chunk_rows)
+                best_scores.append(chunk_scores)
+        else:
+            for start in range(0, self.count, CHUNK_ROWS):
+                stop = min(start + CHUNK_ROWS, self.count)
+                rows, scores = np.arange(start, stop), self._score(start, stop, query)
+                if allowed is not None:
+                    rows, scores = rows[allowed[start:stop]], scores[allowed[start:stop]]
+                chunk_rows, chunk_scores = top_k(rows, scores, k)
+                best_rows.append(chunk_rows)
+                best_scores.append(chunk_scores)
+        if not best_rows:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        return top_k(np.concatenate(best_rows), np.concatenate(best_scores), k)
+
+    def _ivf(self, query: np.ndarray, k: int, nprobe: int, allowed: Optional[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        nearest = np.argsort(-(self.centroids @ query))[:nprobe]
+        best_rows, best_scores = [], []
+        for cluster in nearest:
+            start, stop = int(self.offsets[cluster]), int(self.offsets[cluster + 1])
+            rows, scores = np.arange(start, stop), self._score(start, stop, query)
+            if allowed is not None:
+                rows, scores = rows[allowed[start:stop]], scores[allowed[start:stop]]
+            best_rows.append(rows)
+            best_scores.append(scores)
+        return top_k(np.concatenate(best_rows), np.concatenate(best_scores), k)
+
+    def search_vector(self, query: np.ndarray, k: int, where: Optional[Dict[str, Any]] = None,
+                      nprobe: Optional[int] = None, exact: Optional[bool] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Rows and scores (cosine similarity for unit vectors) of the `k` nearest rows, best first."""
+        query = np.asarray(query, dtype=np.float32)
+        allowed = self.mask(where) if where else None
+        small = allowed is not None and np.count_nonzero(allowed) <= self.exact_threshold
+        if exact or not self.nlist or small:
+            return self._exact(query, k, allowed)
+        rows, scores = self._ivf(query, k, nprobe or self.nprobe, allowed)
+        if len(rows) < k and exact is None:
+            return self._exact(query, k, allowed)
+        return rows, scores
+
+    def retrieve(self, query: str, k: Optional[int] = None, where: Optional[Dict[str, Any]] = None,
+                 nprobe: Optional[int] = None, min_score: float = 0.0) -> List[Dict]:
+        """
+        Documents nearest to `query`, best first, as {"id", "content", "metadata", "score"};
+        ones scoring `min_score` or less (no shared features) are left out.
+        """
+        rows, scores = self.search_vector(self.embed([query])[0], k or self.top, where, nprobe)
+        return [
+            {**self.document(row), "score": float(score)}
+            for row, score in zip(rows.tolist(), scores.tolist()) if score > min_score
+        ]
+
+    def search(self, search_text: str, top: Optional[int] = None, filter: Optional[Dict[str, Any]] = None,
+               **kwargs) -> List[Dict]:
+        """SearchClient.search stand-in: documents with their fields and "@search.score"."""
+        return [
+            {"id": document["id"], "content": document["content"], **document["metadata"],
+             "@search.score": document["score"]}
+            for document in self.retrieve(search_text, top, filter)
+        ]
+
+    def query(self, query_texts: List[str], n_results: int = 10, where: Optional[Dict[str, Any]] = None,
+              include: Iterable[str] = ("documents", "metadatas", "distances")) -> Dict[str, List]:
+        """ChromaDB collection.query stand-in; distances are cosine distances."""
+        results = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        for text in query_texts:
+            found = self.retrieve(text, n_results, where, min_score=-math.inf)
+            results["ids"].append([document["id"] for document in found])
+            results["documents"].append([document["content"] for document in found])
+            results["metadatas"].append([document["metadata"] for document in found])
+            results["distances"].append([1 - document["score"] for document in found])
+        return {key: value for key, value in results.items() if key == "ids" or key in include}
+
+
+def build(path: str, documents: Iterable[Dict], embedder: Optional[Embedder] = None, dtype: str = "float32",
+          nlist: Optional[int] = None, nprobe: Optional[int] = None, metadata_fields: Optional[List[str]] = None,
+          batch_size: int = 4096, seed: int = 0) -> Dict[str, Any]:
+    """
+    Builds an index directory from `documents` and returns its manifest.
+
+    Documents are embedded in batches and written to scratch files first, so
+    only one batch of texts and the float32 vectors are held at once. Documents
+    that come with a "vector" (embedded elsewhere, e.g. exported from a search
+    index) are stored as they are; open such an index with the embedder that
+    made the vectors.
+    `nlist` defaults to no IVF lists below EXACT_THRESHOLD documents and
+    about sqrt(count) above it. `nprobe` is the default number of lists a search scans.
+    `metadata_fields` limits the filterable fields, which keeps
+    high-cardinality fields such as URLs out of the manifest.
+    """
+    if dtype not in DTYPES:
+        raise ValueError(f"dtype must be one of {', '.join(DTYPES)}")
+    embedder = embedder or HashingEmbedder()
+    os.makedirs(path, exist_ok=True)
+    manifest_path = os.path.join(path, "manifest.json")
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+    scratch_vectors = os.path.join(path, "vectors.scratch")
+    scratch_documents = os.path.join(path, "documents.scratch")
+
+    fields: Dict[str, Dict[Any, int]] = {}
+    field_codes: Dict[str, List[int]] = {}
+    offsets = [0]
+    count = 0
+    precomputed = False
+
+    def batches() -> Iterator[List[Dict]]:
+        batch = []
+        for document in documents:
+            batch.append(document)
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    with open(scratch_vectors, "wb") as vector_file, open(scratch_documents, "wb") as document_file:
+        for batch in batches():
+            parsed = [split_document(document) for document in batch]
+            if all("vector" in document for document in batch):
+                precomputed = True
+                batch_vectors = [document["vector"] for document in batch]
+            else:
+                batch_vectors = embedder([content for _, content, _ in parsed])
+            vector_file.write(np.asarray(batch_vectors, dtype=np.float32).tobytes())
+            for doc_id, content, metadata in parsed:
+                line = json.dumps({"id": doc_id, "content": content, "metadata": metadata}, ensure_ascii=False).encode("utf-8")
+                document_file.write(line + b"\n")
+                offsets.append(offsets[-1] + len(line) + 1)
+                for field_name in metadata_fields if metadata_fields is not None else metadata:
+                    if field_name not in fields:
+                        fields[field_name] = {}
+                        # Documents before the first one with this field get the "missing" code -1
+                        field_codes[field_name] = [-1] * count
+                    value = metadata.get(field_name)
+                    codes = field_codes[field_name]
+                    codes.append(-1 if value is None else fields[field_name].setdefault(value, len(fields[field_name])))
+                for field_name, codes in field_codes.items():
+                    if len(codes) == count:
+                        codes.append(-1)
+                count += 1
+    if not count:
+        raise ValueError("Cannot build an index without documents")
+
+    vectors = np.memmap(scratch_vectors, dtype=np.float32, mode="r").reshape(count, -1)
+    dimensions = vectors.shape[1]
+    if nlist is None:
+        nlist = 0 if count < EXACT_THRESHOLD else int(math.sqrt(count))
+    nlist = min(nlist, count)
+
+    # Group rows by IVF list so each list is one contiguous slice of the matrix
+    if nlist:
+        rng = np.random.default_rng(seed)
+        sample = np.asarray(vectors[np.sort(rng.choice(count, min(count, nlist * 64), replace=False))])
+        centroids = kmeans(sample, nlist, seed=seed)
+        assignments = assign(vectors, centroids)
+        order = np.argsort(assignments, kind="stable")
+        list_offsets = np.concatenate([[0], np.cumsum(np.bincount(assignments, minlength=nlist))])
+        np.save(os.path.join(path, "centroids.npy"), centroids.astype(np.float32))
+        np.save(os.path.join(path, "offsets.npy"), list_offsets.astype(np.int64))
+    else:
+        order = np.arange(count)
+
+    stored = np.lib.format.open_memmap(
+        os.path.join(path, "vectors.npy"), mode="w+", dtype=DTYPES[dtype], shape=(count, dimensions))
+    scales = np.lib.format.open_memmap(
+        os.path.join(path, "scales.npy"), mode="w+", dtype=np.float32, shape=(count,)) if dtype == "int8" else None
+    for start in range(0, count, CHUNK_ROWS):
+        rows = order[start:start + CHUNK_ROWS]
+        stored[start:start + len(rows)], chunk_scales = quantize(np.asarray(vectors[rows]), dtype)
+        if scales is not None:
+            scales[start:start + len(rows)] = chunk_scales
+    stored.flush()
+    del stored, vectors
+    if scales is not None:
+        scales.flush()
+        del scales
+
+    offsets = np.array(offsets, dtype=np.int64)
+    document_offsets = np.zeros(count + 1, dtype=np.int64)
+    with open(scratch_documents, "rb") as source, open(os.path.join(path, "documents.jsonl"), "wb") as target:
+        scratch = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+        for position, row in enumerate(order.tolist()):
+            line = scratch[offsets[row]:offsets[row + 1]]
+            target.write(line)
+            document_offsets[position + 1] = document_offsets[position] + len(line)
+        scratch.close()
+    np.save(os.path.join(path, "document_offsets.npy"), document_offsets)
+    for position, field_name in enumerate(fields):
+        np.save(os.path.join(path, f"codes-{position}.npy"), np.array(field_codes[field_name], dtype=np.int32)[order])
+    os.remove(scratch_vectors)
+    os.remove(scratch_documents)
+
+    manifest = {
+        "count": count,
+        "dimensions": dimensions,
+        "dtype": dtype,
+        "nlist": nlist,
+        "nprobe": nprobe or (max(1, nlist // 16) if nlist else 0),
+        "embedder": {"type": "hashing", "dimensions": embedder.dimensions}
+        if isinstance(embedder, HashingEmbedder) and not precomputed else None,
+        "fields": {field_name: list(values) for field_name, values in fields.items()},
+    }
+    # The manifest goes last: a directory without one is an unfinished build
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def read_corpus(path: str) -> Iterator[Dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and query a local vector index")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build_command = commands.add_parser("build", help="build an index from a JSONL corpus")
+    build_command.add_argument("corpus", help="JSONL file of {\"id\", \"content\", ...metadata} objects")
+    build_command.add_argument("path", help="index directory")
+    build_command.add_argument("--dtype", choices=list(DTYPES), default="float32")
+    build_command.add_argument("--dimensions", type=int, default=256, help="hashing embedder dimensions")
+    build_command.add_argument("--nlist", type=int, help="IVF lists; 0 for exact search only")
+    build_command.add_argument("--nprobe", type=int, help="IVF lists a search scans by default")
+    build_command.add_argument("--fields", nargs="*", help="filterable metadata fields, by default all")
+    search_command = commands.add_parser("search", help="query an index")
+    search_command.add_argument("path", help="index directory")
+    search_command.add_argument("query")
+    search_command.add_argument("--top", type=int, default=DEFAULT_TOP)
+    search_command.add_argument("--filter", type=json.loads, help="metadata filter as a JSON object")
+    search_command.add_argument("--nprobe", type=int)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        manifest = build(args.path, read_corpus(args.corpus), HashingEmbedder(args.dimensions), args.dtype,
+                         args.nlist, args.nprobe, args.fields)
+        print(json.dumps({key: value for key, value in manifest.items() if key != "fields"}))
+    else:
+        index = VectorIndex(args.path, nprobe=args.nprobe)
+        for result in index.search(args.query, top=args.top, filter=args.filter):
+            print(json.dumps(result, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
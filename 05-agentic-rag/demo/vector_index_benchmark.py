@@ -0,0 +1,124 @@
+"""
+Recall against latency of vector_index.py, per storage dtype and search mode.
+
+Builds one index per dtype from a synthetic corpus of clustered unit vectors,
+shaped like embeddings of chunks on a few thousand topics (or from a JSONL
+corpus of your own), takes exact float32 search as the ground truth and
+reports, for exact search and for IVF search at each `nprobe`, the recall@k
+and the per-query latency:
+
+    python vector_index_benchmark.py --documents 200000 --nprobe 1 4 16 64
+    python vector_index_benchmark.py --corpus chunks.jsonl --dtypes float32 int8
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from typing import Dict, Iterator, List, Set, Tuple
+
+import numpy as np
+
+from vector_index import DTYPES, HashingEmbedder, VectorIndex, build, read_corpus
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def synthetic_corpus(documents: int, dimensions: int, per_topic: int = 50, noise: float = 0.06,
+                     seed: int = 0) -> Iterator[Dict]:
+    """Unit vectors scattered around random topic directions, about `per_topic` per topic."""
+    rng = np.random.default_rng(seed)
+    topics = normalize(rng.standard_normal((max(1, documents // per_topic), dimensions)))
+    for start in range(0, documents, 4096):
+        labels = rng.integers(len(topics), size=min(4096, documents - start))
+        vectors = normalize(topics[labels] + rng.standard_normal((len(labels), dimensions)) * noise)
+        for i, (label, vector) in enumerate(zip(labels.tolist(), vectors)):
+            yield {"id": str(start + i), "content": f"Chunk {start + i} on topic {label}", "topic": label % 10,
+                   "vector": vector}
+
+
+def sample_queries(documents: List[Dict], count: int, embedder: HashingEmbedder, seed: int = 1) -> np.ndarray:
+    """
+    Query vectors with real neighbours: a perturbed document vector, or for
+    text-only corpora the embedding of a few words of a document.
+    """
+    rng = np.random.default_rng(seed)
+    picked = [documents[position] for position in rng.choice(len(documents), count, replace=False)]
+    if all("vector" in document for document in picked):
+        vectors = np.array([document["vector"] for document in picked], dtype=np.float32)
+        return normalize(vectors + rng.standard_normal(vectors.shape) * 0.03)
+    texts = []
+    for document in picked:
+        words = document["content"].split()
+        texts.append(" ".join(rng.choice(words, min(len(words), 6), replace=False)))
+    return embedder(texts)
+
+
+def measure(index: VectorIndex, vectors: np.ndarray, k: int, **options) -> Tuple[List[Set[str]], List[float]]:
+    found, latencies = [], []
+    for vector in vectors:
+        started = time.perf_counter()
+        rows, _ = index.search_vector(vector, k, **options)
+        latencies.append(time.perf_counter() - started)
+        # Rows are numbered differently in every index; compare document ids
+        found.append({index.document(row)["id"] for row in rows.tolist()})
+    return found, latencies
+
+
+def directory_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall/latency benchmark of the local vector index")
+    parser.add_argument("--corpus", help="JSONL corpus to index instead of the synthetic one")
+    parser.add_argument("--documents", type=int, default=100000, help="size of the synthetic corpus")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10, help="results per query")
+    parser.add_argument("--dimensions", type=int, default=256)
+    parser.add_argument("--dtypes", nargs="+", choices=list(DTYPES), default=list(DTYPES))
+    parser.add_argument("--nlist", type=int, help="IVF lists, by default about sqrt(documents)")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32, 64])
+    parser.add_argument("--workdir", help="where to build the indexes, by default a temporary directory")
+    args = parser.parse_args()
+
+    embedder = HashingEmbedder(args.dimensions)
+    workdir = args.workdir or tempfile.mkdtemp(prefix="vector-index-")
+    try:
+        documents = list(read_corpus(args.corpus) if args.corpus else synthetic_corpus(args.documents, args.dimensions))
+        query_vectors = sample_queries(documents, args.queries, embedder)
+        print(f"{len(documents)} documents, {len(query_vectors)} queries, k={args.k}\n")
+        print(f"{'dtype':<8} {'mode':<6} {'nprobe':>6} {'recall':>7} {'p50 ms':>8} {'p95 ms':>8} "
+              f"{'build s':>8} {'MB':>8}")
+
+        truth = None
+        for dtype in args.dtypes:
+            path = os.path.join(workdir, dtype)
+            started = time.perf_counter()
+            manifest = build(path, documents, embedder, dtype=dtype, nlist=args.nlist)
+            build_time = time.perf_counter() - started
+            size = directory_size(path) / 2 ** 20
+            index = VectorIndex(path, embedder)
+
+            runs = [("exact", 0, {"exact": True})]
+            runs += [("ivf", nprobe, {"nprobe": nprobe, "exact": False})
+                     for nprobe in args.nprobe if nprobe <= manifest["nlist"]]
+            for mode, nprobe, options in runs:
+                found, latencies = measure(index, query_vectors, args.k, **options)
+                if truth is None:
+                    # The first run is exact float32 (or the first dtype asked for)
+                    truth = found
+                recall = np.mean([len(f & t) / max(len(t), 1) for f, t in zip(found, truth)])
+                p50, p95 = np.percentile(latencies, [50, 95]) * 1000
+                print(f"{dtype:<8} {mode:<6} {nprobe or '-':>6} {recall:>7.3f} {p50:>8.2f} {p95:>8.2f} "
+                      f"{build_time:>8.1f} {size:>8.1f}")
+            index.close()
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+import asyncio
+import contextvars
+import logging
+import time
+from collections import defaultdict, deque
+from contextlib import asynccontextmanager
+from typing import Any, Deque, Dict, Optional
+
+from tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+# Chat session the current task works for; set by on_message and inherited by the tasks it starts
+current_session: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("admission_session", default=None)
+
+
+class ServerBusy(Exception):
+    """The admission queue is too deep to take on more work."""
+
+
+class AdmissionController:
+    """
+    Process-wide limit on concurrent model and MCP calls, shared fairly between sessions.
+
+    At most `max_concurrency` calls run at once. Further calls wait in a FIFO
+    queue per chat session (taken from `current_session`), and a freed slot
+    goes to the next waiting session in round-robin order, so one session with
+    many parallel agents cannot starve the others. A call is refused with
+    `ServerBusy` when `max_queue` calls are already waiting or it has waited
+    `max_wait` seconds.
+
+    New messages are refused earlier, once `busy_queue` calls are waiting (see
+    `admit_message`). Messages already being answered can then finish, and
+    throughput stays at the limit instead of collapsing under retries and
+    timeouts.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 16,
+        max_queue: int = 64,
+        busy_queue: Optional[int] = None,
+        max_wait: float = 30.0,
+    ):
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.busy_queue = busy_queue if busy_queue is not None else max_queue // 2
+        self.max_wait = max_wait
+        self.in_flight = 0
+        self.queued = 0
+        self._queues: Dict[str, Deque[asyncio.Future]] = {}
+        self._order: Deque[str] = deque()
+        self.admitted: Dict[str, int] = defaultdict(int)
+        self.waited = 0
+        self.max_queued = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.busy_messages = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def admit_message(self) -> bool:
+        """Whether a new message should be started; counts the ones turned away."""
+        if self.queued >= self.busy_queue:
+            self.busy_messages += 1
+            return False
+        return True
+
+    def _discard(self, session_id: str, future: asyncio.Future):
+        queue = self._queues.get(session_id)
+        if queue is None or future not in queue:
+            return
+        queue.remove(future)
+        self.queued -= 1
+        if not queue:
+            del self._queues[session_id]
+            self._order.remove(session_id)
+
+    async def acquire(self, kind: str = "model"):
+        """Waits for a slot; every successful call must be paired with `release`."""
+        if self.in_flight < self.max_concurrency and not self.queued:
+            self.in_flight += 1
+            self.admitted[kind] += 1
+            return
+        if self.queued >= self.max_queue:
+            self.rejected += 1
+            raise ServerBusy(f"The server is busy: {self.queued} calls are waiting")
+
+        session_id = current_session.get() or ""
+        future = asyncio.get_running_loop().create_future()
+        if session_id not in self._queues:
+            self._queues[session_id] = deque()
+            self._order.append(session_id)
+        self._queues[session_id].append(future)
+        self.queued += 1
+        self.max_queued = max(self.max_queued, self.queued)
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(future, self.max_wait)
+        except BaseException as e:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as we gave up; pass it on
+                self.release()
+            else:
+                self._discard(session_id, future)
+            if isinstance(e, asyncio.TimeoutError):
+                self.timed_out += 1
+                raise ServerBusy(f"The server is busy: no slot within {self.max_wait:g}s") from None
+            raise
+        waited = time.perf_counter() - started
+        self.waited += 1
+        self.admitted[kind] += 1
+        self.wait_seconds += waited
+        self.max_wait_seconds = max(self.max_wait_seconds, waited)
+        span = tracer.current()
+        if span is not None:
+            span.add_time("admission_wait_seconds", waited)
+
+    def release(self):
+        # Hand the slot straight to the next session in turn, so in_flight never dips below the limit
+        while self._order:
+            session_id = self._order.popleft()
+            queue = self._queues[session_id]
+            future = queue.popleft()
+            self.queued -= 1
+            if queue:
+                self._order.append(session_id)
+            else:
+                del self._queues[session_id]
+            if not future.done():
+                future.set_result(None)
+                return
+        self.in_flight -= 1
+
+    @asynccontextmanager
+    async def slot(self, kind: str = "model"):
+        await self.acquire(kind)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "sessions_waiting": len(self._order),
+            "max_queued": self.max_queued,
+            "admitted": dict(self.admitted),
+            "waited": self.waited,
+            "wait_seconds_total": round(self.wait_seconds, 4),
+            "wait_seconds_max": round(self.max_wait_seconds, 4),
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "busy_messages": self.busy_messages,
+        }
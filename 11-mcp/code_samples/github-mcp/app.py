@@ -1,34 +1,56 @@
+import time
+
+# Taken before the heavy imports so the startup report covers them
+_import_started = time.perf_counter()
+
+import asyncio
+import functools
 import os
 import json
 import logging
 from dotenv import load_dotenv
-import requests
-import re
 
 import chainlit as cl
+from chainlit.user_session import user_sessions
 from mcp import ClientSession
 
 from semantic_kernel.kernel import Kernel
 from azure.core.credentials import AzureKeyCredential
 
 
-from semantic_kernel.functions import KernelFunction, kernel_function
-from semantic_kernel.contents import ChatHistory, AuthorRole, ChatMessageContent
+from semantic_kernel.functions import FunctionResult, KernelFunction, kernel_function
+from semantic_kernel.contents import ChatHistory, AuthorRole, ChatMessageContent, TextContent
 from semantic_kernel.connectors.ai import FunctionChoiceBehavior
 from semantic_kernel.contents.function_call_content import FunctionCallContent
 from semantic_kernel.contents.function_result_content import FunctionResultContent
 from semantic_kernel.connectors.mcp import MCPStdioPlugin
+from semantic_kernel.filters import FilterTypes, FunctionInvocationContext
 from semantic_kernel.connectors.ai.open_ai import AzureChatCompletion
 from semantic_kernel.agents import ChatCompletionAgent, ChatHistoryAgentThread, AgentGroupChat
-from semantic_kernel.agents.strategies import (
-    SequentialSelectionStrategy,
-    DefaultTerminationStrategy
-)
 
 from azure.search.documents import SearchClient
+from azure.search.documents.aio import SearchClient as AsyncSearchClient
 from azure.search.documents.indexes import SearchIndexClient
 from azure.search.documents.indexes.models import SearchIndex, SimpleField, SearchFieldDataType, SearchableField
 
+from admission import AdmissionController, ServerBusy, current_session
+from bm25_index import LocalSearchClient, load_or_build
+from bootstrap import IndexBootstrap, StartupReport
+from compaction import ToolResultCompactor
+from github_cache import CachingMCPStdioPlugin, GitHubToolCache, is_github_server
+from history import HistoryManager, decode_message, encode_message
+from index_sync import IndexManifest, parse_events, sync_documents
+from mcp_pool import MCPServerPool
+from mcp_tools import ToolCatalogCache, ToolIndex, describe_tools
+from model_clients import ModelClientRegistry
+from orchestration import RoutedSelectionStrategy, RoutedTerminationStrategy, record_usage, run_agent_graph
+from prefetch import EventSearchPrefetcher, predict_queries, repository_languages
+from rag_plugin import RAGPlugin
+from router import ROUTING_TABLE, KeywordRouter, KeywordScorer
+from search_cache import SearchCache
+from session_state import SessionStateManager, create_session_store
+from streaming import TokenCoalescer
+from tracing import JsonlExporter, PrometheusExporter, tracer
 
 # Load environment variables
 load_dotenv()
@@ -41,39 +63,71 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-# Example Weather Plugin (Tool)
+# Caps concurrent model and MCP calls for the whole process and queues the rest fairly per session
+admission = AdmissionController(
+    max_concurrency=int(os.getenv("ADMISSION_MAX_CONCURRENCY", "16")),
+    max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", "64")),
+    busy_queue=int(os.getenv("ADMISSION_BUSY_QUEUE", "32")),
+    max_wait=float(os.getenv("ADMISSION_MAX_WAIT", "30")),
+)
 
-        
+SERVER_BUSY_MESSAGE = "The server is busy right now. Please try again in a moment."
+
+
+def error_message(error: BaseException) -> str:
+    """What the user is told when a message fails; calls refused by admission control get the busy message."""
+    seen = set()
+    cause = error
+    while cause is not None and id(cause) not in seen:
+        if isinstance(cause, ServerBusy):
+            return SERVER_BUSY_MESSAGE
+        seen.add(id(cause))
+        cause = cause.__cause__ or cause.__context__
+    return f"Error: {str(error)}"
+
+# Read-only GitHub tool results shared by every session, revalidated with ETags after GITHUB_CACHE_TTL
+github_tool_cache = GitHubToolCache(
+    token=os.getenv("GITHUB_PERSONAL_ACCESS_TOKEN"),
+    ttl=float(os.getenv("GITHUB_CACHE_TTL", "60")),
+    max_entries=int(os.getenv("GITHUB_CACHE_MAX_ENTRIES", "512")),
+    admission=admission,
+)
 
-class RAGPlugin:
-    def __init__(self, search_client):
-        self.search_client = search_client
+# MCP connections whose tool calls use the cache; by default, those that launch the GitHub server
+GITHUB_CACHE_CONNECTIONS = {name.strip() for name in os.getenv("GITHUB_CACHE_CONNECTIONS", "").split(",") if name.strip()}
+
+
+def uses_github_cache(connection) -> bool:
+    if GITHUB_CACHE_CONNECTIONS:
+        return connection.name in GITHUB_CACHE_CONNECTIONS
+    return is_github_server(connection)
+
+
+def create_github_plugin():
+    return CachingMCPStdioPlugin(
+        cache=github_tool_cache,
+        name="GitHub",
+        description="GitHub Plugin",
+        command="npx",
+        args=["-y", "@modelcontextprotocol/server-github"]
+    )
 
-    @kernel_function(name="search_events", description="Searches for relevant events based on a query")
-    def search_events(self, query: str) -> str:
-        """Retrieves relevant events from Azure Search and a live API based on the query."""
-        context_strings = []
-        try:
-            results = self.search_client.search(query, top=5)
-            for result in results:
-                if 'content' in result:
-                    context_strings.append(f"Event: {result['content']}")
-        except Exception as e:
-            context_strings.append(f"Error searching Azure Search: {str(e)}")
-        # Live API (example: Devpost hackathons)
-        try:
-            api_resp = requests.get(f"https://devpost.com/api/hackathons?search={query}", timeout=5)
-            if api_resp.ok:
-                data = api_resp.json()
-                for event in data.get('hackathons', [])[:5]:
-                    context_strings.append(f"Live Event: {event.get('title')} - {event.get('url')}")
-        except Exception as e:
-            context_strings.append(f"Error fetching live events: {str(e)}")
-        if context_strings:
-            return "\n\n".join(context_strings)
-        else:
-            return "No relevant events found."
 
+# One keep-alive, connection-limited model client per deployment, shared by all sessions and agents
+model_clients = ModelClientRegistry(
+    max_connections=int(os.getenv("MODEL_CLIENT_MAX_CONNECTIONS", "20")),
+    max_keepalive_connections=int(os.getenv("MODEL_CLIENT_MAX_KEEPALIVE", "10")),
+    admission=admission,
+)
+
+# Warm GitHub MCP server processes shared by every chat session in this process
+github_mcp_pool = MCPServerPool(
+    factory=create_github_plugin,
+    min_size=int(os.getenv("GITHUB_MCP_POOL_MIN_SIZE", "1")),
+    max_size=int(os.getenv("GITHUB_MCP_POOL_MAX_SIZE", "4")),
+    leases_per_server=int(os.getenv("GITHUB_MCP_POOL_LEASES_PER_SERVER", "8")),
+    idle_timeout=float(os.getenv("GITHUB_MCP_POOL_IDLE_TIMEOUT", "300")),
+)
 
 # Initialize Azure AI Search with persistent storage
 search_service_endpoint = os.getenv("AZURE_SEARCH_SERVICE_ENDPOINT")
@@ -86,8 +140,10 @@ search_client = SearchClient(
     credential=AzureKeyCredential(search_api_key)
 )
 
-index_client = SearchIndexClient(
+# Async client used by search_events so queries never block the event loop
+async_search_client = AsyncSearchClient(
     endpoint=search_service_endpoint,
+    index_name=index_name,
     credential=AzureKeyCredential(search_api_key)
 )
 
@@ -99,71 +155,245 @@ fields = [
 
 index = SearchIndex(name=index_name, fields=fields)
 
-# Check if index already exists if not, create it
-try:
-    existing_index = index_client.get_index(index_name)
-    print(f"Index '{index_name}' already exists, using the existing index.")
-except Exception as e:
-    # Create the index if it doesn't exist
-    print(f"Creating new index '{index_name}'...")
-    index_client.create_index(index)
-
-# Always read event descriptions from markdown file
 current_dir = os.path.dirname(os.path.abspath(__file__))
 event_descriptions_path = os.path.join(current_dir, "event-descriptions.md")
 
-try:
-    with open(event_descriptions_path, "r", encoding='utf-8') as f:
-        markdown_content = f.read()
-except FileNotFoundError:
-    logger.warning(f"Could not find {event_descriptions_path}")
-    markdown_content = ""
-
-# Split the markdown content into individual event descriptions
-event_descriptions = markdown_content.split("---")  # You can change the delimiter
-
-# Create documents for Azure Search
-documents = []
-for i, description in enumerate(event_descriptions):
-    description = description.strip()  # Remove leading/trailing whitespace
-    if description:  # Avoid empty descriptions
-        documents.append({"id": str(i + 1), "content": description})
-
-# Add documents to the index (only if we have documents)
-if documents:
-    # Delete existing documents first to avoid duplicates
-    try:
-        search_client.delete_documents(documents=[{"id": doc["id"]} for doc in documents])
-        print("Cleared existing documents")
-    except Exception as e:
-        print(f"Warning: Failed to clear existing documents: {str(e)}")
-    
-    # Upload new documents
-    search_client.upload_documents(documents)
-    print(f"Uploaded {len(documents)} documents to index")
+
+def bootstrap_index(report: StartupReport):
+    """Creates the index if needed and syncs event-descriptions.md into it. Runs off the event loop."""
+    with report.phase("bootstrap index check"):
+        index_client = SearchIndexClient(
+            endpoint=search_service_endpoint,
+            credential=AzureKeyCredential(search_api_key)
+        )
+
+        # Check if index already exists if not, create it
+        index_created = False
+        try:
+            existing_index = index_client.get_index(index_name)
+            print(f"Index '{index_name}' already exists, using the existing index.")
+        except Exception as e:
+            # Create the index if it doesn't exist
+            print(f"Creating new index '{index_name}'...")
+            index_client.create_index(index)
+            index_created = True
+
+    # Always read event descriptions from markdown file
+    with report.phase("bootstrap read events"):
+        try:
+            with open(event_descriptions_path, "r", encoding='utf-8') as f:
+                markdown_content = f.read()
+        except FileNotFoundError:
+            logger.warning(f"Could not find {event_descriptions_path}")
+            markdown_content = ""
+
+        # Split the markdown content into documents with stable, content-derived IDs
+        documents = parse_events(markdown_content)  # You can change the delimiter
+
+    # Only upload or delete the events that changed since the last sync (only if we have documents)
+    with report.phase("bootstrap index sync"):
+        if documents:
+            manifest = IndexManifest(
+                path=os.getenv("EVENT_INDEX_MANIFEST", os.path.join(current_dir, ".event-index-manifest.json")),
+                scope=f"{search_service_endpoint}/{index_name}",
+            )
+            sync_stats = sync_documents(search_client, documents, manifest, reset=index_created)
+            print(f"Synced {len(documents)} documents to index: {sync_stats}")
+
+
+# "azure" searches the Azure AI Search index, "bm25" an in-process index of event-descriptions.md
+EVENTS_SEARCH_BACKEND = os.getenv("EVENTS_SEARCH_BACKEND", "azure")
+local_search_client = LocalSearchClient()
+
+
+def bootstrap_local_index(report: StartupReport):
+    """Maps the BM25 index of event-descriptions.md, rebuilding it if the file changed. Runs off the event loop."""
+    with report.phase("bootstrap bm25 index"):
+        local_search_client.index = load_or_build(
+            event_descriptions_path,
+            os.getenv("BM25_INDEX_PATH", os.path.join(current_dir, ".event-index.bm25")),
+        )
+
+
+# The index is prepared in the background; search_events waits for it on first use
+startup_report = StartupReport()
+index_bootstrap = IndexBootstrap(
+    bootstrap_local_index if EVENTS_SEARCH_BACKEND == "bm25" else bootstrap_index, startup_report)
+
+# One RAGPlugin (and its pooled HTTP connections) shared by every chat session
+rag_plugin = RAGPlugin(
+    local_search_client if EVENTS_SEARCH_BACKEND == "bm25" else async_search_client,
+    deadline=float(os.getenv("SEARCH_EVENTS_DEADLINE", "4")),
+    wait_ready=lambda: index_bootstrap.wait_ready(
+        timeout=float(os.getenv("SEARCH_INDEX_READY_TIMEOUT", "30"))),
+    index_cache=SearchCache(
+        "index",
+        max_entries=int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "256")),
+        ttl=float(os.getenv("SEARCH_CACHE_INDEX_TTL", "3600")),
+    ),
+    live_cache=SearchCache(
+        "devpost",
+        max_entries=int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "256")),
+        ttl=float(os.getenv("SEARCH_CACHE_LIVE_TTL", "300")),
+        stale_ttl=float(os.getenv("SEARCH_CACHE_LIVE_STALE_TTL", "1800")),
+    ),
+)
+
+# Optional: likely search_events queries start in the background as soon as EventsAgent is routed
+if os.getenv("SEARCH_EVENTS_PREFETCH", "false").lower() == "true":
+    rag_plugin.prefetcher = EventSearchPrefetcher(
+        # Partial results raise, so they are searched again rather than served from the prefetch
+        functools.partial(rag_plugin.search, complete=True),
+        ttl=float(os.getenv("SEARCH_EVENTS_PREFETCH_TTL", "120")),
+        max_queries=int(os.getenv("SEARCH_EVENTS_PREFETCH_QUERIES", "4")),
+    )
+
+
+# Live per-session objects, rebuilt from configuration and the session store when needed
+SESSION_RUNTIME_KEYS = (
+    "kernel", "settings", "chat_completion_service", "chat_history",
+    "agent_group_chat", "agents", "rag_plugin", "github_plugin",
+)
+
+
+async def evict_session(session_id: str):
+    """Drops the live objects of an idle session; its conversation stays in the session store."""
+    user_session = user_sessions.get(session_id)
+    if not user_session:
+        return
+    github_plugin = user_session.get("github_plugin")
+    for key in SESSION_RUNTIME_KEYS:
+        user_session.pop(key, None)
+    if github_plugin:
+        await github_mcp_pool.release(github_plugin)
+
+
+# Conversations are saved outside the worker, so idle sessions can leave RAM and any worker can resume them
+session_state = SessionStateManager(
+    create_session_store(os.getenv("SESSION_STORE_URL", "memory://")),
+    idle_timeout=float(os.getenv("SESSION_IDLE_TIMEOUT", "900")),
+    ttl=float(os.getenv("SESSION_STATE_TTL", "86400")),
+    on_evict=evict_session,
+)
+
+
+@cl.on_app_startup
+async def on_app_startup():
+    # Optional span export: a JSONL file and/or a Prometheus-style /metrics endpoint
+    if os.getenv("TRACE_FILE"):
+        tracer.add_exporter(JsonlExporter(os.getenv("TRACE_FILE")))
+    if os.getenv("METRICS_PORT"):
+        prometheus_exporter = PrometheusExporter()
+        prometheus_exporter.serve(int(os.getenv("METRICS_PORT")))
+        tracer.add_exporter(prometheus_exporter)
+
+    # Start warm-up without blocking the worker; chats can begin right away
+    index_bootstrap.start()
+    asyncio.create_task(github_mcp_pool.start())
+    session_state.start()
+
+
+@cl.on_app_shutdown
+async def on_app_shutdown():
+    await github_mcp_pool.close()
+    if rag_plugin.prefetcher is not None:
+        rag_plugin.prefetcher.close()
+    await rag_plugin.close()
+    await github_tool_cache.close()
+    await session_state.close()
+    await model_clients.close()
+    tracer.close()
+
 
 def flatten(xss):
     return [x for xs in xss for x in xs]
 
 
+# "parallel" runs the routed agents as a dependency graph, "group_chat" runs all agents in turn
+AGENT_EXECUTION_MODE = os.getenv("AGENT_EXECUTION_MODE", "parallel")
+
+# Streamed tokens are sent to the browser every STREAM_FLUSH_CHARS characters or STREAM_FLUSH_SECONDS
+STREAM_FLUSH_CHARS = int(os.getenv("STREAM_FLUSH_CHARS", "256"))
+STREAM_FLUSH_SECONDS = float(os.getenv("STREAM_FLUSH_SECONDS", "0.03"))
+
+# list_tools results shared by every chat session that connects to the same server
+tool_catalog_cache = ToolCatalogCache()
+
+# Tool results are cut to a per-tool token budget before an agent sees them
+TOOL_RESULT_COMPACTION = os.getenv("TOOL_RESULT_COMPACTION", "true").lower() == "true"
+tool_result_compactor = ToolResultCompactor(
+    budgets=json.loads(os.getenv("TOOL_RESULT_BUDGETS", "{}")),
+    default_budget=int(os.getenv("TOOL_RESULT_DEFAULT_BUDGET", "1500")),
+)
+
+
+def get_tool_index() -> ToolIndex:
+    tool_index = cl.user_session.get("tool_index")
+    if tool_index is None:
+        tool_index = ToolIndex()
+        cl.user_session.set("tool_index", tool_index)
+    return tool_index
+
+
 @cl.on_mcp_connect
 async def on_mcp(connection, session: ClientSession):
     logger.info(f"MCP Connection established: {connection.name}")
-    result = await session.list_tools()
-    tools = [{
-        "name": t.name,
-        "description": t.description,
-        "input_schema": t.inputSchema,
-    } for t in result.tools]
-
-    mcp_tools = cl.user_session.get("mcp_tools", {})
-    mcp_tools[connection.name] = tools
-    cl.user_session.set("mcp_tools", mcp_tools)
-    
+    tool_index = get_tool_index()
+    cached = uses_github_cache(connection)
+
+    async def refresh_tools():
+        tool_index.add_connection(connection.name, session, describe_tools(await session.list_tools()), cached)
+
+    tools = await tool_catalog_cache.get_tools(connection, session, on_change=refresh_tools)
+    tool_index.add_connection(connection.name, session, tools, cached)
+
     # Log available tools
     print(f"Available MCP tools for {connection.name}:")
     for tool in tools:
         print(f"  - {tool['name']}: {tool['description']}")
+    logger.info(f"MCP tool catalog cache: {tool_catalog_cache.stats()}")
+
+
+@cl.on_mcp_disconnect
+async def on_mcp_disconnect(name: str, session: ClientSession):
+    logger.info(f"MCP Connection closed: {name}")
+    get_tool_index().remove_connection(name, session)
+
+
+async def trace_function_invocation(context: FunctionInvocationContext, next):
+    # Covers every kernel function an agent calls: GitHub MCP tools and search_events
+    with tracer.span("tool_call", plugin=context.function.plugin_name, function=context.function.name):
+        await next(context)
+
+
+async def compact_function_result(context: FunctionInvocationContext, next):
+    await next(context)
+    if context.result is None or context.result.value is None:
+        return
+    value = context.result.value
+    if isinstance(value, list):
+        # MCP tools return a list of contents; as in call_tool, their text shares one budget
+        compacted = tool_result_compactor.compact_contents(
+            context.function.name, value, TextContent, lambda text: TextContent(text=text))
+        if compacted is None:
+            return
+    else:
+        text = str(context.result)
+        compacted = tool_result_compactor.compact(context.function.name, text)
+        if compacted is text:
+            return
+    context.result = FunctionResult(
+        function=context.function.metadata, value=compacted, metadata=context.result.metadata)
+
+
+async def prefetch_from_github_results(context: FunctionInvocationContext, next):
+    await next(context)
+    # The languages of the user's repositories predict what EventsAgent will search for
+    if cl.user_session.get("prefetch_events") and context.result is not None:
+        languages = repository_languages(str(context.result))
+        if languages:
+            rag_plugin.prefetcher.prefetch(predict_queries(languages=languages))
+
 
 @cl.step(type="tool")
 async def call_tool(tool_use):
@@ -174,37 +404,42 @@ async def call_tool(tool_use):
     current_step.name = tool_name
 
     # Identify which mcp is used
-    mcp_tools = cl.user_session.get("mcp_tools", {})
-    mcp_name = None
-
-    for connection_name, tools in mcp_tools.items():
-        if any(tool.get("name") == tool_name for tool in tools):
-            mcp_name = connection_name
-            break
+    tool_entry = get_tool_index().lookup(tool_name)
 
-    if not mcp_name:
+    if not tool_entry:
         current_step.output = json.dumps(
             {"error": f"Tool {tool_name} not found in any MCP connection"})
         return current_step.output
 
-    mcp_session, _ = cl.context.session.mcp_sessions.get(mcp_name)
-
-    if not mcp_session:
-        current_step.output = json.dumps(
-            {"error": f"MCP {mcp_name} not found in any MCP connection"})
-        return current_step.output
-
-    try:
-        current_step.output = await mcp_session.call_tool(tool_name, tool_input)
-    except Exception as e:
-        current_step.output = json.dumps({"error": str(e)})
+    with tracer.span("call_tool", connection=tool_entry.connection_name, tool=tool_name):
+        try:
+            if tool_entry.cached:
+                result = await github_tool_cache.call_tool(tool_entry.session, tool_name, tool_input)
+            else:
+                async with admission.slot("mcp"):
+                    result = await tool_entry.session.call_tool(tool_name, tool_input)
+            if TOOL_RESULT_COMPACTION:
+                result = tool_result_compactor.compact_call_result(tool_name, result)
+            current_step.output = result
+        except Exception as e:
+            current_step.output = json.dumps({"error": str(e)})
 
     return current_step.output
 
 
 @cl.on_chat_start
 async def on_chat_start():
- 
+    # No-op once the app startup hook has kicked off the index warm-up
+    index_bootstrap.start()
+
+    await build_session()
+    # A reconnect to another worker continues the conversation saved under the same thread
+    await restore_conversation()
+    session_state.touch(cl.context.session.id)
+
+
+async def build_session():
+    """Creates the kernel, agents and group chat of a session and stores them in the user session."""
     # Create kernel
     kernel = Kernel()
 
@@ -220,41 +455,31 @@ async def on_chat_start():
 
     sk_filter = cl.SemanticKernelFilter(kernel=kernel)
 
-    kernel.add_service(AzureChatCompletion(service_id=service_id))
+    kernel.add_service(model_clients.get(service_id=service_id))
     settings = kernel.get_prompt_execution_settings_from_service_id(
         service_id=service_id)
     settings.function_choice_behavior = FunctionChoiceBehavior.Auto()
 
  
 
-    # Create a properly instantiated RAGPlugin
-    rag_plugin = RAGPlugin(search_client)
-
-    # Add to kernel
+    # Add the shared RAGPlugin to kernel
     kernel.add_plugin(rag_plugin, plugin_name="RAG")
 
     # Store in session
     cl.user_session.set("rag_plugin", rag_plugin)
 
-    # Add GitHub MCP plugin
+    # Lease a warm GitHub MCP server from the shared pool
+    github_plugin = None
     try:
-        logger.info("Initializing GitHub MCP plugin...")
-        github_plugin = MCPStdioPlugin(
-            name="GitHub", 
-            description="GitHub Plugin", 
-            command="npx",
-            args=["-y", "@modelcontextprotocol/server-github"]
-        )
-
-        # Connect to the GitHub MCP server
-        await github_plugin.connect()
-        logger.info("GitHub MCP server connection established")
+        logger.info("Leasing GitHub MCP plugin from pool...")
+        github_plugin = await github_mcp_pool.acquire()
+        logger.info(f"GitHub MCP server leased, pool: {github_mcp_pool.stats()}")
 
         # Add the plugin to the kernel
         kernel.add_plugin(github_plugin)
         logger.info("GitHub plugin added to kernel")
 
-        # Store the plugin in user session for cleanup later
+        # Store the plugin in user session so the lease is returned later
         cl.user_session.set("github_plugin", github_plugin)
 
         logger.info("GitHub plugin setup completed successfully")
@@ -341,137 +566,256 @@ If no relevant events are found, acknowledge this and suggest trying different s
 """
 
     github_agent = ChatCompletionAgent(
-        service=AzureChatCompletion(),
+        service=model_clients.get(),
         name="GithubAgent",
         instructions=GITHUB_INSTRUCTIONS,
-        plugins=[github_plugin]
+        plugins=[github_plugin] if github_plugin else []
     )
 
     hackathon_agent = ChatCompletionAgent(
-        service=AzureChatCompletion(),
+        service=model_clients.get(),
         name="HackathonAgent",
         instructions=HACKATHON_AGENT
     )
 
     events_agent = ChatCompletionAgent(
-        service=AzureChatCompletion(),
+        service=model_clients.get(),
         name="EventsAgent",
         instructions=EVENTS_AGENT,
         plugins=[rag_plugin]  # Add the plugin here
     )
 
+    # Trace every tool call made by the kernel and the agents; the last filter added runs outermost
+    for traced_kernel in (kernel, github_agent.kernel, hackathon_agent.kernel, events_agent.kernel):
+        if TOOL_RESULT_COMPACTION:
+            traced_kernel.add_filter(FilterTypes.FUNCTION_INVOCATION, compact_function_result)
+        traced_kernel.add_filter(FilterTypes.FUNCTION_INVOCATION, trace_function_invocation)
+    if rag_plugin.prefetcher is not None:
+        github_agent.kernel.add_filter(FilterTypes.FUNCTION_INVOCATION, prefetch_from_github_results)
+
     # Create the agent group chat
     agent_group_chat = AgentGroupChat(
         agents=[github_agent, hackathon_agent, events_agent],
-        selection_strategy=SequentialSelectionStrategy(
-            initial_agent=github_agent),
-        termination_strategy=DefaultTerminationStrategy(maximum_iterations=3)
+        # Starts every message with the first routed agent, then follows the order above
+        selection_strategy=RoutedSelectionStrategy(),
+        # Stops once the routed agents have answered; resets for every new message
+        termination_strategy=RoutedTerminationStrategy(maximum_iterations=3, automatic_reset=True)
     )
 
-    # Create a new chat history
-    chat_history = ChatHistory()
+    # Create a new chat history; only a token-budgeted window of it is sent to the model
+    chat_history = HistoryManager(
+        token_budget=int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "6000")),
+        summary_budget=int(os.getenv("CHAT_HISTORY_SUMMARY_BUDGET", "600")),
+        pinned_budget=int(os.getenv("CHAT_HISTORY_PINNED_BUDGET", "1500")),
+    )
 
     # Store in user session
     cl.user_session.set("kernel", kernel)
     cl.user_session.set("settings", settings)  # Store settings in session
-    cl.user_session.set("chat_completion_service", AzureChatCompletion())
+    cl.user_session.set("chat_completion_service", model_clients.get())
     cl.user_session.set("chat_history", chat_history)
-    cl.user_session.set("mcp_tools", {})
     # Store the agent group chat
     cl.user_session.set("agent_group_chat", agent_group_chat)
+    # Store the agents by the names route_user_input returns
+    cl.user_session.set("agents", {
+        "GitHubAgent": github_agent,
+        "HackathonAgent": hackathon_agent,
+        "EventsAgent": events_agent,
+    })
+
+
+async def restore_conversation() -> bool:
+    """Loads the saved conversation of this thread into the freshly built session, if there is one."""
+    state = await session_state.load(cl.context.session.thread_id)
+    if state is None:
+        return False
+    cl.user_session.get("chat_history").load_state(state["history"])
+    agent_group_chat = cl.user_session.get("agent_group_chat")
+    for data in state.get("group_chat", []):
+        agent_group_chat.history.add_message(decode_message(data))
+    logger.info(f"Restored conversation with {len(cl.user_session.get('chat_history').turns)} turns")
+    return True
+
+
+async def save_conversation():
+    state = {"history": cl.user_session.get("chat_history").to_state()}
+    agent_group_chat = cl.user_session.get("agent_group_chat")
+    if agent_group_chat.history.messages:
+        state["group_chat"] = [encode_message(m) for m in agent_group_chat.history.messages]
+    await session_state.save(cl.context.session.thread_id, state)
 
 
 # Add a cleanup handler for when the session ends
 @cl.on_chat_end
 async def on_chat_end():
-    # Get the GitHub plugin if it exists
+    # Return the GitHub plugin lease; the server process stays warm in the pool
     github_plugin = cl.user_session.get("github_plugin")
     if github_plugin:
         try:
-            await github_plugin.close()
-            print("GitHub plugin closed successfully")
+            await github_mcp_pool.release(github_plugin)
+            print("GitHub plugin released to pool")
         except Exception as e:
-            print(f"Error closing GitHub plugin: {str(e)}")
+            print(f"Error releasing GitHub plugin: {str(e)}")
+    # The saved conversation outlives the connection until SESSION_STATE_TTL
+    session_state.forget(cl.context.session.id)
+
+    logger.info(f"search_events cache stats: {rag_plugin.cache_stats()}")
+    if rag_plugin.prefetcher is not None:
+        logger.info(f"search_events prefetch stats: {rag_plugin.prefetcher.stats()}")
+    logger.info(f"GitHub tool cache stats: {github_tool_cache.stats()}")
+    logger.info(f"Session state: {session_state.stats()}")
+    logger.info(f"Model client pool: {model_clients.metrics()}")
+    logger.info(f"Admission: {admission.stats()}")
+    if TOOL_RESULT_COMPACTION:
+        logger.info(f"Tool result compaction: {tool_result_compactor.stats()}")
+
+# Built once per process from the declarative keyword table in router.py
+message_router = KeywordRouter(
+    ROUTING_TABLE,
+    scorer=KeywordScorer(ROUTING_TABLE) if os.getenv("ROUTER_FUZZY_SCORER", "false").lower() == "true" else None,
+)
+
 
 def route_user_input(user_input: str):
     """
     Analyze user input and return a list of agent names to invoke.
     Returns: list of agent names (e.g., ["GitHubAgent", "HackathonAgent", "EventsAgent"])
     """
-    user_input_lower = user_input.lower()
-    agents = []
-    # Example patterns (expand as needed)
-    if re.search(r"github|repo|repository|commit|pull request", user_input_lower):
-        agents.append("GitHubAgent")
-    if re.search(r"hackathon|project idea|competition|challenge|win", user_input_lower):
-        agents.append("HackathonAgent")
-    if re.search(r"event|conference|meetup|workshop|webinar", user_input_lower):
-        agents.append("EventsAgent")
-    if not agents:
-        agents = ["GitHubAgent", "HackathonAgent", "EventsAgent"]
+    with tracer.span("route_user_input") as span:
+        agents = message_router.route(user_input)
+        span.set("agents", agents)
     return agents
 
 
+async def invoke_group_chat(agent_group_chat: AgentGroupChat):
+    responses = agent_group_chat.invoke().__aiter__()
+    while True:
+        with tracer.span("agent_turn") as span:
+            try:
+                content = await responses.__anext__()
+            except StopAsyncIteration:
+                span.drop()
+                return
+            span.set("agent", content.name)
+            record_usage(span, content)
+        yield content.name or "Agent", content.content
+
+
 @cl.on_message
 async def on_message(message: cl.Message):
+    # Model and MCP calls made for this message queue behind those of other sessions in turn
+    token = current_session.set(cl.context.session.id)
+    try:
+        with tracer.span("on_message", session_id=cl.context.session.id) as span, \
+                session_state.busy(cl.context.session.id):
+            if not admission.admit_message():
+                # Refuse right away rather than queue work that would only time out
+                span.set("server_busy", True)
+                await cl.Message(content=SERVER_BUSY_MESSAGE).send()
+                return
+            if cl.user_session.get("kernel") is None:
+                # The session was evicted while idle: rebuild it and reload the conversation
+                await build_session()
+                await restore_conversation()
+            await handle_message(message)
+            await save_conversation()
+    finally:
+        current_session.reset(token)
+
+
+async def handle_message(message: cl.Message):
     kernel = cl.user_session.get("kernel")
     chat_completion_service = cl.user_session.get("chat_completion_service")
     chat_history = cl.user_session.get("chat_history")
     settings = cl.user_session.get("settings")
     agent_group_chat = cl.user_session.get("agent_group_chat")
+    agents = cl.user_session.get("agents")
     sk_filter = cl.SemanticKernelFilter(kernel=kernel)
 
     user_input = message.content
     agent_names = route_user_input(user_input)
 
+    # EventsAgent answers last, so its searches can run while the other agents work
+    prefetch_events = rag_plugin.prefetcher is not None and len(agent_names) > 1 and "EventsAgent" in agent_names
+    cl.user_session.set("prefetch_events", prefetch_events)
+    if prefetch_events:
+        tracer.current().set("prefetched_queries", rag_plugin.prefetcher.prefetch(predict_queries(user_input)))
+
     # Add user message to chat history
     chat_history.add_user_message(message.content)
 
-    # If more than one agent is selected, use group chat
+    # If more than one agent is selected, run them in parallel where possible or use group chat
     if len(agent_names) > 1:
-        await agent_group_chat.add_chat_message(message.content)
         answer = cl.Message(content="Processing your request using: {}...\n\n".format(", ".join(agent_names)))
         await answer.send()
         agent_responses = []
         try:
-            async for content in agent_group_chat.invoke():
-                agent_name = content.name or "Agent"
-                response = f"**{agent_name}**: {content.content}"
+            if AGENT_EXECUTION_MODE == "parallel":
+                responses = run_agent_graph(agents, agent_names, chat_history.build().messages)
+            else:
+                agent_group_chat.termination_strategy.routed_agents = [agents[name].name for name in agent_names]
+                # An early stop leaves the rotation mid-way; begin this message at the first routed agent
+                agent_group_chat.selection_strategy.start(agent_group_chat.termination_strategy.routed_agents)
+                await agent_group_chat.add_chat_message(message.content)
+                responses = invoke_group_chat(agent_group_chat)
+            async for agent_name, content in responses:
+                response = f"**{agent_name}**: {content}"
                 agent_responses.append(response)
+                # Whole agent answers are already one frame each; send them as they finish
                 await answer.stream_token(f"{response}\n\n")
+            if AGENT_EXECUTION_MODE != "parallel":
+                turns = agent_group_chat.termination_strategy.record(agent_group_chat.history.messages)
+                tracer.current().set("group_chat_turns", turns["turns"])
+                logger.info(f"Group chat turns: {turns}")
             full_response = "\n\n".join(agent_responses)
             chat_history.add_assistant_message(full_response)
             answer.content = full_response
             await answer.update()
         except Exception as e:
-            await answer.stream_token(f"\n\n❌ Error: {str(e)}\n\n")
-            chat_history.add_assistant_message(f"Error: {str(e)}")
-            answer.content += f"\n\n❌ Error: {str(e)}"
+            error = error_message(e)
+            await answer.stream_token(f"\n\n❌ {error}\n\n")
+            chat_history.add_assistant_message(error)
+            answer.content += f"\n\n❌ {error}"
             await answer.update()
     else:
         # Single agent: route to the appropriate agent
         agent_name = agent_names[0]
         answer = cl.Message(content=f"Processing your request using {agent_name}...\n\n")
         await answer.send()
+        prompt_history = chat_history.build()
+        # Model chunks are batched into larger websocket frames
+        stream = TokenCoalescer(answer, max_chars=STREAM_FLUSH_CHARS, max_delay=STREAM_FLUSH_SECONDS)
         try:
-            async for msg in chat_completion_service.get_streaming_chat_message_content(
-                chat_history=chat_history,
-                user_input=message.content,
-                settings=settings,
-                kernel=kernel,
-            ):
-                if msg.content:
-                    await answer.stream_token(msg.content)
-                if isinstance(msg, FunctionCallContent):
-                    function_name = msg.function_name
-                    function_arguments = msg.arguments
-                    await answer.stream_token(f"\n\nCalling function: {function_name} with arguments: {function_arguments}\n\n")
-                if isinstance(msg, FunctionResultContent):
-                    await answer.stream_token(f"Function result: {msg.content}\n\n")
+            with tracer.span("model_stream", agent=agent_name) as stream_span:
+                async for msg in chat_completion_service.get_streaming_chat_message_content(
+                    chat_history=prompt_history,
+                    user_input=message.content,
+                    settings=settings,
+                    kernel=kernel,
+                ):
+                    if msg.content:
+                        stream_span.record_tokens()
+                        await stream.write(msg.content)
+                    if isinstance(msg, FunctionCallContent):
+                        function_name = msg.function_name
+                        function_arguments = msg.arguments
+                        await stream.write(f"\n\nCalling function: {function_name} with arguments: {function_arguments}\n\n", flush=True)
+                    if isinstance(msg, FunctionResultContent):
+                        await stream.write(f"Function result: {msg.content}\n\n", flush=True)
+                await stream.close()
+                stream_span.set("frames", stream.frames)
+            # Keep the function calls and results the kernel added to the window
+            chat_history.absorb(prompt_history)
             chat_history.add_assistant_message(answer.content)
             await answer.update()
         except Exception as e:
-            await answer.stream_token(f"\n\n❌ Error: {str(e)}\n\n")
-            chat_history.add_assistant_message(f"Error: {str(e)}")
-            answer.content += f"\n\n❌ Error: {str(e)}"
+            await stream.close()
+            error = error_message(e)
+            await answer.stream_token(f"\n\n❌ {error}\n\n")
+            chat_history.add_assistant_message(error)
+            answer.content += f"\n\n❌ {error}"
             await answer.update()
+
+
+startup_report.record("module import", time.perf_counter() - _import_started)
+logger.info(f"app.py imported in {startup_report.phases['module import'] * 1000:.1f} ms, index bootstrap deferred")
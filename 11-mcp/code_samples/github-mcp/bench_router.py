@@ -0,0 +1,67 @@
+"""
+Benchmarks routing cost as the keyword table grows.
+
+Compares the compiled KeywordRouter with the per-agent `re.search` alternations
+that route_user_input used before. Runs offline:
+
+    python bench_router.py
+"""
+import random
+import re
+import string
+import time
+
+from router import ROUTING_TABLE, KeywordRouter, KeywordScorer
+
+MESSAGES = [
+    "Recommend hackathon projects for the Github user koreyspace",
+    "Are there any Python workshops or meetups coming up next month?",
+    "Summarize the latest commit and pull request activity in my repository",
+    "I would like some ideas for what to build with semantic kernel and azure",
+]
+
+
+def synthetic_table(size: int, seed: int = 7) -> dict:
+    rng = random.Random(seed)
+    table = {agent: list(keywords) for agent, keywords in ROUTING_TABLE.items()}
+    agents = list(table)
+    while sum(len(keywords) for keywords in table.values()) < size:
+        word = "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(5, 12)))
+        table[rng.choice(agents)].append(word)
+    return table
+
+
+def regex_router(table: dict):
+    patterns = [(agent, re.compile("|".join(re.escape(k) for k in keywords))) for agent, keywords in table.items()]
+
+    def route(text):
+        text = text.lower()
+        return [agent for agent, pattern in patterns if pattern.search(text)] or list(table)
+
+    return route
+
+
+def time_per_call(route, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for message in MESSAGES:
+            route(message)
+    return (time.perf_counter() - started) / (repeat * len(MESSAGES)) * 1e6
+
+
+def main():
+    print(f"{'patterns':>9} {'build ms':>9} {'router us':>10} {'+scorer us':>11} {'regex us':>9}")
+    for size in (15, 100, 1000, 5000, 20000):
+        table = synthetic_table(size)
+        started = time.perf_counter()
+        router = KeywordRouter(table)
+        build_ms = (time.perf_counter() - started) * 1000
+        scored = KeywordRouter(table, scorer=KeywordScorer(table))
+        regex = regex_router(table)
+        repeat = 200
+        print(f"{size:>9} {build_ms:>9.1f} {time_per_call(router.route, repeat):>10.1f} "
+              f"{time_per_call(scored.route, repeat):>11.1f} {time_per_call(regex, repeat):>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
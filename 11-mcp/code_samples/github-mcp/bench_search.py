@@ -0,0 +1,109 @@
+"""
+Compares the in-process BM25 backend of search_events with Azure AI Search.
+
+Reports index build and load times, per-query latency and how many of the
+Azure top-5 results BM25 also returns. Without AZURE_SEARCH_SERVICE_ENDPOINT
+and AZURE_SEARCH_API_KEY only the BM25 side runs:
+
+    python bench_search.py
+"""
+import os
+import statistics
+import tempfile
+import time
+
+from dotenv import load_dotenv
+
+from bm25_index import BM25Index, build_index, load_or_build
+from index_sync import content_hash, parse_events
+
+QUERIES = [
+    "Python AI workshop",
+    "JavaScript hackathon",
+    "semantic kernel agents",
+    "autogen multi-agent",
+    "C# agent",
+    "Java AI",
+    "Azure AI Agent Service",
+    "GitHub Models prototype",
+    "LangGraph Cosmos DB",
+    "RAG retrieval augmented generation",
+    "Copilot Studio",
+    "TypeScript LLM app",
+]
+
+TOP = 5
+
+
+def time_ms(call, repeat: int) -> tuple:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = call()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples, result
+
+
+def azure_search():
+    endpoint, key = os.getenv("AZURE_SEARCH_SERVICE_ENDPOINT"), os.getenv("AZURE_SEARCH_API_KEY")
+    if not endpoint or not key:
+        return None
+    from azure.core.credentials import AzureKeyCredential
+    from azure.search.documents import SearchClient
+
+    client = SearchClient(endpoint=endpoint, index_name="event-descriptions", credential=AzureKeyCredential(key))
+    return lambda query: [result["id"] for result in client.search(query, top=TOP, select=["id"])]
+
+
+def main():
+    load_dotenv()
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    markdown_path = os.path.join(current_dir, "event-descriptions.md")
+    with open(markdown_path, "r", encoding="utf-8") as f:
+        markdown_content = f.read()
+
+    documents = parse_events(markdown_content)
+    build_ms, data = time_ms(lambda: build_index(documents, content_hash(markdown_content)), 20)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        index_path = os.path.join(tmp_dir, "events.bm25")
+        load_or_build(markdown_path, index_path).close()
+        load_ms = []
+        for _ in range(20):
+            started = time.perf_counter()
+            loaded = BM25Index.load(index_path)
+            load_ms.append((time.perf_counter() - started) * 1000)
+            # Each load maps the file and holds a descriptor until closed
+            loaded.close()
+        with BM25Index.load(index_path) as index:
+            print(f"{len(documents)} events, {index.terms} terms, index {len(data) / 1024:.1f} KiB")
+            print(f"build {statistics.median(build_ms):.2f} ms, mmap load {statistics.median(load_ms):.3f} ms\n")
+
+            azure = azure_search()
+            if azure is None:
+                print("AZURE_SEARCH_* not set, skipping the Azure AI Search comparison\n")
+            print(f"{'query':<36} {'bm25 ms':>8} {'azure ms':>9} {'overlap':>8}")
+            bm25_all, azure_all, overlaps = [], [], []
+            for query in QUERIES:
+                bm25_ms, hits = time_ms(lambda: index.search(query, top=TOP), 200)
+                bm25_ids = {doc_id for doc_id, _, _ in hits}
+                bm25_all.extend(bm25_ms)
+                row = f"{query:<36} {statistics.median(bm25_ms):>8.3f}"
+                if azure is not None:
+                    azure_ms, azure_ids = time_ms(lambda: azure(query), 5)
+                    azure_all.extend(azure_ms)
+                    # Share of the Azure results that BM25 also returns
+                    overlap = len(bm25_ids & set(azure_ids)) / len(azure_ids) if azure_ids else 1.0
+                    overlaps.append(overlap)
+                    row += f" {statistics.median(azure_ms):>9.1f} {overlap:>8.0%}"
+                print(row)
+
+            print(f"\nbm25 p50 {statistics.median(bm25_all):.3f} ms, "
+                  f"p95 {statistics.quantiles(bm25_all, n=20)[-1]:.3f} ms")
+            if azure_all:
+                print(f"azure p50 {statistics.median(azure_all):.1f} ms, "
+                      f"p95 {statistics.quantiles(azure_all, n=20)[-1]:.1f} ms, "
+                      f"mean top-{TOP} overlap {statistics.mean(overlaps):.0%}")
+
+
+if __name__ == "__main__":
+    main()
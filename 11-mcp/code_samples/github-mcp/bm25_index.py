@@ -0,0 +1,256 @@
+import heapq
+import logging
+import math
+import mmap
+import os
+import re
+import struct
+from array import array
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from index_sync import content_hash, parse_events
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9#+]+")
+
+STOPWORDS = frozenset("""
+a about all also an and any are as at be been but by can do for from has have how i if in into is it its
+more of on or our that the their them then there these they this to up us was we what when where which
+who will with you your
+""".split())
+
+VOWELS = frozenset("aeiouy")
+
+# magic, version, documents, terms, postings, average document length, sha256 of the source
+HEADER = struct.Struct("<8sIIIId32s")
+MAGIC = b"BM25IDX\x00"
+VERSION = 1
+RECORD = struct.Struct("<IIII")
+
+
+def _has_vowel(word: str) -> bool:
+    return any(char in VOWELS for char in word)
+
+
+def stem(word: str) -> str:
+    """
+    Light suffix stripper after Porter's step 1: plurals and -ed/-ing.
+
+    "agents" and "agent", "building" and "build", "created" and "create" end up
+    as the same term, which is what matching event descriptions needs.
+    """
+    if len(word) <= 3 or not word.isalpha():
+        return word
+    if word.endswith("sses"):
+        word = word[:-2]
+    elif word.endswith("ies"):
+        word = word[:-3] + "y"
+    elif word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        word = word[:-1]
+
+    for suffix in ("ing", "ed"):
+        stripped = word[:-len(suffix)]
+        if word.endswith(suffix) and len(stripped) >= 3 and _has_vowel(stripped):
+            if stripped.endswith(("at", "bl", "iz")):
+                return stripped + "e"
+            if stripped[-1] == stripped[-2] and stripped[-1] not in "lsz":
+                return stripped[:-1]
+            if len(stripped) == 3 and stripped[0] not in VOWELS and stripped[1] in VOWELS and stripped[2] not in "aeiouwxy":
+                return stripped + "e"
+            return stripped
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    return [stem(token) for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def build_index(documents: List[Dict[str, str]], source_hash: str = "") -> bytes:
+    """
+    Serializes documents into the binary index layout read by `BM25Index`.
+
+    After the header come fixed-width sections, each readable in place from a
+    memory map: the term table (sorted, so terms are found by binary search),
+    the term bytes, posting document numbers and term frequencies, document
+    lengths, the document table and the document bytes.
+    """
+    postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+    lengths = array("I")
+    for number, document in enumerate(documents):
+        tokens = tokenize(document["content"])
+        lengths.append(len(tokens))
+        for term, frequency in Counter(tokens).items():
+            postings[term].append((number, min(frequency, 0xFFFF)))
+
+    term_table, term_blob = bytearray(), bytearray()
+    doc_numbers, frequencies = array("I"), array("H")
+    for term in sorted(postings, key=lambda t: t.encode("utf-8")):
+        encoded = term.encode("utf-8")
+        term_table += RECORD.pack(len(term_blob), len(encoded), len(doc_numbers), len(postings[term]))
+        term_blob += encoded
+        for number, frequency in postings[term]:
+            doc_numbers.append(number)
+            frequencies.append(frequency)
+
+    doc_table, doc_blob = bytearray(), bytearray()
+    for document in documents:
+        doc_id, content = document["id"].encode("utf-8"), document["content"].encode("utf-8")
+        doc_table += RECORD.pack(len(doc_blob), len(doc_id), len(doc_blob) + len(doc_id), len(content))
+        doc_blob += doc_id + content
+
+    average_length = sum(lengths) / len(lengths) if lengths else 0.0
+    header = HEADER.pack(
+        MAGIC, VERSION, len(documents), len(postings), len(doc_numbers), average_length,
+        bytes.fromhex(source_hash) if source_hash else bytes(32))
+    return b"".join([
+        header, bytes(term_table), bytes(term_blob), doc_numbers.tobytes(), frequencies.tobytes(),
+        lengths.tobytes(), bytes(doc_table), bytes(doc_blob),
+    ])
+
+
+class BM25Index:
+    """
+    Okapi BM25 search over an index produced by `build_index`.
+
+    The index is read in place from any buffer, normally a memory-mapped file,
+    so loading it only parses the header: no term dictionary or posting list is
+    rebuilt, and workers on one host share the pages through the OS cache.
+    """
+
+    def __init__(self, buffer, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._buffer = buffer
+        view = memoryview(buffer)
+        magic, version, self.documents, self.terms, total_postings, self.average_length, source_hash = \
+            HEADER.unpack_from(view, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not a BM25 index, or written by another version")
+        self.source_hash = source_hash.hex()
+
+        offset = HEADER.size + self.terms * RECORD.size
+        self._term_table = view[HEADER.size:offset].cast("I")
+        # Terms are stored in table order, so the last record ends the term bytes
+        term_blob_size = self._term_table[-4] + self._term_table[-3] if self.terms else 0
+        self._term_blob = view[offset:offset + term_blob_size]
+        offset += term_blob_size
+        self._doc_numbers = view[offset:offset + 4 * total_postings].cast("I")
+        offset += 4 * total_postings
+        self._frequencies = view[offset:offset + 2 * total_postings].cast("H")
+        offset += 2 * total_postings
+        self._lengths = view[offset:offset + 4 * self.documents].cast("I")
+        offset += 4 * self.documents
+        self._doc_table = view[offset:offset + RECORD.size * self.documents].cast("I")
+        offset += RECORD.size * self.documents
+        self._doc_blob = view[offset:]
+
+    @classmethod
+    def load(cls, path: str, **kwargs) -> "BM25Index":
+        with open(path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(buffer, **kwargs)
+
+    def _term(self, index: int) -> bytes:
+        start, length = self._term_table[4 * index], self._term_table[4 * index + 1]
+        return self._term_blob[start:start + length].tobytes()
+
+    def _find(self, term: str) -> Optional[Tuple[int, int]]:
+        """Returns the posting offset and document frequency of `term`, if it is indexed."""
+        encoded = term.encode("utf-8")
+        low, high = 0, self.terms
+        while low < high:
+            middle = (low + high) // 2
+            if self._term(middle) < encoded:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.terms and self._term(low) == encoded:
+            return self._term_table[4 * low + 2], self._term_table[4 * low + 3]
+        return None
+
+    def document(self, number: int) -> Tuple[str, str]:
+        id_start, id_length, content_start, content_length = self._doc_table[4 * number:4 * number + 4]
+        return (
+            self._doc_blob[id_start:id_start + id_length].tobytes().decode("utf-8"),
+            self._doc_blob[content_start:content_start + content_length].tobytes().decode("utf-8"),
+        )
+
+    def search(self, query: str, top: int = 5) -> List[Tuple[str, float, str]]:
+        """Returns up to `top` (id, score, content) tuples, best first."""
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            found = self._find(term)
+            if found is None:
+                continue
+            start, frequency_count = found
+            idf = math.log(1 + (self.documents - frequency_count + 0.5) / (frequency_count + 0.5))
+            for i in range(start, start + frequency_count):
+                number, frequency = self._doc_numbers[i], self._frequencies[i]
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[number] / self.average_length)
+                scores[number] += idf * frequency * (self.k1 + 1) / (frequency + norm)
+        best = heapq.nlargest(top, scores.items(), key=lambda item: item[1])
+        results = []
+        for number, score in best:
+            doc_id, content = self.document(number)
+            results.append((doc_id, score, content))
+        return results
+
+    def close(self):
+        for view in (self._term_table, self._term_blob, self._doc_numbers, self._frequencies,
+                     self._lengths, self._doc_table, self._doc_blob):
+            view.release()
+        if isinstance(self._buffer, mmap.mmap):
+            self._buffer.close()
+
+    def __enter__(self) -> "BM25Index":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def load_or_build(markdown_path: str, index_path: str) -> BM25Index:
+    """Opens the index at `index_path`, rebuilding it first when the markdown file has changed."""
+    with open(markdown_path, "r", encoding="utf-8") as f:
+        markdown_content = f.read()
+    source_hash = content_hash(markdown_content)
+    try:
+        index = BM25Index.load(index_path)
+        if index.source_hash == source_hash:
+            return index
+        index.close()
+    except (FileNotFoundError, ValueError, struct.error):
+        pass
+
+    documents = parse_events(markdown_content)
+    # Write to a temporary file first; workers that mapped the old file keep reading it safely
+    tmp_path = f"{index_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(build_index(documents, source_hash))
+    os.replace(tmp_path, index_path)
+    logger.info(f"Built BM25 index of {len(documents)} events at {index_path}")
+    return BM25Index.load(index_path)
+
+
+class LocalSearchClient:
+    """Answers `search` like the async Azure Search client, from an in-process `BM25Index`."""
+
+    def __init__(self, index: Optional[BM25Index] = None):
+        self.index = index
+
+    async def search(self, search_text: str, top: int = 5):
+        if self.index is None:
+            raise RuntimeError("The BM25 index is not loaded")
+        hits = self.index.search(search_text, top=top)
+        return self._results([{"id": doc_id, "content": content, "@search.score": score} for doc_id, score, content in hits])
+
+    async def _results(self, hits):
+        for hit in hits:
+            yield hit
+
+    async def close(self):
+        if self.index is not None:
+            self.index.close()
+            self.index = None
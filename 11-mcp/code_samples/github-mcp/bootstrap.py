@@ -0,0 +1,79 @@
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class StartupReport:
+    """Collects how long each startup phase took, in seconds."""
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+
+    def record(self, name: str, seconds: float):
+        self.phases[name] = seconds
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def summary(self) -> str:
+        lines = ["Startup report:"]
+        for name, seconds in self.phases.items():
+            lines.append(f"  {name:<28} {seconds * 1000:9.1f} ms")
+        return "\n".join(lines)
+
+
+class IndexBootstrap:
+    """
+    Runs the blocking search index bootstrap in a worker thread after startup.
+
+    `start()` is idempotent and returns immediately, so chat sessions can begin
+    while the index is still being prepared. Code that needs the index awaits
+    `wait_ready()`. If the bootstrap fails, the error is logged, waiters are
+    released and the next `start()` call tries again.
+    """
+
+    def __init__(self, run: Callable[[StartupReport], None], report: Optional[StartupReport] = None):
+        self.run = run
+        self.report = report or StartupReport()
+        self.error: Optional[BaseException] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> bool:
+        return self._task is not None and self._task.done() and self.error is None
+
+    def start(self) -> asyncio.Task:
+        if self._task is None or (self._task.done() and self.error is not None):
+            self.error = None
+            self._task = asyncio.create_task(self._run())
+        return self._task
+
+    async def _run(self):
+        started = time.perf_counter()
+        try:
+            await asyncio.to_thread(self.run, self.report)
+        except Exception as e:
+            self.error = e
+            logger.error(f"❌ Error bootstrapping search index: {str(e)}")
+        finally:
+            self.report.record("bootstrap total", time.perf_counter() - started)
+            logger.info(self.report.summary())
+
+    async def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Waits for the bootstrap to finish. Returns False on failure or timeout."""
+        task = self.start()
+        try:
+            await asyncio.wait_for(asyncio.shield(task), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Search index not ready after {timeout}s")
+            return False
+        return self.error is None
@@ -0,0 +1,267 @@
+import base64
+import binascii
+import json
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from mcp.types import CallToolResult, TextContent
+
+from history import make_token_counter
+from tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+# Prompt tokens a single result of each tool may take; other tools get `default_budget`
+TOOL_BUDGETS: Dict[str, int] = {
+    "search_events": 1000,
+    "search_repositories": 1200,
+    "search_code": 800,
+    "search_issues": 1000,
+    "get_file_contents": 2000,
+    "list_commits": 600,
+    "list_issues": 1000,
+    "list_pull_requests": 800,
+}
+
+# Fields of the GitHub API objects each tool returns that the agents actually use.
+# Paths are dotted; lists are walked transparently, so "items.full_name" keeps the
+# full_name of every search result.
+PROJECTIONS: Dict[str, List[str]] = {
+    "search_repositories": [
+        "total_count", "items.full_name", "items.description", "items.language", "items.html_url",
+        "items.stargazers_count", "items.topics", "items.updated_at",
+    ],
+    "search_code": ["total_count", "items.name", "items.path", "items.repository.full_name", "items.html_url"],
+    "search_issues": [
+        "total_count", "items.number", "items.title", "items.state", "items.html_url", "items.user.login", "items.body",
+    ],
+    "get_file_contents": ["name", "path", "type", "size", "html_url", "content", "encoding"],
+    "list_commits": ["sha", "html_url", "commit.message", "commit.author.name", "commit.author.date"],
+    "list_issues": ["number", "title", "state", "html_url", "user.login", "labels.name", "body"],
+    "list_pull_requests": ["number", "title", "state", "html_url", "user.login", "head.ref", "base.ref"],
+}
+
+# Dropped from JSON results of tools without a projection: API plumbing the model has no use for
+NOISE_KEYS = frozenset({"node_id", "gravatar_id", "permissions", "_links", "url"})
+
+# search_events joins one entry per event with blank lines
+ENTRY_SEPARATOR = "\n\n"
+
+
+def project(value: Any, paths: List[str]) -> Any:
+    """Keeps only the dotted `paths` of a JSON value."""
+    if isinstance(value, list):
+        return [project(item, paths) for item in value]
+    if not isinstance(value, dict):
+        return value
+    tree: Dict[str, List[str]] = {}
+    for path in paths:
+        head, _, rest = path.partition(".")
+        tree.setdefault(head, []).append(rest)
+    projected = {}
+    for key, rests in tree.items():
+        if key in value:
+            projected[key] = value[key] if "" in rests else project(value[key], [r for r in rests if r])
+    return projected
+
+
+def strip_noise(value: Any) -> Any:
+    if isinstance(value, list):
+        return [strip_noise(item) for item in value]
+    if isinstance(value, dict):
+        return {
+            key: strip_noise(item) for key, item in value.items()
+            if key not in NOISE_KEYS and not (key.endswith("_url") and key != "html_url")
+        }
+    return value
+
+
+def decode_contents(value: Any) -> Any:
+    """Replaces base64 file contents from the GitHub contents API with the text they hold."""
+    if isinstance(value, dict) and value.get("encoding") == "base64" and isinstance(value.get("content"), str):
+        try:
+            text = base64.b64decode(value["content"]).decode("utf-8")
+        except (binascii.Error, UnicodeDecodeError):
+            return value
+        return {**value, "content": text, "encoding": "utf-8"}
+    return value
+
+
+def dedupe(items: List[Any]) -> Tuple[List[Any], int]:
+    seen, kept = set(), []
+    for item in items:
+        key = json.dumps(item, sort_keys=True) if not isinstance(item, str) else " ".join(item.lower().split())
+        if key in seen:
+            continue
+        seen.add(key)
+        kept.append(item)
+    return kept, len(items) - len(kept)
+
+
+class ToolResultCompactor:
+    """
+    Shrinks tool results to a per-tool token budget before they reach the model.
+
+    JSON results are projected onto the fields the agents use (`PROJECTIONS`,
+    or everything but API plumbing for other tools) and serialized without
+    indentation. Repeated records, or repeated entries of text results such as
+    search_events, are dropped. A result still over its budget loses its last
+    records, and then the tail of its longest text field. Whatever was left out
+    is stated in the result, so the model knows it is looking at a subset and
+    can ask for a narrower query.
+    """
+
+    def __init__(
+        self,
+        budgets: Optional[Dict[str, int]] = None,
+        default_budget: int = 1500,
+        projections: Optional[Dict[str, List[str]]] = None,
+        token_counter: Optional[Callable[[str], int]] = None,
+    ):
+        self.budgets = {**TOOL_BUDGETS, **(budgets or {})}
+        self.default_budget = default_budget
+        self.projections = PROJECTIONS if projections is None else projections
+        self.count_tokens = token_counter or make_token_counter()
+        self.calls = 0
+        self.compacted = 0
+        self.tokens_before = 0
+        self.tokens_after = 0
+
+    def budget(self, tool_name: str) -> int:
+        return self.budgets.get(tool_name, self.default_budget)
+
+    def _cut_text(self, text: str, budget: int) -> Tuple[str, int]:
+        """Cuts `text` to about `budget` tokens; returns the text and how many characters were dropped."""
+        tokens = self.count_tokens(text)
+        if tokens <= budget:
+            return text, 0
+        keep = max(0, int(len(text) * budget / tokens))
+        return text[:keep], len(text) - keep
+
+    def _compact_json(self, tool_name: str, value: Any, budget: int) -> Tuple[str, List[str]]:
+        notes = []
+        paths = self.projections.get(tool_name)
+        value = project(value, paths) if paths else strip_noise(value)
+        value = [decode_contents(item) for item in value] if isinstance(value, list) else decode_contents(value)
+
+        # The records worth trimming: a top-level list, or the "items" of a search
+        container, key = (None, None)
+        if isinstance(value, list):
+            container = value
+        elif isinstance(value, dict) and isinstance(value.get("items"), list):
+            container, key = value["items"], "items"
+        if container is not None:
+            records, duplicates = dedupe(container)
+            if duplicates:
+                notes.append(f"{duplicates} duplicate records removed")
+            total = len(records)
+            while len(records) > 1 and self.count_tokens(
+                    json.dumps(records if key is None else {**value, key: records}, separators=(",", ":"), ensure_ascii=False)) > budget:
+                records.pop()
+            if len(records) < total:
+                notes.append(f"kept the first {len(records)} of {total} records")
+            value = records if key is None else {**value, key: records}
+
+        text = json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+        overflow = self.count_tokens(text) - budget
+        if overflow > 0 and isinstance(value, dict):
+            # A single large record, e.g. a file: shorten its longest text field
+            field_name = max((k for k, v in value.items() if isinstance(v, str)), key=lambda k: len(value[k]), default=None)
+            if field_name is not None:
+                field_budget = max(0, self.count_tokens(value[field_name]) - overflow)
+                cut, dropped = self._cut_text(value[field_name], field_budget)
+                if dropped:
+                    value = {**value, field_name: cut}
+                    notes.append(f"the last {dropped} characters of '{field_name}' cut")
+                    text = json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+        return text, notes
+
+    def _compact_text(self, text: str, budget: int) -> Tuple[str, List[str]]:
+        notes = []
+        entries, duplicates = dedupe([entry.strip() for entry in text.split(ENTRY_SEPARATOR) if entry.strip()])
+        if duplicates:
+            notes.append(f"{duplicates} duplicate entries removed")
+        kept, used = [], 0
+        for entry in entries:
+            cost = self.count_tokens(entry)
+            if used + cost > budget:
+                if not kept:
+                    cut, dropped = self._cut_text(entry, budget)
+                    kept.append(cut)
+                    notes.append(f"the last {dropped} characters cut")
+                break
+            kept.append(entry)
+            used += cost
+        if len(kept) < len(entries):
+            notes.append(f"kept the first {len(kept)} of {len(entries)} entries")
+        return ENTRY_SEPARATOR.join(kept), notes
+
+    def compact(self, tool_name: str, text: str) -> str:
+        """Returns `text` compacted to the budget of `tool_name`, with a note on what was left out."""
+        self.calls += 1
+        before = self.count_tokens(text)
+        budget = self.budget(tool_name)
+        try:
+            value = json.loads(text)
+        except ValueError:
+            value = None
+        if isinstance(value, (dict, list)):
+            compacted, notes = self._compact_json(tool_name, value, budget)
+        elif before > budget or ENTRY_SEPARATOR in text:
+            compacted, notes = self._compact_text(text, budget)
+        else:
+            compacted, notes = text, []
+        if notes:
+            compacted += f"\n\n[Result compacted: {'; '.join(notes)}]"
+
+        after = self.count_tokens(compacted)
+        if after >= before:
+            compacted, after = text, before
+        else:
+            self.compacted += 1
+            logger.info(f"Compacted {tool_name} result: {before} -> {after} tokens")
+        self.tokens_before += before
+        self.tokens_after += after
+        span = tracer.current()
+        if span is not None:
+            span.set("result_tokens", before)
+            span.set("compacted_tokens", after)
+        return compacted
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "compacted": self.compacted,
+            "tokens_before": self.tokens_before,
+            "tokens_after": self.tokens_after,
+            "saved_ratio": round(1 - self.tokens_after / self.tokens_before, 3) if self.tokens_before else None,
+        }
+
+    def compact_contents(
+        self,
+        tool_name: str,
+        items: List[Any],
+        text_type: type = TextContent,
+        make_text: Callable[[str], Any] = lambda text: TextContent(type="text", text=text),
+    ) -> Optional[List[Any]]:
+        """
+        Compacts the text items of a tool result together, so the whole result keeps to one budget.
+
+        Returns the compacted text as one item of `make_text`, followed by the
+        other items unchanged, or None when there was nothing to compact.
+        """
+        texts = [item.text for item in items if isinstance(item, text_type)]
+        if not texts:
+            return None
+        text = "\n".join(texts)
+        compacted = self.compact(tool_name, text)
+        if compacted is text:
+            return None
+        return [make_text(compacted), *(item for item in items if not isinstance(item, text_type))]
+
+    def compact_call_result(self, tool_name: str, result: CallToolResult) -> CallToolResult:
+        """Compacts the text of an MCP tool result into a copy; errors and other content are left alone."""
+        if result.isError:
+            return result
+        content = self.compact_contents(tool_name, result.content)
+        return result if content is None else result.model_copy(update={"content": content})
@@ -0,0 +1,281 @@
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import aiohttp
+from mcp.shared.exceptions import McpError
+from semantic_kernel.connectors.mcp import MCPStdioPlugin, _mcp_call_tool_result_to_kernel_contents
+from semantic_kernel.exceptions import FunctionExecutionException
+
+logger = logging.getLogger(__name__)
+
+GITHUB_API_URL = "https://api.github.com"
+
+# How the MCP server READ_ONLY_TOOLS describes is launched; other servers' tools take other arguments
+GITHUB_MCP_SERVERS = ("@modelcontextprotocol/server-github",)
+
+
+def is_github_server(connection, identities=GITHUB_MCP_SERVERS) -> bool:
+    """Whether an MCP connection runs the GitHub server, judged by its command, args and url rather than its name."""
+    launch = [getattr(connection, "command", None), *(getattr(connection, "args", None) or []), getattr(connection, "url", None)]
+    return any(identity in part for part in launch if isinstance(part, str) for identity in identities)
+
+
+def _repo(arguments: Dict[str, Any]) -> str:
+    return f"/repos/{arguments['owner']}/{arguments['repo']}"
+
+
+def _search(kind: str, query_argument: str):
+    return lambda a: (f"/search/{kind}", {
+        "q": a.get(query_argument), "sort": a.get("sort"), "order": a.get("order"),
+        "page": a.get("page"), "per_page": a.get("perPage") or a.get("per_page"),
+    })
+
+
+# Read-only tools of @modelcontextprotocol/server-github and the REST request each one makes,
+# used to revalidate cached results. Tools mapped to None are cached for the freshness window only.
+READ_ONLY_TOOLS: Dict[str, Optional[Callable[[Dict[str, Any]], Tuple[str, Dict[str, Any]]]]] = {
+    "search_repositories": _search("repositories", "query"),
+    "search_code": _search("code", "q"),
+    "search_issues": _search("issues", "q"),
+    "search_users": _search("users", "q"),
+    "get_file_contents": lambda a: (f"{_repo(a)}/contents/{a.get('path', '').lstrip('/')}", {"ref": a.get("branch")}),
+    "list_commits": lambda a: (f"{_repo(a)}/commits", {
+        "sha": a.get("sha"), "page": a.get("page"), "per_page": a.get("perPage")}),
+    "list_issues": lambda a: (f"{_repo(a)}/issues", {
+        "state": a.get("state"), "labels": ",".join(a["labels"]) if a.get("labels") else None,
+        "sort": a.get("sort"), "direction": a.get("direction"), "since": a.get("since"),
+        "page": a.get("page"), "per_page": a.get("per_page")}),
+    "get_issue": lambda a: (f"{_repo(a)}/issues/{a['issue_number']}", {}),
+    "list_pull_requests": lambda a: (f"{_repo(a)}/pulls", {
+        "state": a.get("state"), "head": a.get("head"), "base": a.get("base"), "sort": a.get("sort"),
+        "direction": a.get("direction"), "page": a.get("page"), "per_page": a.get("per_page")}),
+    "get_pull_request": lambda a: (f"{_repo(a)}/pulls/{a['pull_number']}", {}),
+    "get_pull_request_files": lambda a: (f"{_repo(a)}/pulls/{a['pull_number']}/files", {}),
+    "get_pull_request_comments": lambda a: (f"{_repo(a)}/pulls/{a['pull_number']}/comments", {}),
+    "get_pull_request_reviews": lambda a: (f"{_repo(a)}/pulls/{a['pull_number']}/reviews", {}),
+    "get_pull_request_status": None,
+}
+
+
+@dataclass
+class CachedToolResult:
+    """An MCP tool result plus the validator of the GitHub resource behind it."""
+    result: Any
+    repo: Optional[Tuple[str, str]] = None
+    url: Optional[str] = None
+    params: Dict[str, Any] = field(default_factory=dict)
+    etag: Optional[str] = None
+    fetched_at: float = field(default_factory=time.monotonic)
+
+
+class GitHubToolCache:
+    """
+    Process-wide cache for read-only GitHub MCP tool calls, keyed by tool name and arguments.
+
+    Results younger than `ttl` seconds are served without touching GitHub.
+    Older results are revalidated with a conditional `HEAD` request against the
+    REST endpoint the tool reads (`If-None-Match` with the stored ETag): a 304
+    keeps the cached result and does not count against the rate limit, while
+    any other answer re-runs the tool. The ETag is always fetched before the
+    tool call, so it is never newer than the result it validates; a change in
+    between only costs one refetch at the next revalidation. Without a `token`
+    there is no revalidation and results are simply re-fetched after `ttl`.
+
+    Calls to other (writing) tools pass through and drop the cached results
+    for the repository they touch, along with all cached searches. Calls that
+    reach the MCP server wait for a slot from the optional `admission`
+    controller; cache hits don't.
+    """
+
+    def __init__(
+        self,
+        token: Optional[str] = None,
+        ttl: float = 60.0,
+        max_entries: int = 512,
+        api_url: str = GITHUB_API_URL,
+        max_connections: int = 10,
+        timeout: float = 5.0,
+        admission=None,
+    ):
+        self.token = token
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.api_url = api_url.rstrip("/")
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.admission = admission
+        self._entries: "OrderedDict[str, CachedToolResult]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._http_session: Optional[aiohttp.ClientSession] = None
+        self.hits = 0
+        self.revalidated = 0
+        self.refetched = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.invalidations = 0
+        self.evictions = 0
+        self.validator_errors = 0
+
+    @staticmethod
+    def _key(tool_name: str, arguments: Dict[str, Any]) -> str:
+        return f"{tool_name}:{json.dumps(arguments, sort_keys=True, default=str)}"
+
+    def _get_http_session(self) -> aiohttp.ClientSession:
+        # Created lazily because an aiohttp session must be bound to the running loop
+        if self._http_session is None or self._http_session.closed:
+            self._http_session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=60),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={
+                    "Accept": "application/vnd.github+json",
+                    "Authorization": f"Bearer {self.token}",
+                    "X-GitHub-Api-Version": "2022-11-28",
+                },
+            )
+        return self._http_session
+
+    async def _head(self, url: str, params: Dict[str, Any], etag: Optional[str] = None) -> Tuple[int, Optional[str]]:
+        headers = {"If-None-Match": etag} if etag else {}
+        async with self._get_http_session().head(url, params=params, headers=headers) as response:
+            return response.status, response.headers.get("ETag")
+
+    async def _validator(self, url: str, params: Dict[str, Any]) -> Optional[str]:
+        try:
+            status, etag = await self._head(url, params)
+        except Exception as e:
+            self.validator_errors += 1
+            logger.debug(f"Could not fetch ETag for {url}: {str(e)}")
+            return None
+        return etag if status == 200 else None
+
+    async def _call(self, session, tool_name: str, arguments: Dict[str, Any]):
+        if self.admission is None:
+            return await session.call_tool(tool_name, arguments)
+        async with self.admission.slot("mcp"):
+            return await session.call_tool(tool_name, arguments)
+
+    def _store(self, key: str, entry: CachedToolResult):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def _load(self, key: str, session, tool_name: str, arguments: Dict[str, Any]):
+        entry = self._entries.get(key)
+        if entry is not None and entry.etag:
+            try:
+                status, etag = await self._head(entry.url, entry.params, entry.etag)
+            except Exception as e:
+                self.validator_errors += 1
+                logger.debug(f"Revalidating {tool_name} failed: {str(e)}")
+                status, etag = None, None
+            if status == 304:
+                self.revalidated += 1
+                entry.fetched_at = time.monotonic()
+                self._entries.move_to_end(key)
+                return entry.result
+            self.refetched += 1
+            result = await self._call(session, tool_name, arguments)
+            # Keep the old validator when GitHub could not be reached; it still identifies our copy
+            validator = etag if status == 200 else entry.etag if status is None else None
+        else:
+            route = READ_ONLY_TOOLS[tool_name]
+            entry = CachedToolResult(result=None)
+            if self.token and route is not None:
+                try:
+                    path, params = route(arguments)
+                    entry.url = f"{self.api_url}{path}"
+                    entry.params = {name: value for name, value in params.items() if value is not None}
+                except (KeyError, TypeError):
+                    entry.url = None
+            # Validator first: one fetched alongside the call could describe a newer version than the result
+            validator = await self._validator(entry.url, entry.params) if entry.url else None
+            result = await self._call(session, tool_name, arguments)
+
+        if getattr(result, "isError", False):
+            self._entries.pop(key, None)
+            return result
+        if "owner" in arguments and "repo" in arguments:
+            entry.repo = (str(arguments["owner"]).lower(), str(arguments["repo"]).lower())
+        entry.result = result
+        entry.etag = validator
+        entry.fetched_at = time.monotonic()
+        self._store(key, entry)
+        return result
+
+    def invalidate(self, owner: Optional[str] = None, repo: Optional[str] = None):
+        """Drops the results for one repository and every cached search."""
+        target = (str(owner).lower(), str(repo).lower()) if owner and repo else None
+        for key in [k for k, e in self._entries.items() if k.startswith("search_") or (target and e.repo == target)]:
+            del self._entries[key]
+            self.invalidations += 1
+
+    async def call_tool(self, session, tool_name: str, arguments: Optional[Dict[str, Any]] = None):
+        """Calls `tool_name` on an MCP `ClientSession`, answering read-only tools from the cache when possible."""
+        arguments = arguments or {}
+        if tool_name not in READ_ONLY_TOOLS:
+            self.bypassed += 1
+            result = await self._call(session, tool_name, arguments)
+            if not getattr(result, "isError", False):
+                self.invalidate(arguments.get("owner"), arguments.get("repo"))
+            return result
+
+        key = self._key(tool_name, arguments)
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry.fetched_at < self.ttl:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry.result
+        if entry is None:
+            self.misses += 1
+
+        # Concurrent calls for the same key share one load, which finishes even if its caller gives up
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._load(key, session, tool_name, arguments))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "revalidated": self.revalidated,
+            "refetched": self.refetched,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "invalidations": self.invalidations,
+            "evictions": self.evictions,
+            "validator_errors": self.validator_errors,
+        }
+
+    async def close(self):
+        if self._http_session is not None and not self._http_session.closed:
+            await self._http_session.close()
+
+
+class CachingMCPStdioPlugin(MCPStdioPlugin):
+    """MCPStdioPlugin whose tool calls go through a shared `GitHubToolCache`."""
+
+    def __init__(self, *args, cache: GitHubToolCache, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cache = cache
+
+    async def call_tool(self, tool_name: str, **kwargs: Any):
+        if not self.session or not self.load_tools_flag:
+            # Let the base class raise its usual configuration error
+            return await super().call_tool(tool_name, **kwargs)
+        try:
+            return _mcp_call_tool_result_to_kernel_contents(
+                await self.cache.call_tool(self.session, tool_name, kwargs))
+        except McpError:
+            raise
+        except Exception as ex:
+            raise FunctionExecutionException(f"Failed to call tool '{tool_name}'.") from ex
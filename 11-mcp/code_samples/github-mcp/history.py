@@ -0,0 +1,238 @@
+import json
+import logging
+import re
+from typing import Any, Callable, Dict, List, Optional
+
+from semantic_kernel.contents import AuthorRole, ChatHistory, ChatMessageContent
+from semantic_kernel.contents.function_call_content import FunctionCallContent
+from semantic_kernel.contents.function_result_content import FunctionResultContent
+from semantic_kernel.contents.text_content import TextContent
+
+try:
+    import tiktoken
+except ImportError:  # The estimate below is close enough to budget against
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# URLs, owner/repo slugs, @handles and identifiers with digits, underscores or dashes
+KEY_TERM_PATTERN = re.compile(r"https?://\S+|[\w.-]+/[\w.-]+|@\w+|\b\w*[\d_-]\w*\b")
+
+
+def message_text(message: ChatMessageContent) -> str:
+    parts = []
+    for item in message.items:
+        if isinstance(item, TextContent):
+            parts.append(item.text or "")
+        elif isinstance(item, FunctionCallContent):
+            parts.append(f"{item.name} {item.arguments}")
+        elif isinstance(item, FunctionResultContent):
+            parts.append(str(item.result))
+    return "\n".join(parts)
+
+
+def encode_message(message: ChatMessageContent) -> Dict[str, Any]:
+    """Compact, JSON-ready form of a message: role, author, text and any function calls or results."""
+    data: Dict[str, Any] = {"role": message.role.value}
+    if message.name:
+        data["name"] = message.name
+    calls = [item for item in message.items if isinstance(item, FunctionCallContent)]
+    results = [item for item in message.items if isinstance(item, FunctionResultContent)]
+    if calls:
+        data["calls"] = [
+            {"id": c.id, "name": c.name, "arguments": c.arguments if isinstance(c.arguments, str) else json.dumps(c.arguments)}
+            for c in calls
+        ]
+    if results:
+        data["results"] = [{"id": r.id, "name": r.name, "result": str(r.result)} for r in results]
+    if message.content:
+        data["text"] = message.content
+    return data
+
+
+def decode_message(data: Dict[str, Any]) -> ChatMessageContent:
+    items = [FunctionCallContent(id=c["id"], name=c["name"], arguments=c["arguments"]) for c in data.get("calls", [])]
+    items += [FunctionResultContent(id=r["id"], name=r["name"], result=r["result"]) for r in data.get("results", [])]
+    if data.get("text") and not items:
+        return ChatMessageContent(role=AuthorRole(data["role"]), name=data.get("name"), content=data["text"])
+    if data.get("text"):
+        items.insert(0, TextContent(text=data["text"]))
+    return ChatMessageContent(role=AuthorRole(data["role"]), name=data.get("name"), items=items)
+
+
+def make_token_counter(model: str = "gpt-4o") -> Callable[[str], int]:
+    if tiktoken is not None:
+        try:
+            encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            encoding = tiktoken.get_encoding("o200k_base")
+        return lambda text: len(encoding.encode(text))
+    return lambda text: (len(text) + 3) // 4
+
+
+class HistoryManager:
+    """
+    Keeps the full conversation and builds a token-budgeted window to send to the model.
+
+    The window holds the system message, a rolling summary of turns that no
+    longer fit, tool results from those turns that the recent turns still refer
+    to, and as many recent turns as fit in `token_budget`, verbatim. A turn
+    starts at a user message. The current turn is always kept in full.
+
+    A folded tool result stays pinned while one of its key terms (a URL, an
+    owner/repo slug or another identifier) appears in the recent turns, within
+    `pinned_budget` tokens. The summary is extractive, built from the start of
+    each folded message, and kept under `summary_budget` tokens.
+    """
+
+    def __init__(
+        self,
+        system_message: Optional[str] = None,
+        token_budget: int = 6000,
+        summary_budget: int = 600,
+        pinned_budget: int = 1500,
+        summary_chars_per_message: int = 200,
+        token_counter: Optional[Callable[[str], int]] = None,
+    ):
+        self.system_message = system_message
+        self.token_budget = token_budget
+        self.summary_budget = summary_budget
+        self.pinned_budget = pinned_budget
+        self.summary_chars_per_message = summary_chars_per_message
+        self.count_tokens = token_counter or make_token_counter()
+        self.turns: List[List[ChatMessageContent]] = []
+        self.turn_stats: List[Dict[str, int]] = []
+        self._token_cache: Dict[int, int] = {}
+        self._window: Optional[ChatHistory] = None
+        self._window_length = 0
+
+    def add_message(self, message: ChatMessageContent):
+        if message.role == AuthorRole.USER or not self.turns:
+            self.turns.append([])
+        self.turns[-1].append(message)
+
+    def add_user_message(self, content: str):
+        self.add_message(ChatMessageContent(role=AuthorRole.USER, content=content))
+
+    def add_assistant_message(self, content: str):
+        self.add_message(ChatMessageContent(role=AuthorRole.ASSISTANT, content=content))
+
+    def to_state(self) -> Dict[str, Any]:
+        """The conversation in a compact, JSON-ready form; the budgets come from configuration."""
+        return {"turns": [[encode_message(message) for message in turn] for turn in self.turns]}
+
+    def load_state(self, state: Dict[str, Any]):
+        self.turns = [[decode_message(data) for data in turn] for turn in state.get("turns", [])]
+        self._token_cache.clear()
+        self._window = None
+
+    def _tokens(self, message: ChatMessageContent) -> int:
+        key = id(message)
+        if key not in self._token_cache:
+            # A few tokens of per-message overhead for the role and separators
+            self._token_cache[key] = self.count_tokens(message_text(message)) + 4
+        return self._token_cache[key]
+
+    def _turn_tokens(self, turn: List[ChatMessageContent]) -> int:
+        return sum(self._tokens(message) for message in turn)
+
+    def _summary(self, folded: List[List[ChatMessageContent]]) -> Optional[str]:
+        lines = []
+        for turn in folded:
+            for message in turn:
+                if message.role not in (AuthorRole.USER, AuthorRole.ASSISTANT) or not message.content:
+                    continue
+                text = " ".join(message.content.split())
+                if len(text) > self.summary_chars_per_message:
+                    text = text[:self.summary_chars_per_message] + "..."
+                lines.append(f"- {message.role.value}: {text}")
+        # Keep the most recent lines that fit in the summary budget
+        kept, used = [], 0
+        for line in reversed(lines):
+            used += self.count_tokens(line)
+            if used > self.summary_budget:
+                break
+            kept.append(line)
+        if not kept:
+            return None
+        return "Summary of the earlier conversation:\n" + "\n".join(reversed(kept))
+
+    def _pinned(self, folded: List[List[ChatMessageContent]], recent_text: str) -> List[ChatMessageContent]:
+        # Tool results are pinned together with the call that produced them
+        blocks = []
+        for turn in folded:
+            for i, message in enumerate(turn):
+                if not any(isinstance(item, FunctionCallContent) for item in message.items):
+                    continue
+                block = [message]
+                for result in turn[i + 1:]:
+                    if not any(isinstance(item, FunctionResultContent) for item in result.items):
+                        break
+                    block.append(result)
+                if len(block) > 1:
+                    blocks.append(block)
+
+        pinned, used = [], 0
+        for block in reversed(blocks):
+            terms = set(KEY_TERM_PATTERN.findall(" ".join(message_text(m) for m in block[1:])))
+            if not any(term in recent_text for term in terms):
+                continue
+            cost = sum(self._tokens(m) for m in block)
+            if used + cost > self.pinned_budget:
+                continue
+            used += cost
+            pinned[:0] = block
+        return pinned
+
+    def build(self) -> ChatHistory:
+        """Returns the window to send for the current turn and records its token count."""
+        fixed = ChatHistory()
+        if self.system_message:
+            fixed.add_system_message(self.system_message)
+        system_tokens = sum(self.count_tokens(message_text(m)) + 4 for m in fixed.messages)
+        budget = self.token_budget - system_tokens
+
+        recent: List[List[ChatMessageContent]] = []
+        for turn in reversed(self.turns):
+            cost = self._turn_tokens(turn)
+            if recent and cost > budget - self.summary_budget - self.pinned_budget:
+                break
+            recent.insert(0, turn)
+            budget -= cost
+        folded = self.turns[:len(self.turns) - len(recent)]
+
+        window = fixed
+        if folded:
+            summary = self._summary(folded)
+            if summary:
+                window.add_system_message(summary)
+            recent_text = "\n".join(message_text(m) for turn in recent for m in turn)
+            for message in self._pinned(folded, recent_text):
+                window.add_message(message)
+        for turn in recent:
+            for message in turn:
+                window.add_message(message)
+
+        full_tokens = system_tokens + sum(self._turn_tokens(turn) for turn in self.turns)
+        prompt_tokens = sum(self.count_tokens(message_text(m)) + 4 for m in window.messages)
+        stats = {
+            "turn": len(self.turns),
+            "full_tokens": full_tokens,
+            "prompt_tokens": prompt_tokens,
+            "saved_tokens": max(0, full_tokens - prompt_tokens),
+            "folded_turns": len(folded),
+        }
+        self.turn_stats.append(stats)
+        logger.info(f"Prompt window: {stats}")
+
+        self._window = window
+        self._window_length = len(window.messages)
+        return window
+
+    def absorb(self, window: ChatHistory):
+        """Copies messages the model call appended to the window (function calls and results) back into the history."""
+        if window is not self._window:
+            return
+        for message in window.messages[self._window_length:]:
+            self.add_message(message)
+        self._window_length = len(window.messages)
@@ -0,0 +1,130 @@
+import hashlib
+import json
+import logging
+import os
+import re
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+EVENT_NAME_PATTERN = re.compile(r"^#+\s*Event Name:\s*(.+)$", re.MULTILINE)
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def parse_events(markdown_content: str, delimiter: str = "---") -> List[Dict[str, str]]:
+    """
+    Splits the events markdown into search documents with stable IDs.
+
+    The ID is derived from the event name (or from the whole description when an
+    entry has no name), so inserting, removing or reordering events never
+    changes the ID of any other event, and editing a description keeps its ID.
+    """
+    documents = []
+    seen: Dict[str, int] = {}
+    for description in markdown_content.split(delimiter):
+        description = description.strip()  # Remove leading/trailing whitespace
+        if not description:  # Avoid empty descriptions
+            continue
+        match = EVENT_NAME_PATTERN.search(description)
+        identity = " ".join((match.group(1) if match else description).lower().split())
+        # Two events with the same name get distinct, still order-independent IDs
+        occurrence = seen.get(identity, 0)
+        seen[identity] = occurrence + 1
+        if occurrence:
+            identity = f"{identity}#{occurrence}"
+        doc_id = hashlib.sha1(identity.encode("utf-8")).hexdigest()[:24]
+        documents.append({"id": doc_id, "content": description})
+    return documents
+
+
+class IndexManifest:
+    """Local record of the content hash of every document already in the index."""
+
+    def __init__(self, path: str, scope: str):
+        self.path = path
+        self.scope = scope
+        self.hashes: Optional[Dict[str, str]] = None
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.hashes = data.get("indexes", {}).get(self.scope)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.hashes = None
+        return self.hashes
+
+    def save(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            data = {}
+        data.setdefault("indexes", {})[self.scope] = self.hashes or {}
+        # Write to a temporary file first so a crash never leaves a half-written manifest
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+
+def _batches(items: List, batch_size: int):
+    for start in range(0, len(items), batch_size):
+        yield items[start:start + batch_size]
+
+
+def sync_documents(
+    search_client,
+    documents: List[Dict[str, str]],
+    manifest: IndexManifest,
+    batch_size: int = 100,
+    reset: bool = False,
+) -> Dict[str, int]:
+    """
+    Brings the index in line with `documents` using only the writes the diff needs.
+
+    Documents whose hash matches the manifest are skipped, new and changed ones
+    are uploaded and IDs that disappeared are deleted, `batch_size` at a time.
+    Without a manifest (first run, or an index created by an older version of
+    the app) the IDs already in the index are listed once so leftovers can be
+    removed. Pass `reset=True` when the index was just created.
+    """
+    known = {} if reset else manifest.load()
+    if known is None:
+        logger.info("No index manifest found, listing existing document IDs")
+        known = {result["id"]: "" for result in search_client.search(search_text="*", select=["id"])}
+
+    current = {doc["id"]: content_hash(doc["content"]) for doc in documents}
+    to_upload = [doc for doc in documents if known.get(doc["id"]) != current[doc["id"]]]
+    to_delete = [doc_id for doc_id in known if doc_id not in current]
+    hashes = {doc_id: h for doc_id, h in known.items() if doc_id in current}
+
+    failed = 0
+    for batch in _batches(to_upload, batch_size):
+        for result in search_client.merge_or_upload_documents(documents=batch):
+            if result.succeeded:
+                hashes[result.key] = current[result.key]
+            else:
+                hashes.pop(result.key, None)
+                failed += 1
+    for batch in _batches(to_delete, batch_size):
+        for result in search_client.delete_documents(documents=[{"id": doc_id} for doc_id in batch]):
+            if not result.succeeded:
+                # Keep it in the manifest so the next start retries the delete
+                hashes[result.key] = known[result.key]
+                failed += 1
+
+    manifest.hashes = hashes
+    manifest.save()
+    stats = {
+        "added": sum(1 for doc in to_upload if doc["id"] not in known),
+        "changed": sum(1 for doc in to_upload if doc["id"] in known),
+        "removed": len(to_delete),
+        "unchanged": len(documents) - len(to_upload),
+        "failed": failed,
+    }
+    logger.info(f"Index sync complete: {stats}")
+    return stats
@@ -0,0 +1,532 @@
+"""
+Offline load test for app.py.
+
+Drives simulated Chainlit sessions through on_chat_start, on_message and
+on_chat_end against local stand-ins for the chat model, the GitHub MCP server,
+Azure Search and the Devpost API, so it runs without network or credentials:
+
+    python loadtest.py --sessions 50 --messages 3
+
+The model stand-in streams canned tokens after a configurable time to first
+token and calls search_events and the GitHub tools the way the agents do.
+With --model-api it is served as a local OpenAI-compatible endpoint instead,
+so model requests go through the app's own AsyncOpenAI clients, PooledTransport
+and admission control, as in production. The
+GitHub stand-in is a real MCP stdio server (loadtest_mcp_server.py), so the
+server pool and the JSON-RPC pipes are exercised too. Reports throughput,
+p50/p95/p99 latency, memory per session and event-loop lag.
+"""
+import argparse
+import asyncio
+import contextlib
+import gc
+import itertools
+import json
+import logging
+import math
+import os
+import random
+import re
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from typing import Any, ClassVar, Dict, List, Optional, Tuple
+
+from aiohttp import web
+from semantic_kernel.connectors.ai.chat_completion_client_base import ChatCompletionClientBase
+from semantic_kernel.contents import AuthorRole, ChatHistory, ChatMessageContent, StreamingChatMessageContent
+from semantic_kernel.contents.function_call_content import FunctionCallContent
+
+from prefetch import LANGUAGES, TECH_PATTERN
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+
+# (kind, message) pairs cycled through by every session; the kinds follow router.py
+MESSAGES = [
+    ("github", "Summarize the repositories of the GitHub user loadtester"),
+    ("events", "Are there any Python workshops or meetups coming up next month?"),
+    ("multi", "Recommend hackathon projects for the GitHub user loadtester and events to attend"),
+    ("hackathon", "What could I build to win the hackathon?"),
+    ("pair", "Suggest hackathon projects based on the GitHub user loadtester"),
+]
+
+# Function name the model stand-in calls when the last user message mentions one of the words
+TOOL_RULES = [
+    ("search_events", ("event", "workshop", "meetup", "conference", "webinar")),
+    ("search_repositories", ("github", "repo")),
+]
+
+ANSWER_WORDS = (
+    "Based on the repositories and events I found, a good next step is to build an agent "
+    "that combines Python tooling with Azure AI Search and streams its answers to the user. "
+).split()
+
+WORD_PATTERN = re.compile(r"[a-z0-9#+]+")
+
+CALL_IDS = itertools.count()
+
+
+def answer_tokens(count: int) -> List[str]:
+    return [f"{word} " for word in itertools.islice(itertools.cycle(ANSWER_WORDS), count)]
+
+
+def events_query(contents: List[str], text: str) -> str:
+    # Like EventsAgent: search for a language from the conversation, else use the request itself
+    for content in contents:
+        for term in TECH_PATTERN.findall(content.lower()):
+            if term in LANGUAGES:
+                return f"{LANGUAGES[term]} AI workshop"
+    return " ".join(WORD_PATTERN.findall(text)[:6])
+
+
+def plan_tool_call(messages: List[Tuple[str, str]], tools: List[str]) -> Optional[Tuple[str, Dict[str, str]]]:
+    """The `(function name, arguments)` the model stand-in calls for `(role, content)` messages, or None to answer."""
+    # Call one tool per user message, then answer once its result is in the history
+    last_user = max((i for i, (role, _) in enumerate(messages) if role == "user"), default=None)
+    if last_user is None or any(role == "tool" for role, _ in messages[last_user + 1:]):
+        return None
+    text = messages[last_user][1].lower()
+    tools = {name.split("-")[-1]: name for name in tools}
+    for function_name, keywords in TOOL_RULES:
+        if function_name in tools and any(keyword in text for keyword in keywords):
+            if function_name == "search_events":
+                arguments = {"query": events_query([content for _, content in messages], text)}
+            else:
+                arguments = {"query": "user:loadtester"}
+            return tools[function_name], arguments
+    return None
+
+
+class LoadTestChatCompletion(ChatCompletionClientBase):
+    """Chat model stand-in that streams canned tokens and requests tool calls."""
+
+    SUPPORTS_FUNCTION_CALLING: ClassVar[bool] = True
+
+    ttft: float = 0.3
+    token_delay: float = 0.01
+    tokens: int = 120
+    requests: int = 0
+    admission: Any = None
+
+    def _update_function_choice_settings_callback(self):
+        def update_settings(configuration, settings, choice_type):
+            settings.extension_data["tools"] = [
+                function.fully_qualified_name for function in configuration.available_functions or []]
+        return update_settings
+
+    def _reset_function_choice_settings(self, settings):
+        settings.extension_data.pop("tools", None)
+
+    def _plan_tool_call(self, chat_history: ChatHistory, settings) -> Optional[FunctionCallContent]:
+        messages = [(m.role.value, str(m.content or "")) for m in chat_history.messages]
+        call = plan_tool_call(messages, settings.extension_data.get("tools", []))
+        if call is None:
+            return None
+        return FunctionCallContent(id=f"call_{next(CALL_IDS)}", name=call[0], arguments=json.dumps(call[1]))
+
+    @contextlib.asynccontextmanager
+    async def _admitted(self):
+        # Waits for admission like AdmittedChatCompletion does around real model requests
+        if self.admission is None:
+            yield
+            return
+        async with self.admission.slot("model"):
+            yield
+
+    async def _inner_get_chat_message_contents(self, chat_history, settings) -> List[ChatMessageContent]:
+        async with self._admitted():
+            self.requests += 1
+            call = self._plan_tool_call(chat_history, settings)
+            await asyncio.sleep(self.ttft)
+            if call is not None:
+                return [ChatMessageContent(role=AuthorRole.ASSISTANT, items=[call], ai_model_id=self.ai_model_id)]
+            await asyncio.sleep(self.token_delay * self.tokens)
+            return [ChatMessageContent(
+                role=AuthorRole.ASSISTANT, content="".join(answer_tokens(self.tokens)), ai_model_id=self.ai_model_id)]
+
+    async def _inner_get_streaming_chat_message_contents(self, chat_history, settings, function_invoke_attempt: int = 0):
+        async with self._admitted():
+            self.requests += 1
+            call = self._plan_tool_call(chat_history, settings)
+            await asyncio.sleep(self.ttft)
+            if call is not None:
+                yield [StreamingChatMessageContent(
+                    role=AuthorRole.ASSISTANT, choice_index=0, items=[call], ai_model_id=self.ai_model_id,
+                    function_invoke_attempt=function_invoke_attempt)]
+                return
+            for token in answer_tokens(self.tokens):
+                yield [StreamingChatMessageContent(
+                    role=AuthorRole.ASSISTANT, choice_index=0, content=token, ai_model_id=self.ai_model_id,
+                    function_invoke_attempt=function_invoke_attempt)]
+                await asyncio.sleep(self.token_delay)
+
+
+class LoadTestModelClients:
+    """Drop-in for ModelClientRegistry that hands out the model stand-in."""
+
+    def __init__(self, **options):
+        self.options = options
+        self._services: Dict[Optional[str], LoadTestChatCompletion] = {}
+
+    def get(self, service_id: Optional[str] = None, deployment_name: Optional[str] = None) -> LoadTestChatCompletion:
+        if service_id not in self._services:
+            extra = {"service_id": service_id} if service_id else {}
+            self._services[service_id] = LoadTestChatCompletion(ai_model_id="loadtest", **extra, **self.options)
+        return self._services[service_id]
+
+    def metrics(self) -> Dict[str, Dict[str, float]]:
+        return {"loadtest": {"requests": sum(service.requests for service in self._services.values())}}
+
+    async def close(self):
+        self._services.clear()
+
+
+class LoadTestSearchClient:
+    """Stand-in for the async Azure Search client that ranks events by shared words."""
+
+    def __init__(self, documents: List[Dict[str, str]], latency: float):
+        self.latency = latency
+        self.documents = [(set(WORD_PATTERN.findall(d["content"].lower())), d) for d in documents]
+
+    async def search(self, search_text: str, top: int = 5):
+        await asyncio.sleep(self.latency)
+        terms = set(WORD_PATTERN.findall(search_text.lower()))
+        scored = sorted(((len(terms & words), i) for i, (words, _) in enumerate(self.documents)), reverse=True)
+        return self._results([self.documents[i][1] for score, i in scored[:top] if score])
+
+    async def _results(self, hits):
+        for hit in hits:
+            yield hit
+
+    async def close(self):
+        pass
+
+
+async def start_live_api(latency: float) -> web.AppRunner:
+    """Serves a Devpost-compatible /api/hackathons endpoint on a free local port."""
+
+    async def hackathons(request: web.Request) -> web.Response:
+        await asyncio.sleep(latency)
+        query = request.query.get("search", "")
+        return web.json_response({"hackathons": [
+            {"title": f"{query.title()} Hackathon {i}", "url": f"https://devpost.example/{i}"} for i in range(5)
+        ]})
+
+    live_app = web.Application()
+    live_app.router.add_get("/api/hackathons", hackathons)
+    runner = web.AppRunner(live_app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 0).start()
+    return runner
+
+
+def _message_text(content) -> str:
+    # Content is a string or a list of parts
+    if isinstance(content, list):
+        return " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return str(content or "")
+
+
+async def start_model_api(ttft: float, token_delay: float, tokens: int) -> web.AppRunner:
+    """Serves the model stand-in as an OpenAI-compatible chat completions endpoint on a free local port."""
+
+    def completion(body: Dict[str, Any], **fields) -> Dict[str, Any]:
+        return {"id": f"chatcmpl-{next(CALL_IDS)}", "created": int(time.time()), "model": body.get("model", "loadtest"),
+                **fields}
+
+    async def chat_completions(request: web.Request) -> web.StreamResponse:
+        body = await request.json()
+        messages = [(m["role"], _message_text(m.get("content"))) for m in body["messages"]]
+        call = plan_tool_call(messages, [tool["function"]["name"] for tool in body.get("tools") or []])
+        tool_calls = None
+        if call is not None:
+            tool_calls = [{"index": 0, "id": f"call_{next(CALL_IDS)}", "type": "function",
+                           "function": {"name": call[0], "arguments": json.dumps(call[1])}}]
+        usage = {"prompt_tokens": sum(len(text) // 4 for _, text in messages),
+                 "completion_tokens": 0 if tool_calls else tokens}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        finish_reason = "tool_calls" if tool_calls else "stop"
+        await asyncio.sleep(ttft)
+
+        if not body.get("stream"):
+            if not tool_calls:
+                await asyncio.sleep(token_delay * tokens)
+            message = {"role": "assistant", "content": None if tool_calls else "".join(answer_tokens(tokens))}
+            if tool_calls:
+                message["tool_calls"] = tool_calls
+            return web.json_response(completion(
+                body, object="chat.completion", usage=usage,
+                choices=[{"index": 0, "message": message, "finish_reason": finish_reason}]))
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+
+        async def send(**fields):
+            chunk = completion(body, object="chat.completion.chunk", **fields)
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+
+        if tool_calls:
+            await send(choices=[{"index": 0, "delta": {"role": "assistant", "tool_calls": tool_calls},
+                                 "finish_reason": None}])
+        else:
+            for token in answer_tokens(tokens):
+                await send(choices=[{"index": 0, "delta": {"role": "assistant", "content": token},
+                                     "finish_reason": None}])
+                await asyncio.sleep(token_delay)
+        await send(choices=[{"index": 0, "delta": {}, "finish_reason": finish_reason}])
+        if (body.get("stream_options") or {}).get("include_usage"):
+            await send(choices=[], usage=usage)
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+    model_app = web.Application()
+    # Azure OpenAI puts the deployment in the path: /openai/deployments/<name>/chat/completions
+    model_app.router.add_post("/{path:.*}chat/completions", chat_completions)
+    runner = web.AppRunner(model_app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 0).start()
+    return runner
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile; 0 for an empty list."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))]
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    return {
+        "count": len(values),
+        "p50_ms": percentile(values, 50) * 1000,
+        "p95_ms": percentile(values, 95) * 1000,
+        "p99_ms": percentile(values, 99) * 1000,
+        "max_ms": max(values, default=0.0) * 1000,
+    }
+
+
+async def monitor_loop_lag(samples: List[float], interval: float = 0.01):
+    """Records how late each sleep wakes up; anything above zero is time the loop was blocked."""
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(time.perf_counter() - started - interval)
+
+
+def install_stand_ins(app, args, live_url: str):
+    """Points the module-level clients of app.py at the local stand-ins."""
+    from bootstrap import IndexBootstrap
+    from github_cache import CachingMCPStdioPlugin
+    from index_sync import parse_events
+
+    if not args.model_api:
+        app.model_clients = LoadTestModelClients(
+            ttft=args.ttft, token_delay=args.token_delay, tokens=args.tokens, admission=app.admission)
+
+    # No token, so cached GitHub results are never revalidated against the real API
+    app.github_tool_cache.token = None
+    app.github_mcp_pool.factory = lambda: CachingMCPStdioPlugin(
+        cache=app.github_tool_cache,
+        name="GitHub",
+        description="GitHub Plugin",
+        command=sys.executable,
+        args=[os.path.join(current_dir, "loadtest_mcp_server.py"), "--latency", str(args.mcp_latency)],
+    )
+
+    # The BM25 backend is local already; the Azure one gets a stand-in that needs no bootstrap
+    if app.EVENTS_SEARCH_BACKEND != "bm25":
+        app.index_bootstrap = IndexBootstrap(lambda report: None, app.startup_report)
+        with open(app.event_descriptions_path, encoding="utf-8") as f:
+            documents = parse_events(f.read())
+        app.rag_plugin.search_client = LoadTestSearchClient(documents, args.search_latency)
+    app.rag_plugin.live_api_url = live_url
+
+
+async def run_session(app, index: int, args, results: Dict[str, Any], rng: random.Random):
+    import chainlit as cl
+    from chainlit.context import init_http_context
+    from chainlit.user_session import user_sessions
+
+    await asyncio.sleep(args.ramp * index / max(args.sessions, 1))
+    # Each session runs in its own task, so the Chainlit context variable is per session
+    context = init_http_context()
+    try:
+        started = time.perf_counter()
+        await app.on_chat_start()
+        results["chat_start"].append(time.perf_counter() - started)
+
+        for turn in range(args.messages):
+            await asyncio.sleep(rng.uniform(0, 2 * args.think_time))
+            kind, content = MESSAGES[(index + turn) % len(MESSAGES)]
+            turns = len(cl.user_session.get("chat_history").turns)
+            started = time.perf_counter()
+            await app.on_message(cl.Message(content=content, author="User"))
+            elapsed = time.perf_counter() - started
+            history = cl.user_session.get("chat_history")
+            if len(history.turns) == turns or history.turns[-1][-1].content == app.SERVER_BUSY_MESSAGE:
+                # Turned away by admission control, before any work was done or while waiting for a model call
+                results["server_busy"].append(elapsed)
+                continue
+            results["message"].append(elapsed)
+            results[f"message {kind}"].append(elapsed)
+            # The app reports failures in the answer and records them in the history
+            last = history.turns[-1][-1]
+            if last.content.startswith("Error:"):
+                results["errors"].append(last.content)
+
+        started = time.perf_counter()
+        await app.on_chat_end()
+        results["chat_end"].append(time.perf_counter() - started)
+    finally:
+        # Chainlit drops the session data when the websocket goes away
+        user_sessions.pop(context.session.id, None)
+
+
+def print_report(report: Dict[str, Any]):
+    print(f"\n{report['sessions']} sessions, {report['messages']} messages in {report['wall_seconds']:.2f} s: "
+          f"{report['messages_per_second']:.1f} messages/s, {report['errors']} errors, "
+          f"{report['server_busy']} turned away as busy")
+    print(f"{'':>18} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for name, row in report["latency"].items():
+        print(f"{name:>18} {row['count']:>7} {row['p50_ms']:>9.1f} {row['p95_ms']:>9.1f} "
+              f"{row['p99_ms']:>9.1f} {row['max_ms']:>9.1f}")
+    memory = report.get("memory")
+    if memory:
+        print(f"memory: {memory['peak_kib_per_session']:.1f} KiB per concurrent session at peak, "
+              f"{memory['retained_kib_per_session']:.1f} KiB retained per session after chat end")
+    for name, value in report["components"].items():
+        print(f"{name}: {value}")
+    for error in report["error_samples"]:
+        print(f"error: {error}")
+
+
+async def run(args) -> Dict[str, Any]:
+    # Placeholders so app.py builds its Azure clients; nothing is ever sent to them
+    os.environ.setdefault("AZURE_SEARCH_SERVICE_ENDPOINT", "https://loadtest.search.windows.net")
+    os.environ.setdefault("AZURE_SEARCH_API_KEY", "loadtest")
+    os.environ.setdefault("AZURE_OPENAI_CHAT_DEPLOYMENT_NAME", "loadtest")
+    if args.prefetch:
+        os.environ["SEARCH_EVENTS_PREFETCH"] = "true"
+    os.environ["AGENT_EXECUTION_MODE"] = args.execution_mode
+    model_api = None
+    if args.model_api:
+        # The app's own model clients, pointed at the stand-in endpoint
+        model_api = await start_model_api(args.ttft, args.token_delay, args.tokens)
+        host, port = model_api.addresses[0][:2]
+        # An endpoint must be https; a base URL, which includes the deployment, may be plain http
+        deployment = os.environ["AZURE_OPENAI_CHAT_DEPLOYMENT_NAME"]
+        os.environ["AZURE_OPENAI_BASE_URL"] = f"http://{host}:{port}/openai/deployments/{deployment}"
+        os.environ["AZURE_OPENAI_API_KEY"] = "loadtest"
+
+    import app
+
+    logging.getLogger().setLevel(args.log_level)
+
+    live_api = await start_live_api(args.live_latency)
+    host, port = live_api.addresses[0][:2]
+    install_stand_ins(app, args, f"http://{host}:{port}/api/hackathons")
+
+    await app.on_app_startup()
+    await app.github_mcp_pool.start()
+
+    results: Dict[str, Any] = defaultdict(list)
+    lag_samples: List[float] = []
+    rng = random.Random(args.seed)
+
+    if args.memory:
+        gc.collect()
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+
+    lag_monitor = asyncio.create_task(monitor_loop_lag(lag_samples))
+    started = time.perf_counter()
+    # The app prints per-session progress; keep the report readable
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        await asyncio.gather(*(
+            run_session(app, i, args, results, random.Random(rng.random())) for i in range(args.sessions)))
+    wall_seconds = time.perf_counter() - started
+    lag_monitor.cancel()
+
+    report: Dict[str, Any] = {
+        "sessions": args.sessions,
+        "messages": len(results["message"]),
+        "wall_seconds": wall_seconds,
+        "messages_per_second": len(results["message"]) / wall_seconds,
+        "errors": len(results["errors"]),
+        "server_busy": len(results["server_busy"]),
+        "error_samples": sorted(set(results["errors"]))[:5],
+        "latency": {
+            name: summarize(results[name])
+            for name in ["chat_start", "message", *sorted(k for k in results if k.startswith("message ")), "chat_end",
+                         *(["server_busy"] if results["server_busy"] else [])]
+        },
+    }
+    report["latency"]["event_loop_lag"] = summarize(lag_samples)
+
+    if args.memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        gc.collect()
+        retained = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        report["memory"] = {
+            "peak_kib_per_session": (peak - baseline) / 1024 / args.sessions,
+            "retained_kib_per_session": (retained - baseline) / 1024 / args.sessions,
+        }
+
+    report["components"] = {
+        "model": app.model_clients.metrics(),
+        "mcp pool": app.github_mcp_pool.stats(),
+        "search cache": app.rag_plugin.cache_stats(),
+        "github cache": app.github_tool_cache.stats(),
+        "session state": app.session_state.stats(),
+        "admission": app.admission.stats(),
+    }
+    if app.TOOL_RESULT_COMPACTION:
+        report["components"]["tool results"] = app.tool_result_compactor.stats()
+    if app.rag_plugin.prefetcher is not None:
+        report["components"]["event prefetch"] = app.rag_plugin.prefetcher.stats()
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        await app.on_app_shutdown()
+    await live_api.cleanup()
+    if model_api is not None:
+        await model_api.cleanup()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test for the GitHub MCP Chainlit app")
+    parser.add_argument("--sessions", type=int, default=20, help="concurrent chat sessions")
+    parser.add_argument("--messages", type=int, default=3, help="messages sent by each session")
+    parser.add_argument("--ramp", type=float, default=1.0, help="seconds over which sessions start")
+    parser.add_argument("--think-time", type=float, default=0.5, help="mean pause before each message")
+    parser.add_argument("--ttft", type=float, default=0.3, help="model time to first token")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="model delay between streamed tokens")
+    parser.add_argument("--tokens", type=int, default=120, help="tokens per model answer")
+    parser.add_argument("--mcp-latency", type=float, default=0.05, help="GitHub MCP tool latency")
+    parser.add_argument("--search-latency", type=float, default=0.03, help="Azure Search latency")
+    parser.add_argument("--live-latency", type=float, default=0.1, help="Devpost API latency")
+    parser.add_argument("--prefetch", action="store_true", help="enable the speculative search_events prefetch")
+    parser.add_argument("--model-api", action="store_true",
+                        help="serve the model stand-in over HTTP and call it through the app's AsyncOpenAI clients")
+    parser.add_argument("--execution-mode", choices=["parallel", "group_chat"], default="parallel",
+                        help="how multi-agent messages run; group_chat goes through AgentGroupChat")
+    parser.add_argument("--no-memory", dest="memory", action="store_false",
+                        help="skip tracemalloc, which slows the run down")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--log-level", default="WARNING")
+    parser.add_argument("--json", help="also write the report to this file, e.g. to compare runs")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, default=str)
+
+
+if __name__ == "__main__":
+    main()
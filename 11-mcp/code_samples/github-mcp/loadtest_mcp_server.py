@@ -0,0 +1,72 @@
+"""
+Local stand-in for the GitHub MCP server, used by loadtest.py.
+
+Speaks MCP over stdio like `@modelcontextprotocol/server-github`, exposes a few
+of its read-only tools with the same names and answers from canned data after
+a configurable delay:
+
+    python loadtest_mcp_server.py --latency 0.05
+"""
+import argparse
+import asyncio
+import json
+
+from mcp.server.fastmcp import FastMCP
+
+REPOSITORIES = [
+    {"name": "agent-playground", "language": "Python", "description": "Experiments with AI agents and tool calling"},
+    {"name": "chat-ui", "language": "TypeScript", "description": "React chat front end for LLM apps"},
+    {"name": "dotnet-semantic-search", "language": "C#", "description": "Semantic search over docs with Azure AI Search"},
+    {"name": "spring-events", "language": "Java", "description": "Event-driven microservices with Spring Boot"},
+    {"name": "notebooks", "language": "Jupyter Notebook", "description": "Data science and ML notebooks"},
+]
+
+
+def create_server(latency: float) -> FastMCP:
+    server = FastMCP("loadtest-github", log_level="WARNING")
+
+    @server.tool()
+    async def search_repositories(query: str, page: int = 1, perPage: int = 30) -> str:
+        """Search for GitHub repositories"""
+        await asyncio.sleep(latency)
+        owner = query.split("user:")[-1].split()[0] if "user:" in query else "octocat"
+        items = [
+            {
+                "full_name": f"{owner}/{repo['name']}",
+                "html_url": f"https://github.com/{owner}/{repo['name']}",
+                "owner": {"login": owner},
+                **repo,
+            }
+            for repo in REPOSITORIES[:perPage]
+        ]
+        return json.dumps({"total_count": len(items), "incomplete_results": False, "items": items})
+
+    @server.tool()
+    async def get_file_contents(owner: str, repo: str, path: str, branch: str = "main") -> str:
+        """Get the contents of a file or directory from a GitHub repository"""
+        await asyncio.sleep(latency)
+        content = f"# {repo}\n\nSample README for {owner}/{repo}.\n" * 20
+        return json.dumps({"name": path, "path": path, "type": "file", "content": content})
+
+    @server.tool()
+    async def list_commits(owner: str, repo: str, sha: str = "main") -> str:
+        """Get list of commits of a branch in a GitHub repository"""
+        await asyncio.sleep(latency)
+        commits = [
+            {"sha": f"{i:040x}", "commit": {"message": f"Commit {i} on {repo}", "author": {"name": owner}}}
+            for i in range(10)
+        ]
+        return json.dumps(commits)
+
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds before each tool answers")
+    args = parser.parse_args()
+    create_server(args.latency).run()
+
+
+if __name__ == "__main__":
+    main()
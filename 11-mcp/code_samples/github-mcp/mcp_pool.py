@@ -0,0 +1,263 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PooledServer:
+    """A warm MCP server process plus its lease bookkeeping."""
+    plugin: Any
+    leases: int = 0
+    created_at: float = field(default_factory=time.monotonic)
+    last_used: float = field(default_factory=time.monotonic)
+
+
+@dataclass
+class PendingServer:
+    """A server process that is still starting, and the leases already promised on it."""
+    task: Optional[asyncio.Task] = None
+    leases: int = 1
+
+
+class MCPServerPool:
+    """
+    Process-wide pool of warm MCP server processes shared by all chat sessions.
+
+    An MCP client session multiplexes concurrent requests over one stdio pipe, so
+    several chat sessions can lease the same server. A session gets the least
+    loaded server; a new process is only spawned when every server already holds
+    `leases_per_server` leases and the pool is below `max_size`. A server that is
+    still starting counts toward capacity: sessions that arrive meanwhile join
+    it until it is full, so a burst spawns only as many servers as it needs.
+    Once the cap is reached, leases are spread over the existing servers
+    instead of blocking.
+
+    A background task pings every server, reconnects the ones that stop
+    answering and closes servers above `min_size` that have been idle for longer
+    than `idle_timeout` seconds.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], Any],
+        min_size: int = 1,
+        max_size: int = 4,
+        leases_per_server: int = 8,
+        idle_timeout: float = 300.0,
+        health_check_interval: float = 30.0,
+        health_check_timeout: float = 5.0,
+    ):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("Pool sizes must satisfy 0 <= min_size <= max_size and max_size >= 1")
+        self.factory = factory
+        self.min_size = min_size
+        self.max_size = max_size
+        self.leases_per_server = leases_per_server
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self.health_check_timeout = health_check_timeout
+
+        self._servers: List[PooledServer] = []
+        self._by_plugin: Dict[int, PooledServer] = {}
+        self._pending: List[PendingServer] = []
+        self._lock: Optional[asyncio.Lock] = None
+        self._started = False
+        self._maintenance_task: Optional[asyncio.Task] = None
+        self.spawned = 0
+        self.evicted = 0
+        self.reconnected = 0
+
+    async def _spawn(self) -> PooledServer:
+        plugin = self.factory()
+        started = time.monotonic()
+        await plugin.connect()
+        self.spawned += 1
+        logger.info(f"MCP server started in {time.monotonic() - started:.2f}s")
+        return PooledServer(plugin=plugin)
+
+    def _add(self, server: PooledServer):
+        self._servers.append(server)
+        self._by_plugin[id(server.plugin)] = server
+
+    def _remove(self, server: PooledServer):
+        self._servers.remove(server)
+        self._by_plugin.pop(id(server.plugin), None)
+
+    async def start(self):
+        """Warm up `min_size` servers and start the maintenance task."""
+        if self._started:
+            return
+        self._lock = self._lock or asyncio.Lock()
+        async with self._lock:
+            if self._started:
+                return
+            results = await asyncio.gather(
+                *(self._spawn() for _ in range(self.min_size)), return_exceptions=True)
+            for result in results:
+                if isinstance(result, Exception):
+                    logger.error(f"❌ Error warming MCP server: {str(result)}")
+                else:
+                    self._add(result)
+            self._maintenance_task = asyncio.create_task(self._maintain())
+            self._started = True
+            logger.info(f"MCP pool ready with {len(self._servers)} warm server(s)")
+
+    async def _spawn_pending(self, pending: PendingServer) -> PooledServer:
+        try:
+            server = await self._spawn()
+        except BaseException:
+            async with self._lock:
+                self._pending.remove(pending)
+            raise
+        async with self._lock:
+            # Hand over the leases promised while it started, in the same step that makes it visible
+            self._pending.remove(pending)
+            server.leases += pending.leases
+            self._add(server)
+        return server
+
+    async def acquire(self):
+        """Lease a connected MCP plugin. Release it with `release()` when the session ends."""
+        await self.start()
+        async with self._lock:
+            server = min(self._servers, key=lambda s: s.leases, default=None)
+            if server is not None and server.leases < self.leases_per_server:
+                server.leases += 1
+                server.last_used = time.monotonic()
+                return server.plugin
+            pending = next((p for p in self._pending if p.leases < self.leases_per_server), None)
+            if pending is not None:
+                pending.leases += 1
+            elif len(self._servers) + len(self._pending) < self.max_size:
+                # Spawn in the background so other sessions can keep leasing warm servers
+                pending = PendingServer()
+                pending.task = asyncio.create_task(self._spawn_pending(pending))
+                self._pending.append(pending)
+            elif server is not None:
+                server.leases += 1
+                server.last_used = time.monotonic()
+                return server.plugin
+            else:
+                pending = min(self._pending, key=lambda p: p.leases, default=None)
+                if pending is None:
+                    raise RuntimeError("No MCP server available, the pool is still starting")
+                pending.leases += 1
+
+        try:
+            server = await asyncio.shield(pending.task)
+        except asyncio.CancelledError:
+            await self._abandon(pending)
+            raise
+        return server.plugin
+
+    async def _abandon(self, pending: PendingServer):
+        # Give back the lease promised to a caller that stopped waiting for the server to start
+        async with self._lock:
+            if pending in self._pending:
+                pending.leases -= 1
+                return
+        if not pending.task.cancelled() and pending.task.exception() is None:
+            await self.release(pending.task.result().plugin)
+
+    async def release(self, plugin):
+        """Return a leased plugin to the pool. The server process stays warm."""
+        if self._lock is None:
+            return
+        async with self._lock:
+            server = self._by_plugin.get(id(plugin))
+            if server is None:
+                return
+            server.leases = max(0, server.leases - 1)
+            server.last_used = time.monotonic()
+
+    async def _is_healthy(self, server: PooledServer) -> bool:
+        session = getattr(server.plugin, "session", None)
+        if session is None:
+            return False
+        try:
+            await asyncio.wait_for(session.send_ping(), timeout=self.health_check_timeout)
+            return True
+        except Exception as e:
+            logger.warning(f"MCP server failed health check: {str(e)}")
+            return False
+
+    async def _reconnect(self, server: PooledServer):
+        # Reconnect in place so kernels that already hold the plugin keep working.
+        try:
+            await server.plugin.close()
+        except Exception as e:
+            logger.warning(f"Error closing unhealthy MCP server: {str(e)}")
+        await server.plugin.connect()
+        self.reconnected += 1
+
+    async def check(self):
+        """Run one round of health checks and idle eviction."""
+        async with self._lock:
+            servers = list(self._servers)
+        for server in servers:
+            if await self._is_healthy(server):
+                continue
+            try:
+                await self._reconnect(server)
+            except Exception as e:
+                logger.error(f"❌ Error reconnecting MCP server: {str(e)}")
+                async with self._lock:
+                    if server.leases == 0 and server in self._servers:
+                        self._remove(server)
+
+        now = time.monotonic()
+        idle = []
+        async with self._lock:
+            for server in list(self._servers):
+                if len(self._servers) <= self.min_size:
+                    break
+                if server.leases == 0 and now - server.last_used > self.idle_timeout:
+                    self._remove(server)
+                    idle.append(server)
+        for server in idle:
+            self.evicted += 1
+            try:
+                await server.plugin.close()
+            except Exception as e:
+                logger.warning(f"Error closing idle MCP server: {str(e)}")
+        if idle:
+            logger.info(f"Evicted {len(idle)} idle MCP server(s)")
+
+    async def _maintain(self):
+        while True:
+            await asyncio.sleep(self.health_check_interval)
+            try:
+                await self.check()
+            except Exception as e:
+                logger.error(f"❌ Error in MCP pool maintenance: {str(e)}")
+
+    async def close(self):
+        """Stop maintenance and close every server process."""
+        if self._maintenance_task:
+            self._maintenance_task.cancel()
+            self._maintenance_task = None
+        if self._lock is None:
+            return
+        async with self._lock:
+            servers = list(self._servers)
+            self._servers.clear()
+            self._by_plugin.clear()
+            self._started = False
+        for server in servers:
+            try:
+                await server.plugin.close()
+            except Exception as e:
+                logger.warning(f"Error closing MCP server: {str(e)}")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "servers": len(self._servers),
+            "leases": sum(s.leases for s in self._servers),
+            "spawned": self.spawned,
+            "evicted": self.evicted,
+            "reconnected": self.reconnected,
+        }
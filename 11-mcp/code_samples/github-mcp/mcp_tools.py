@@ -0,0 +1,150 @@
+import hashlib
+import json
+import logging
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from mcp import ClientSession, types
+
+logger = logging.getLogger(__name__)
+
+
+def connection_key(connection) -> str:
+    """Identifies an MCP server by how it is launched or reached, not by the chat session using it."""
+    identity = {
+        "name": connection.name,
+        "type": getattr(connection, "clientType", None),
+        "command": getattr(connection, "command", None),
+        "args": getattr(connection, "args", None),
+        "url": getattr(connection, "url", None),
+    }
+    return hashlib.sha1(json.dumps(identity, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def describe_tools(result: types.ListToolsResult) -> List[Dict[str, Any]]:
+    return [{
+        "name": t.name,
+        "description": t.description,
+        "input_schema": t.inputSchema,
+    } for t in result.tools]
+
+
+class ToolCatalogCache:
+    """
+    Process-wide cache of `list_tools` results, keyed by `connection_key`.
+
+    Reconnecting to a server that was already listed reuses its catalog instead
+    of paying another round trip. An entry is dropped as soon as the server
+    sends `notifications/tools/list_changed`, and `on_change` is called so the
+    caller can re-list and update its own index.
+    """
+
+    def __init__(self):
+        self._catalogs: Dict[str, List[Dict[str, Any]]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    async def get_tools(
+        self,
+        connection,
+        session: ClientSession,
+        on_change: Optional[Callable[[], Awaitable[None]]] = None,
+    ) -> List[Dict[str, Any]]:
+        key = connection_key(connection)
+        self._watch_tool_changes(key, session, on_change)
+        tools = self._catalogs.get(key)
+        if tools is not None:
+            self.hits += 1
+            return tools
+        self.misses += 1
+        tools = describe_tools(await session.list_tools())
+        self._catalogs[key] = tools
+        return tools
+
+    def invalidate(self, key: str):
+        if self._catalogs.pop(key, None) is not None:
+            self.invalidations += 1
+
+    def _watch_tool_changes(self, key: str, session: ClientSession, on_change):
+        # ClientSession has no public hook for server notifications, so wrap its message handler
+        original_handler = session._message_handler
+
+        async def handler(message):
+            if isinstance(message, types.ServerNotification) and \
+                    isinstance(message.root, types.ToolListChangedNotification):
+                logger.info("MCP server reported a tool list change, dropping cached catalog")
+                self.invalidate(key)
+                if on_change is not None:
+                    await on_change()
+            await original_handler(message)
+
+        session._message_handler = handler
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "catalogs": len(self._catalogs),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }
+
+
+@dataclass
+class ToolEntry:
+    connection_name: str
+    session: ClientSession
+    schema: Dict[str, Any]
+    # Calls go through the GitHub tool cache
+    cached: bool = False
+
+
+class ToolIndex:
+    """
+    Per chat session `tool_name -> (connection, schema)` lookup for `call_tool`.
+
+    Kept up to date from the MCP connect and disconnect hooks, so dispatching a
+    tool call is a single dict lookup however many servers are attached. When
+    two servers expose the same tool name, the one connected first wins, as in
+    a linear scan over the connections.
+    """
+
+    def __init__(self):
+        self._tools: Dict[str, ToolEntry] = {}
+        self._connections: Dict[str, tuple] = {}
+
+    def add_connection(self, name: str, session: ClientSession, tools: List[Dict[str, Any]], cached: bool = False):
+        if name in self._connections:
+            self.remove_connection(name)
+        self._connections[name] = (session, tools, cached)
+        for tool in tools:
+            if tool["name"] not in self._tools:
+                self._tools[tool["name"]] = ToolEntry(name, session, tool, cached)
+
+    def remove_connection(self, name: str, session: Optional[ClientSession] = None):
+        current = self._connections.get(name)
+        # Chainlit calls the disconnect hook for the old session after the new one connected
+        if current is None or (session is not None and current[0] is not session):
+            return
+        del self._connections[name]
+        for tool in current[1]:
+            entry = self._tools.get(tool["name"])
+            if entry is not None and entry.connection_name == name:
+                del self._tools[tool["name"]]
+                self._reassign(tool["name"])
+
+    def _reassign(self, tool_name: str):
+        for name, (session, tools, cached) in self._connections.items():
+            for tool in tools:
+                if tool["name"] == tool_name:
+                    self._tools[tool_name] = ToolEntry(name, session, tool, cached)
+                    return
+
+    def lookup(self, tool_name: str) -> Optional[ToolEntry]:
+        return self._tools.get(tool_name)
+
+    def tools_for(self, name: str) -> List[Dict[str, Any]]:
+        return self._connections.get(name, (None, [], False))[1]
+
+    def __len__(self):
+        return len(self._tools)
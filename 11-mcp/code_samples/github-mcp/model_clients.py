@@ -0,0 +1,200 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+from openai import DefaultAsyncHttpxClient
+from semantic_kernel.connectors.ai.open_ai import AzureChatCompletion
+
+logger = logging.getLogger(__name__)
+
+
+class _ReleasingStream(httpx.AsyncByteStream):
+    """Response body wrapper that frees the pool slot once the body is closed."""
+
+    def __init__(self, stream: httpx.AsyncByteStream, release):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            self._release()
+
+
+class PooledTransport(httpx.AsyncBaseTransport):
+    """
+    Keep-alive transport with a hard connection limit and pool metrics.
+
+    Requests beyond `max_connections` wait for a slot here, which is where the
+    pool wait time is measured. A slot is held until the response body is
+    closed, so streamed completions count against the limit until they finish.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 60.0,
+    ):
+        self.max_connections = max_connections
+        self._transport = httpx.AsyncHTTPTransport(limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        ))
+        self._slots = asyncio.Semaphore(max_connections)
+        self.in_flight = 0
+        self.requests = 0
+        self.pool_wait_seconds = 0.0
+        self.max_pool_wait_seconds = 0.0
+
+    def _release(self):
+        self.in_flight -= 1
+        self._slots.release()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        started = time.perf_counter()
+        await self._slots.acquire()
+        waited = time.perf_counter() - started
+        self.requests += 1
+        self.in_flight += 1
+        self.pool_wait_seconds += waited
+        self.max_pool_wait_seconds = max(self.max_pool_wait_seconds, waited)
+        try:
+            response = await self._transport.handle_async_request(request)
+        except BaseException:
+            self._release()
+            raise
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_ReleasingStream(response.stream, self._release),
+            extensions=response.extensions,
+        )
+
+    @property
+    def open_connections(self) -> int:
+        # httpcore keeps its connection list on the pool behind the transport
+        pool = getattr(self._transport, "_pool", None)
+        return len(getattr(pool, "connections", ()))
+
+    def metrics(self) -> Dict[str, float]:
+        return {
+            "open_connections": self.open_connections,
+            "in_flight": self.in_flight,
+            "max_connections": self.max_connections,
+            "requests": self.requests,
+            "pool_wait_seconds_total": round(self.pool_wait_seconds, 4),
+            "pool_wait_seconds_max": round(self.max_pool_wait_seconds, 4),
+        }
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+class AdmittedChatCompletion(AzureChatCompletion):
+    """
+    `AzureChatCompletion` that holds an `admission` slot for each model request.
+
+    The slot is taken around the service call rather than in the HTTP
+    transport: the openai client takes any error raised by its transport for a
+    connection failure and retries it, so a `ServerBusy` raised there surfaced
+    as "Connection error." after waiting up to `max_retries` more times.
+    Streamed responses hold the slot until the stream ends.
+    """
+
+    admission: Any = None
+
+    def __init__(self, admission=None, **kwargs):
+        super().__init__(**kwargs)
+        self.admission = admission
+
+    async def _inner_get_chat_message_contents(self, chat_history, settings):
+        if self.admission is None:
+            return await super()._inner_get_chat_message_contents(chat_history, settings)
+        async with self.admission.slot("model"):
+            return await super()._inner_get_chat_message_contents(chat_history, settings)
+
+    async def _inner_get_streaming_chat_message_contents(self, chat_history, settings, function_invoke_attempt: int = 0):
+        if self.admission is None:
+            async for messages in super()._inner_get_streaming_chat_message_contents(
+                    chat_history, settings, function_invoke_attempt):
+                yield messages
+            return
+        async with self.admission.slot("model"):
+            async for messages in super()._inner_get_streaming_chat_message_contents(
+                    chat_history, settings, function_invoke_attempt):
+                yield messages
+
+
+class ModelClientRegistry:
+    """
+    Process-wide source of chat completion services, one HTTP client per deployment.
+
+    Every kernel and agent in every chat session gets its `AzureChatCompletion`
+    from here. Services for the same deployment share a single `AsyncAzureOpenAI`
+    client, and with it one keep-alive connection pool, so sockets and TLS
+    handshakes scale with the number of deployments instead of sessions × agents.
+    Endpoint, key and API version come from the usual AZURE_OPENAI_* settings.
+    Requests go through the optional `admission` controller (see
+    `AdmittedChatCompletion`).
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 60.0,
+        admission=None,
+    ):
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.admission = admission
+        self._clients: Dict[str, tuple] = {}
+        self._services: Dict[Tuple[str, Optional[str]], AdmittedChatCompletion] = {}
+        self._template_closes: List[asyncio.Task] = []
+
+    def _client_for(self, deployment_name: str):
+        if deployment_name not in self._clients:
+            transport = PooledTransport(self.max_connections, self.max_keepalive_connections, self.keepalive_expiry)
+            # Let the connector resolve settings and credentials once, then swap in the shared pool
+            template = AzureChatCompletion(deployment_name=deployment_name)
+            client = template.client.copy(http_client=DefaultAsyncHttpxClient(transport=transport))
+            # The copy has its own HTTP client; the template's is never used, so close it now
+            self._template_closes.append(asyncio.get_running_loop().create_task(template.client.close()))
+            self._clients[deployment_name] = (client, transport)
+            logger.info(f"Created shared model client for deployment '{deployment_name}'")
+        return self._clients[deployment_name][0]
+
+    def get(self, service_id: Optional[str] = None, deployment_name: Optional[str] = None) -> AdmittedChatCompletion:
+        deployment_name = deployment_name or os.getenv("AZURE_OPENAI_CHAT_DEPLOYMENT_NAME")
+        key = (deployment_name, service_id)
+        if key not in self._services:
+            self._services[key] = AdmittedChatCompletion(
+                admission=self.admission,
+                service_id=service_id,
+                deployment_name=deployment_name,
+                async_client=self._client_for(deployment_name),
+            )
+        return self._services[key]
+
+    def metrics(self) -> Dict[str, Dict[str, float]]:
+        return {deployment: transport.metrics() for deployment, (_, transport) in self._clients.items()}
+
+    async def close(self):
+        await asyncio.gather(*self._template_closes, return_exceptions=True)
+        self._template_closes.clear()
+        for client, transport in self._clients.values():
+            await client.close()
+            await transport.aclose()
+        self._clients.clear()
+        self._services.clear()
@@ -0,0 +1,192 @@
+import asyncio
+import logging
+import re
+from typing import AsyncIterator, Dict, List, Tuple
+
+from pydantic import Field, PrivateAttr
+from semantic_kernel.agents.strategies import SelectionStrategy, TerminationStrategy
+from semantic_kernel.contents import AuthorRole, ChatMessageContent
+
+from admission import ServerBusy
+from tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+# Which agents need another agent's output. A dependency only applies when both
+# agents were selected by the router, so GitHubAgent + EventsAgent run at the same
+# time, while HackathonAgent + EventsAgent run one after the other.
+AGENT_DEPENDENCIES: Dict[str, List[str]] = {
+    "GitHubAgent": [],
+    "HackathonAgent": ["GitHubAgent"],
+    "EventsAgent": ["HackathonAgent"],
+}
+
+
+# GitHubAgent is told to ask for a username when it has none; the agents after it could only guess.
+# Polite closing lines ("let me know if you need more details") must not match.
+MISSING_USERNAME_PATTERN = re.compile(
+    r"\b(need|provide|share|specify|what is|what's)\b[^.?!]{0,60}\bgithub user ?name\b"
+    r"|\b(need|provide|share|specify)\b[^.?!]{0,60}\buser ?name\b[^.?!]{0,30}\bto (proceed|continue|look)",
+    re.IGNORECASE)
+# Signs that an answer found something after all: a link or an owner/repository name
+FOUND_PATTERN = re.compile(r"https?://|\b[\w.-]+/[\w.-]+\b")
+
+
+def asks_for_username(content: str) -> bool:
+    """Whether an answer only asks for the GitHub username it needs, without any result."""
+    return bool(MISSING_USERNAME_PATTERN.search(content)) and not FOUND_PATTERN.search(content)
+
+
+def record_usage(span, message: ChatMessageContent):
+    """Counts the completion tokens of a non-streamed answer; its first token is its last."""
+    usage = (message.metadata or {}).get("usage")
+    span.record_tokens(getattr(usage, "completion_tokens", None) or 0)
+
+
+def execution_order(selected: List[str], dependencies: Dict[str, List[str]]) -> Dict[str, List[str]]:
+    """Returns the dependencies of each selected agent, restricted to the selection. Raises on cycles."""
+    graph = {name: [dep for dep in dependencies.get(name, []) if dep in selected] for name in selected}
+    visiting, done = set(), set()
+
+    def visit(name):
+        if name in done:
+            return
+        if name in visiting:
+            raise ValueError(f"Agent dependency cycle involving {name}")
+        visiting.add(name)
+        for dep in graph[name]:
+            visit(dep)
+        visiting.discard(name)
+        done.add(name)
+
+    for name in selected:
+        visit(name)
+    return graph
+
+
+async def run_agent_graph(
+    agents: Dict[str, object],
+    selected: List[str],
+    messages: List[ChatMessageContent],
+    dependencies: Dict[str, List[str]] = AGENT_DEPENDENCIES,
+) -> AsyncIterator[Tuple[str, str]]:
+    """
+    Runs the selected agents, each as soon as the agents it depends on have answered.
+
+    Every agent gets `messages` (the conversation so far, ending with the user's
+    request) followed by the answers of the agents it depends on. Results are
+    yielded as `(agent.name, content)` in the order they finish, so the caller
+    can stream them out while slower agents are still running. A failed agent
+    yields an error message, and agents that depend on it still run with that
+    message as its answer. An agent refused by admission control (`ServerBusy`)
+    fails the whole message instead, so an overloaded server sheds it at once.
+    """
+    graph = execution_order(selected, dependencies)
+    outputs: Dict[str, str] = {}
+    running: Dict[asyncio.Task, str] = {}
+
+    async def run(name: str) -> str:
+        context = list(messages)
+        for dep in graph[name]:
+            context.append(ChatMessageContent(
+                role=AuthorRole.ASSISTANT, name=agents[dep].name, content=outputs[dep]))
+        with tracer.span("agent_turn", agent=agents[name].name, depends_on=graph[name]) as span:
+            response = await agents[name].get_response(messages=context)
+            record_usage(span, response.message)
+        return str(response.content)
+
+    def start_ready():
+        for name in selected:
+            if name in outputs or name in running.values():
+                continue
+            if all(dep in outputs for dep in graph[name]):
+                running[asyncio.create_task(run(name))] = name
+
+    start_ready()
+    try:
+        while running:
+            finished, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in finished:
+                name = running.pop(task)
+                try:
+                    outputs[name] = task.result()
+                except ServerBusy:
+                    raise
+                except Exception as e:
+                    logger.error(f"❌ {name} failed: {str(e)}")
+                    outputs[name] = f"Error: {str(e)}"
+                yield agents[name].name, outputs[name]
+            start_ready()
+    finally:
+        for task in running:
+            task.cancel()
+
+
+def _responses_since_user(history: List[ChatMessageContent]) -> List[ChatMessageContent]:
+    for index in range(len(history) - 1, -1, -1):
+        if history[index].role == AuthorRole.USER:
+            history = history[index + 1:]
+            break
+    return [m for m in history if m.role == AuthorRole.ASSISTANT and m.name and (m.content or "").strip()]
+
+
+class RoutedSelectionStrategy(SelectionStrategy):
+    """
+    Takes turns in the order the agents joined, starting each message with the first routed agent.
+
+    SequentialSelectionStrategy keeps its position across `invoke()` calls, so
+    once RoutedTerminationStrategy ends a turn early the next message would
+    start wherever the last one stopped. Call `start()` with the routed agent
+    names before each message to begin the rotation at the earliest of them.
+    """
+
+    _start: List[str] = PrivateAttr(default_factory=list)
+    _index: int = PrivateAttr(default=-1)
+
+    def start(self, agent_names: List[str]):
+        self._start = list(agent_names)
+
+    async def select_agent(self, agents, history: List[ChatMessageContent]):
+        if self._start:
+            names = [agent.name for agent in agents]
+            self._index = min((names.index(name) for name in self._start if name in names), default=0)
+            self._start = []
+        else:
+            self._index = (self._index + 1) % len(agents)
+        return agents[self._index]
+
+
+class RoutedTerminationStrategy(TerminationStrategy):
+    """
+    Ends a group chat turn as soon as the agents the router picked have answered.
+
+    Set `routed_agents` to their names before each message. The chat stops once
+    every one of them has given a non-empty answer since the latest user
+    message, or right away when an answer only asks for the GitHub username it
+    needs (see `asks_for_username`), since the agents after it could only guess.
+    `maximum_iterations` remains the upper bound; `record()` reports how many
+    turns a message took and how many it saved against that bound.
+    """
+
+    routed_agents: List[str] = Field(default_factory=list)
+    messages: int = 0
+    turns: int = 0
+    turns_saved: int = 0
+
+    async def should_agent_terminate(self, agent, history: List[ChatMessageContent]) -> bool:
+        responses = _responses_since_user(history)
+        if not responses:
+            return False
+        if asks_for_username(responses[-1].content):
+            return True
+        answered = {message.name for message in responses}
+        return all(name in answered for name in self.routed_agents or [agent.name])
+
+    def record(self, history: List[ChatMessageContent]) -> Dict[str, int]:
+        """Counts the agent turns of the latest message and adds them to the running totals."""
+        turns = len(_responses_since_user(history))
+        saved = max(0, self.maximum_iterations - turns)
+        self.messages += 1
+        self.turns += turns
+        self.turns_saved += saved
+        return {"turns": turns, "turns_saved": saved, "total_turns_saved": self.turns_saved}
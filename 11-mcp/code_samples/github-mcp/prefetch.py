@@ -0,0 +1,194 @@
+import asyncio
+import functools
+import logging
+import re
+import time
+from collections import Counter, OrderedDict
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+
+from search_cache import normalize_query
+from tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+# Spellings of the languages the events are organized around, and the name used in queries
+LANGUAGES: Dict[str, str] = {
+    "python": "Python",
+    "jupyter notebook": "Python",
+    "javascript": "JavaScript",
+    "typescript": "TypeScript",
+    "java": "Java",
+    "c#": "C#",
+    "csharp": "C#",
+    ".net": ".NET",
+    "dotnet": ".NET",
+}
+
+# Frameworks and services that have their own events
+TOPICS = (
+    "semantic kernel", "autogen", "langchain", "langgraph", "llamaindex", "genaiscript",
+    "copilot studio", "github models", "azure ai agent service", "cosmos db",
+)
+
+# Longest spellings first, so "javascript" is not read as "java"
+TECH_PATTERN = re.compile(
+    r"(?<![a-z0-9])(" + "|".join(re.escape(term) for term in sorted([*LANGUAGES, *TOPICS], key=len, reverse=True))
+    + r")(?![a-z0-9#])")
+
+# "language" fields of GitHub API objects, as returned by search_repositories and friends
+LANGUAGE_FIELD = re.compile(r'"language"\s*:\s*"([^"]+)"')
+
+
+def repository_languages(tool_result: str) -> List[str]:
+    """Returns the known languages in a GitHub tool result, most frequent first."""
+    counts = Counter(LANGUAGES[name.lower()] for name in LANGUAGE_FIELD.findall(tool_result) if name.lower() in LANGUAGES)
+    return [language for language, _ in counts.most_common()]
+
+
+def predict_queries(message: str = "", languages: Iterable[str] = ()) -> List[str]:
+    """
+    Guesses the search_events queries EventsAgent will make, best guess first.
+
+    Follows the shape its instructions ask for ("Python AI workshop"): one query
+    per language named in the message or found in the user's repositories, and
+    one per framework named in the message.
+    """
+    named = TECH_PATTERN.findall(message.lower())
+    queries = [f"{LANGUAGES[term]} AI workshop" for term in named if term in LANGUAGES]
+    queries += [f"{language} AI workshop" for language in languages]
+    queries += [term.title() for term in named if term not in LANGUAGES]
+    return list(dict.fromkeys(queries))
+
+
+class _Prefetch:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.started_at = time.monotonic()
+        self.used = False
+
+
+class EventSearchPrefetcher:
+    """
+    Runs likely search_events queries in the background before EventsAgent asks for them.
+
+    In a sequential chat EventsAgent searches only after the GitHub and
+    hackathon agents have answered, although its search terms usually follow
+    from the user's message and the languages of their repositories. `prefetch`
+    starts up to `max_queries` such queries per message; results are kept for
+    `ttl` seconds under the normalized query, and `lookup` answers the real
+    tool call from them, waiting for a prefetch that is still running. A
+    prefetch whose `search` raised is forgotten, so the real call searches
+    again; `search` should raise rather than return an error or a partial result.
+
+    `stats` reports the hit rate of real calls and how many prefetches were
+    never used, so the speculation can be judged on real traffic.
+    """
+
+    def __init__(
+        self,
+        search: Callable[[str], Awaitable[str]],
+        ttl: float = 120.0,
+        max_queries: int = 4,
+        max_entries: int = 256,
+        max_inflight: int = 16,
+    ):
+        self.search = search
+        self.ttl = ttl
+        self.max_queries = max_queries
+        self.max_entries = max_entries
+        self.max_inflight = max_inflight
+        self._entries: "OrderedDict[str, _Prefetch]" = OrderedDict()
+        self.issued = 0
+        self.skipped = 0
+        self.hits = 0
+        self.misses = 0
+        self.used = 0
+        self.wasted = 0
+        self.errors = 0
+
+    def _drop(self, key: str):
+        entry = self._entries.pop(key)
+        if not entry.used:
+            self.wasted += 1
+            entry.task.cancel()
+
+    def _purge(self):
+        cutoff = time.monotonic() - self.ttl
+        for key in [k for k, e in self._entries.items() if e.started_at < cutoff]:
+            self._drop(key)
+
+    def _inflight(self) -> int:
+        return sum(1 for entry in self._entries.values() if not entry.task.done())
+
+    async def _run(self, query: str) -> str:
+        with tracer.span("prefetch_search_events", query=query):
+            return await self.search(query)
+
+    def _on_done(self, key: str, task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            self.errors += 1
+            logger.debug(f"search_events prefetch failed: {task.exception()}")
+            # Never serve a failure; the next prefetch or real call tries again
+            entry = self._entries.get(key)
+            if entry is not None and entry.task is task:
+                del self._entries[key]
+
+    def prefetch(self, queries: Iterable[str]) -> List[str]:
+        """Starts the queries that are not cached yet; returns the ones started."""
+        self._purge()
+        started = []
+        for query in list(queries)[:self.max_queries]:
+            key = normalize_query(query)
+            if not key or key in self._entries:
+                continue
+            if self._inflight() >= self.max_inflight:
+                # Speculation must never compete with real work for connections
+                self.skipped += 1
+                continue
+            task = asyncio.create_task(self._run(query))
+            task.add_done_callback(functools.partial(self._on_done, key))
+            self._entries[key] = _Prefetch(task)
+            self.issued += 1
+            started.append(query)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+        return started
+
+    async def lookup(self, query: str) -> Optional[str]:
+        """Returns the prefetched result for `query`, or None when it has to be searched for real."""
+        key = normalize_query(query)
+        entry = self._entries.get(key)
+        if entry is None or time.monotonic() - entry.started_at >= self.ttl:
+            self.misses += 1
+            return None
+        if not entry.used:
+            # Claimed by a real call, so purging never cancels it while we wait
+            entry.used = True
+            self.used += 1
+        try:
+            result = await asyncio.shield(entry.task)
+        except Exception:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return result
+
+    def stats(self) -> Dict[str, float]:
+        self._purge()
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "issued": self.issued,
+            "skipped": self.skipped,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "used": self.used,
+            "wasted": self.wasted,
+            "errors": self.errors,
+        }
+
+    def close(self):
+        for entry in self._entries.values():
+            entry.task.cancel()
+        self._entries.clear()
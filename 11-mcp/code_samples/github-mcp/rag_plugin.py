@@ -0,0 +1,156 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, List, Optional
+
+import aiohttp
+from semantic_kernel.functions import kernel_function
+
+from search_cache import SearchCache, normalize_query
+from tracing import timed_network, tracer
+
+logger = logging.getLogger(__name__)
+
+DEVPOST_API_URL = "https://devpost.com/api/hackathons"
+
+# What the tool result says in place of a source that failed
+SOURCE_ERRORS = {
+    "Azure Search": "Error searching Azure Search",
+    "live events": "Error fetching live events",
+}
+
+
+class IncompleteSearch(Exception):
+    """Raised by `RAGPlugin.search(complete=True)` when a source failed or missed the deadline."""
+
+
+class RAGPlugin:
+    """
+    Searches the events index and the live Devpost API at the same time.
+
+    One instance is shared by every chat session. Azure Search goes through the
+    async `SearchClient` and Devpost through a pooled `aiohttp` session, so a
+    slow source only delays the tool call that is waiting on it and never blocks
+    the event loop. Each call has a `deadline` in seconds; sources that have not
+    answered by then are cancelled and the call returns what has arrived.
+
+    Both sources sit behind a `SearchCache` keyed by the normalized query. The
+    index is static so its entries simply expire; the Devpost feed is live, so
+    stale entries are served immediately while a background refresh runs.
+
+    `wait_ready`, when given, is awaited before the index is queried so the first
+    search can wait for a background index bootstrap to finish. `live_api_url`
+    points the live source at another Devpost-compatible endpoint. With a
+    `prefetcher`, results it fetched ahead of time answer the tool call first.
+    """
+
+    def __init__(
+        self,
+        search_client,
+        deadline: float = 4.0,
+        max_connections: int = 20,
+        index_cache: Optional[SearchCache] = None,
+        live_cache: Optional[SearchCache] = None,
+        wait_ready: Optional[Callable[[], Awaitable[bool]]] = None,
+        live_api_url: str = DEVPOST_API_URL,
+        prefetcher=None,
+    ):
+        self.search_client = search_client
+        self.deadline = deadline
+        self.max_connections = max_connections
+        self.index_cache = index_cache or SearchCache("index", ttl=3600)
+        self.live_cache = live_cache or SearchCache("devpost", ttl=300, stale_ttl=1800)
+        self.wait_ready = wait_ready
+        self.live_api_url = live_api_url
+        self.prefetcher = prefetcher
+        self._http_session: Optional[aiohttp.ClientSession] = None
+
+    def _get_http_session(self) -> aiohttp.ClientSession:
+        # Created lazily because an aiohttp session must be bound to the running loop
+        if self._http_session is None or self._http_session.closed:
+            self._http_session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=60),
+                # Cache fetches are shielded from the caller, so bound them by the deadline it waits for
+                timeout=aiohttp.ClientTimeout(total=self.deadline),
+            )
+        return self._http_session
+
+    async def _fetch_index(self, query: str) -> List[str]:
+        if self.wait_ready is not None:
+            await self.wait_ready()
+        with timed_network("index_network_seconds"):
+            results = await self.search_client.search(query, top=5)
+            return [f"Event: {result['content']}" async for result in results if 'content' in result]
+
+    async def _fetch_devpost(self, query: str) -> List[str]:
+        # Live API (example: Devpost hackathons)
+        with timed_network("devpost_network_seconds"):
+            async with self._get_http_session().get(self.live_api_url, params={"search": query}) as api_resp:
+                api_resp.raise_for_status()
+                data = await api_resp.json(content_type=None)
+        return [
+            f"Live Event: {event.get('title')} - {event.get('url')}"
+            for event in data.get('hackathons', [])[:5]
+        ]
+
+    async def _search_index(self, query: str) -> List[str]:
+        return await self.index_cache.get_or_fetch(normalize_query(query), lambda: self._fetch_index(query))
+
+    async def _search_devpost(self, query: str) -> List[str]:
+        return await self.live_cache.get_or_fetch(normalize_query(query), lambda: self._fetch_devpost(query))
+
+    @kernel_function(name="search_events", description="Searches for relevant events based on a query")
+    async def search_events(self, query: str) -> str:
+        """Retrieves relevant events from Azure Search and a live API based on the query."""
+        with tracer.span("search_events", query=query) as span:
+            if self.prefetcher is not None:
+                prefetched = await self.prefetcher.lookup(query)
+                span.set("prefetched", prefetched is not None)
+                if prefetched is not None:
+                    return prefetched
+            return await self.search(query)
+
+    async def search(self, query: str, complete: bool = False) -> str:
+        """
+        Queries both sources within the deadline and joins what arrived.
+
+        A failed source is reported in the result. With `complete`, a failed or
+        late source raises `IncompleteSearch` instead, for callers that keep
+        the result and should not keep a partial one.
+        """
+        sources = {
+            "Azure Search": asyncio.create_task(self._search_index(query)),
+            "live events": asyncio.create_task(self._search_devpost(query)),
+        }
+        _, pending = await asyncio.wait(sources.values(), timeout=self.deadline)
+        for task in pending:
+            task.cancel()
+
+        span = tracer.current()
+        context_strings = []
+        incomplete = []
+        for source, task in sources.items():
+            if task in pending:
+                logger.warning(f"search_events: {source} missed the {self.deadline}s deadline")
+                if span is not None:
+                    span.set("timed_out", span.attributes.get("timed_out", []) + [source])
+                incomplete.append(source)
+                continue
+            if task.exception() is not None:
+                context_strings.append(f"{SOURCE_ERRORS[source]}: {str(task.exception())}")
+                incomplete.append(source)
+                continue
+            context_strings.extend(task.result())
+        if complete and incomplete:
+            raise IncompleteSearch(f"no answer from {', '.join(incomplete)} for {query!r}")
+        if context_strings:
+            return "\n\n".join(context_strings)
+        else:
+            return "No relevant events found."
+
+    def cache_stats(self):
+        return {"index": self.index_cache.stats(), "devpost": self.live_cache.stats()}
+
+    async def close(self):
+        if self._http_session is not None and not self._http_session.closed:
+            await self._http_session.close()
+        await self.search_client.close()
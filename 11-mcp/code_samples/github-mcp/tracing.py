@@ -0,0 +1,228 @@
+import contextvars
+import json
+import logging
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """One timed step. Streaming steps also record time to first token and tokens per second."""
+
+    def __init__(self, name: str, parent: Optional["Span"], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = dict(attributes)
+        self.start = time.time()
+        self._started = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.first_token: Optional[float] = None
+        self.tokens = 0
+        self.error: Optional[str] = None
+        self.dropped = False
+
+    def set(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def add_time(self, key: str, seconds: float):
+        self.attributes[key] = self.attributes.get(key, 0.0) + seconds
+
+    def record_tokens(self, count: int = 1):
+        if self.first_token is None:
+            self.first_token = time.perf_counter() - self._started
+        self.tokens += count
+
+    def drop(self):
+        """Marks the span as not worth exporting, e.g. a wait that produced nothing."""
+        self.dropped = True
+
+    def finish(self):
+        self.duration = time.perf_counter() - self._started
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.start,
+            "duration": self.duration,
+            "attributes": self.attributes,
+        }
+        if self.first_token is not None:
+            data["ttft"] = self.first_token
+            data["tokens"] = self.tokens
+            generating = (self.duration or 0) - self.first_token
+            data["tokens_per_second"] = self.tokens / generating if generating > 0 else None
+        if self.error:
+            data["error"] = self.error
+        return data
+
+
+class JsonlExporter:
+    """Appends one JSON line per finished span to a local file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8", buffering=1)
+
+    def export(self, span: Span):
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def close(self):
+        self._file.close()
+
+
+class PrometheusExporter:
+    """
+    Keeps latency histograms per span name and serves them in the Prometheus text format.
+
+    Exposes `span_duration_seconds`, `span_ttft_seconds` and `span_tokens_total`,
+    labelled by span name, so p99 outliers can be found with `histogram_quantile`.
+    """
+
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Dict[str, list]] = {
+            "span_duration_seconds": defaultdict(self._empty),
+            "span_ttft_seconds": defaultdict(self._empty),
+        }
+        self._tokens: Dict[str, int] = defaultdict(int)
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def _empty(self):
+        # Per-bucket counts, then count and sum
+        return [[0] * len(self.BUCKETS), 0, 0.0]
+
+    def _observe(self, metric: str, name: str, value: float):
+        histogram = self._histograms[metric][name]
+        index = bisect_left(self.BUCKETS, value)
+        if index < len(self.BUCKETS):
+            histogram[0][index] += 1
+        histogram[1] += 1
+        histogram[2] += value
+
+    def export(self, span: Span):
+        with self._lock:
+            self._observe("span_duration_seconds", span.name, span.duration)
+            if span.first_token is not None:
+                self._observe("span_ttft_seconds", span.name, span.first_token)
+                self._tokens[span.name] += span.tokens
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            for metric, histograms in self._histograms.items():
+                lines.append(f"# TYPE {metric} histogram")
+                for name, (buckets, count, total) in histograms.items():
+                    cumulative = 0
+                    for bound, bucket in zip(self.BUCKETS, buckets):
+                        cumulative += bucket
+                        lines.append(f'{metric}_bucket{{span="{name}",le="{bound}"}} {cumulative}')
+                    lines.append(f'{metric}_bucket{{span="{name}",le="+Inf"}} {count}')
+                    lines.append(f'{metric}_count{{span="{name}"}} {count}')
+                    lines.append(f'{metric}_sum{{span="{name}"}} {total}')
+            lines.append("# TYPE span_tokens_total counter")
+            for name, tokens in self._tokens.items():
+                lines.append(f'span_tokens_total{{span="{name}"}} {tokens}')
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int, host: str = "127.0.0.1"):
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = exporter.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        logger.info(f"Serving metrics on http://{host}:{port}/metrics")
+
+    def close(self):
+        if self._server:
+            self._server.shutdown()
+
+
+class Tracer:
+    """
+    Records nested spans around the steps of a request and hands them to exporters.
+
+    The current span is tracked in a context variable, so spans opened inside
+    tasks started from a span (parallel agents, tool calls) become its children.
+    With no exporters configured, spans cost a few microseconds and are dropped.
+    """
+
+    def __init__(self):
+        self.exporters: List[Any] = []
+
+    def add_exporter(self, exporter):
+        self.exporters.append(exporter)
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        span = Span(name, _current_span.get(), attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current_span.reset(token)
+            span.finish()
+            if not span.dropped:
+                self._export(span)
+
+    def _export(self, span: Span):
+        for exporter in self.exporters:
+            try:
+                exporter.export(span)
+            except Exception as e:
+                logger.warning(f"Span exporter failed: {str(e)}")
+
+    def current(self) -> Optional[Span]:
+        return _current_span.get()
+
+    def close(self):
+        for exporter in self.exporters:
+            exporter.close()
+
+
+# Process-wide tracer; exporters are attached by the app at startup
+tracer = Tracer()
+
+
+@contextmanager
+def timed_network(key: str):
+    """Adds the time spent in the block to attribute `key` of the current span."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        span = tracer.current()
+        if span is not None:
+            span.add_time(key, time.perf_counter() - started)